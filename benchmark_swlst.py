@@ -0,0 +1,403 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+"""
+Reproducible benchmark of the processing stages of i.landsat8.swlst, on
+synthetic Landsat8 scenes, independent of GRASS GIS. Each stage is timed
+through its NumPy counterpart (see swlst.py), the whole module through its
+main() on the offline stand-in for GRASS GIS (see swlst_offline.py):
+
+- mask: excluding the cloudy pixels of the Quality Assessment band
+- bt: at-satellite brightness temperatures of TIRS bands 10, 11
+- emissivity: average and delta emissivity from FROM-GLC land cover
+- cwv: column water vapor, per spatial window size
+- lst: land surface temperature, per spatial window size
+- module: main(), the r.mapcalc expressions and commands, per spatial window
+  size, estimating CWV with the given 'cwv_method'
+
+Scenes are generated from a seed, hence runs of different commits on the same
+machine compare. Results are written as JSON, for example:
+
+    python benchmark_swlst.py --sizes 512,1024 --output HEAD.json
+    python benchmark_swlst.py --sizes 512,1024 --compare HEAD.json
+    python benchmark_swlst.py --stages module --cwv-method sat --windows 7,21
+
+A full 7800^2 scene needs several GB of memory.
+"""
+
+import os
+import sys
+import json
+import time
+import platform
+import argparse
+import tempfile
+import subprocess
+import numpy
+from collections import namedtuple
+from landsat8_mtl import load_mtl
+from split_window_lst import SplitWindowLST, FROM_GLC_CODES
+from split_window_lst_arrays import compute_lst_array
+from split_window_lst_arrays import emissivity_lookup_tables
+from split_window_lst_arrays import lookup_emissivities
+from column_water_vapor import Column_Water_Vapor
+from column_water_vapor_arrays import bilinear_interpolation
+from column_water_vapor_arrays import compute_column_water_vapor_array
+from swlst import brightness_temperature
+from quality_assessment import qa_mask
+
+# globals
+MTL_TEMPLATE = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                            'mtl.txt')
+SIZES = (512, 1024, 2048)
+WINDOWS = (7, 9, 11, 13, 15, 17, 19, 21)
+STAGES = ('mask', 'bt', 'emissivity', 'cwv', 'lst', 'module')
+QA_FILL = 1  # designated fill, outside the scene's footprint
+QA_CLEAR = 20480
+QA_CLOUD = 61440  # the default 'qapixel' of i.landsat8.swlst
+
+# a generated scene: Digital Numbers, FROM-GLC codes, QA band and MTL file
+SyntheticScene = namedtuple('SyntheticScene', ['b10', 'b11', 'landcover',
+                                               'qa', 'mtl'])
+
+
+def smooth_field(shape, scale, random):
+    """
+    Return a random field of the given shape, of standard normal values on a
+    grid of 'scale' pixels, bilinearly interpolated in between.
+    """
+    rows = numpy.arange(0, shape[0] + scale, scale)
+    columns = numpy.arange(0, shape[1] + scale, scale)
+    coarse = random.standard_normal((len(rows), len(columns)))
+    return bilinear_interpolation(coarse, rows, columns, shape)
+
+
+def temperature_to_digital_numbers(temperature, landsat8, bandnumber):
+    """
+    Invert the conversion of Digital Numbers to brightness temperatures (K)
+    with the calibration constants of a Landsat8_MTL object.
+    """
+    k1 = getattr(landsat8, 'k1_constant_band_' + str(bandnumber))
+    k2 = getattr(landsat8, 'k2_constant_band_' + str(bandnumber))
+    multiplier = getattr(landsat8, 'radiance_mult_band_' + str(bandnumber))
+    addend = getattr(landsat8, 'radiance_add_band_' + str(bandnumber))
+
+    radiance = k1 / (numpy.exp(k2 / temperature) - 1)
+    digital_numbers = numpy.rint((radiance - addend) / multiplier)
+    return digital_numbers.clip(1, 65535).astype(numpy.uint16)
+
+
+def write_mtl(filename, size, template=MTL_TEMPLATE):
+    """
+    Write an MTL file for a synthetic scene of size^2 thermal pixels, a copy
+    of the 'template' with a scene identifier of ground station 'SYN'.
+    """
+    fields = {'LANDSAT_SCENE_ID': '"LC81840332014146SYN00"',
+              'THERMAL_LINES': size, 'THERMAL_SAMPLES': size,
+              'REFLECTIVE_LINES': size, 'REFLECTIVE_SAMPLES': size}
+
+    with open(template, 'r') as source, open(filename, 'w') as target:
+        for line in source:
+            field = line.split('=')[0].strip()
+            if field in fields:
+                indentation = line[:len(line) - len(line.lstrip())]
+                line = '{indentation}{field} = {value}\n'.format(
+                    indentation=indentation, field=field, value=fields[field])
+            target.write(line)
+
+    return filename
+
+
+def synthetic_scene(size, mtl, seed=0, cloud_cover=0.1):
+    """
+    Generate a size^2 scene for the MTL file 'mtl':
+
+    - T10 of 300 K, varying smoothly by about 8 K over ~8 km, plus noise
+    - T11, colder than T10 by an amount growing with a smooth field of
+      water vapor, thus correlated to T10 within any spatial window
+    - patches of FROM-GLC codes, 8 by 8 of them, so that even a small scene
+      has several land cover classes
+    - cloudy QA pixels, about 'cloud_cover' of the scene, and a tilted
+      footprint, with zero Digital Numbers outside, as in a real scene
+
+    The same 'seed' and size always yield the same scene.
+    """
+    random = numpy.random.RandomState(seed)
+    shape = (size, size)
+    landsat8 = load_mtl(mtl)
+
+    t10 = (300 + 8 * smooth_field(shape, 256, random) +
+           2 * smooth_field(shape, 16, random) +
+           0.2 * random.standard_normal(shape))
+    water_vapor = smooth_field(shape, 128, random).clip(-2, 2) + 2
+    t11 = t10 - (0.3 + 0.4 * water_vapor) * (1 + 0.05 * (t10 - 300))
+    t11 += 0.1 * random.standard_normal(shape)
+
+    b10 = temperature_to_digital_numbers(t10.clip(250, 325), landsat8, 10)
+    b11 = temperature_to_digital_numbers(t11.clip(250, 325), landsat8, 11)
+    del(t10, t11, water_vapor)
+
+    patch = max(size // 8, 1)
+    patches = random.choice(FROM_GLC_CODES, (size // patch + 1,) * 2)
+    indices = numpy.arange(size) // patch
+    landcover = patches[numpy.ix_(indices, indices)].astype(numpy.uint8)
+
+    clouds = smooth_field(shape, 64, random)
+    threshold = numpy.percentile(clouds[::8, ::8], 100 * (1 - cloud_cover))
+    qa = numpy.where(clouds > threshold, QA_CLOUD, QA_CLEAR)
+    qa = qa.astype(numpy.uint16)
+    del(clouds)
+
+    # footprint, a parallelogram tilted by 1/10 of the scene's width
+    rows = numpy.arange(size)[:, numpy.newaxis]
+    columns = numpy.arange(size)[numpy.newaxis, :]
+    left = 0.1 * size * (1 - rows / float(size))
+    outside = (columns < left) | (columns >= left + 0.9 * size)
+    for band in (b10, b11):
+        band[outside] = 0
+    qa[outside] = QA_FILL
+
+    return SyntheticScene(b10, b11, landcover, qa, mtl)
+
+
+def timed(function, *args):
+    """
+    Return the wall-clock time of function(*args), in seconds, and its result.
+    """
+    start = time.time()
+    result = function(*args)
+    return time.time() - start, result
+
+
+def benchmark_scene(scene, windows=WINDOWS, repeat=3, dtype=numpy.float64,
+                    stages=STAGES, cwv_method='expression'):
+    """
+    Time each of the 'stages' on a scene (see synthetic_scene()) 'repeat'
+    times. CWV, LST and the module are timed once per spatial window size.
+    Returns a list of dictionaries of the stage, window size (None if not
+    applicable), the seconds of all runs and the best of them.
+    """
+    landsat8 = load_mtl(scene.mtl)
+    split_window_lst = SplitWindowLST('')
+    precision = {numpy.dtype(numpy.float64): 'double',
+                 numpy.dtype(numpy.float32): 'float'}[numpy.dtype(dtype)]
+
+    def mask():
+        clear = ~qa_mask(scene.qa, pixels=[QA_CLOUD])
+        return [numpy.where(clear, band, 0) for band in (scene.b10, scene.b11)]
+
+    def temperatures(b10, b11):
+        return [brightness_temperature(band, landsat8, number, True, dtype)
+                for band, number in ((b10, 10), (b11, 11))]
+
+    def emissivities():
+        tables = [table.astype(dtype) for table in emissivity_lookup_tables()]
+        return lookup_emissivities(scene.landcover, tables)
+
+    def column_water_vapor(window, t10, t11):
+        cwv = Column_Water_Vapor(window, 'T10', 'T11')
+        return compute_column_water_vapor_array(cwv, t10, t11).astype(dtype)
+
+    def land_surface_temperature(t10, t11, cwv, avg_lse, delta_lse):
+        return compute_lst_array(split_window_lst, t10, t11, cwv, avg_lse,
+                                 delta_lse, dtype)[0]
+
+    def module(window):
+        from swlst_offline import RasterStore, run_module
+        store = RasterStore(rows=scene.b10.shape[0], cols=scene.b10.shape[1])
+        for name, band in (('B10', scene.b10), ('B11', scene.b11),
+                           ('BQA', scene.qa), ('FROM_GLC', scene.landcover)):
+            store.write(name, band, 'CELL')
+        options = {'mtl': scene.mtl, 'b10': 'B10', 'b11': 'B11',
+                   'qab': 'BQA', 'qapixel': QA_CLOUD, 'landcover': 'FROM_GLC',
+                   'lst': 'LST', 'window': window, 'cwv_method': cwv_method,
+                   'precision': precision}
+        return lambda: run_module(store, options, flags='n')
+
+    runs = {}
+
+    def record(stage, window, function, *args):
+        seconds, result = timed(function, *args)
+        runs.setdefault((stage, window), []).append(seconds)
+        return result
+
+    arrays = set(stages) & set(('mask', 'bt', 'emissivity', 'cwv', 'lst'))
+    with numpy.errstate(invalid='ignore', divide='ignore'):
+        for run in xrange(repeat):
+            if arrays:
+                b10, b11 = record('mask', None, mask)
+                t10, t11 = record('bt', None, temperatures, b10, b11)
+                del(b10, b11)
+                avg_lse, delta_lse = record('emissivity', None, emissivities)
+
+            for window in windows:
+                if arrays:
+                    cwv = record('cwv', window, column_water_vapor, window,
+                                 t10, t11)
+                    record('lst', window, land_surface_temperature, t10, t11,
+                           cwv, avg_lse, delta_lse)
+                    del(cwv)
+                if 'module' in stages:
+                    record('module', window, module(window))
+
+    results = []
+    for stage in STAGES:
+        for window in (None,) + tuple(windows):
+            if stage in stages and (stage, window) in runs:
+                results.append({'stage': stage, 'window': window,
+                                'runs': runs[(stage, window)],
+                                'seconds': min(runs[(stage, window)])})
+    return results
+
+
+def git_commit():
+    """
+    Return the commit of the working tree, or None outside of a git checkout.
+    """
+    directory = os.path.dirname(os.path.abspath(__file__))
+    try:
+        with open(os.devnull, 'w') as devnull:
+            commit = subprocess.check_output(['git', 'rev-parse', 'HEAD'],
+                                             cwd=directory, stderr=devnull)
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return commit.strip()
+
+
+def run_benchmark(sizes=SIZES, windows=WINDOWS, repeat=3, seed=0,
+                  dtype=numpy.float64, template=MTL_TEMPLATE, stages=STAGES,
+                  cwv_method='expression'):
+    """
+    Generate a scene per size and benchmark it (see benchmark_scene()).
+    Returns a dictionary of the environment and the results, for JSON.
+    """
+    report = {'commit': git_commit(),
+              'python': platform.python_version(),
+              'numpy': numpy.__version__,
+              'machine': platform.platform(),
+              'seed': seed,
+              'repeat': repeat,
+              'precision': numpy.dtype(dtype).name,
+              'cwv_method': cwv_method,
+              'results': []}
+
+    directory = tempfile.mkdtemp(prefix='swlst_benchmark_')
+    try:
+        for size in sizes:
+            mtl = write_mtl(os.path.join(directory, 'MTL_{0}.txt'.format(size)),
+                            size, template)
+            seconds, scene = timed(synthetic_scene, size, mtl, seed + size)
+            sys.stderr.write('| {size}^2 scene generated in {seconds:.2f} s\n'
+                             .format(size=size, seconds=seconds))
+
+            for result in benchmark_scene(scene, windows, repeat, dtype,
+                                          stages, cwv_method):
+                result['size'] = size
+                result['megapixels_per_second'] = \
+                    size * size / 1e6 / result['seconds']
+                report['results'].append(result)
+                sys.stderr.write('  {stage:<10} {window:>4} {seconds:9.4f} s\n'
+                                 .format(stage=result['stage'],
+                                         window=result['window'] or '',
+                                         seconds=result['seconds']))
+            del(scene)
+    finally:
+        for filename in os.listdir(directory):
+            os.remove(os.path.join(directory, filename))
+        os.rmdir(directory)
+
+    return report
+
+
+def compare_reports(baseline, report):
+    """
+    Return lines comparing the best times of two reports, per size, stage and
+    window size. A speedup above 1 means 'report' is faster.
+    """
+    def best_times(results):
+        return dict(((result['size'], result['stage'], result['window']),
+                     result['seconds']) for result in results)
+
+    before = best_times(baseline['results'])
+    after = best_times(report['results'])
+
+    lines = ['{0:>6} {1:<10} {2:>6} {3:>10} {4:>10} {5:>8}'.format(
+        'size', 'stage', 'window', 'before', 'after', 'speedup')]
+    for result in report['results']:
+        key = (result['size'], result['stage'], result['window'])
+        if key not in before:
+            continue
+        lines.append('{0:>6} {1:<10} {2:>6} {3:>10.4f} {4:>10.4f} {5:>8.2f}'
+                     .format(key[0], key[1], key[2] or '', before[key],
+                             after[key], before[key] / after[key]))
+    return lines
+
+
+def integers(string):
+    """
+    Parse a comma separated list of integers.
+    """
+    return [int(item) for item in string.split(',') if item]
+
+
+def stage_names(string):
+    """
+    Parse a comma separated list of stages.
+    """
+    stages = [item for item in string.split(',') if item]
+    for stage in stages:
+        if stage not in STAGES:
+            raise argparse.ArgumentTypeError('unknown stage ' + stage)
+    return stages
+
+
+def main():
+    """
+    Main program.
+    """
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--sizes', type=integers, default=list(SIZES),
+                        help='Comma separated scene sizes, in pixels per side '
+                             '(a full scene is about 7800)')
+    parser.add_argument('--windows', type=integers, default=list(WINDOWS),
+                        help='Comma separated spatial window sizes for CWV')
+    parser.add_argument('--stages', type=stage_names, default=list(STAGES),
+                        help='Comma separated stages to time, of ' +
+                             ', '.join(STAGES))
+    parser.add_argument('--cwv-method', default='expression',
+                        choices=('expression', 'sat', 'stream', 'neighbors'),
+                        help='Method estimating CWV in the module stage')
+    parser.add_argument('--repeat', type=int, default=3,
+                        help='Runs per stage, the best one is reported')
+    parser.add_argument('--seed', type=int, default=0,
+                        help='Seed of the synthetic scenes')
+    parser.add_argument('--precision', choices=('double', 'float'),
+                        default='double',
+                        help='Precision of temperatures and emissivities')
+    parser.add_argument('--mtl', default=MTL_TEMPLATE,
+                        help='MTL file to derive the synthetic ones from')
+    parser.add_argument('--output',
+                        help='JSON file of the results (default: stdout)')
+    parser.add_argument('--compare',
+                        help='JSON file of a previous run to compare against')
+    arguments = parser.parse_args()
+
+    dtype = {'double': numpy.float64, 'float': numpy.float32}
+    report = run_benchmark(arguments.sizes, arguments.windows,
+                           arguments.repeat, arguments.seed,
+                           dtype[arguments.precision], arguments.mtl,
+                           arguments.stages, arguments.cwv_method)
+
+    if arguments.output:
+        with open(arguments.output, 'w') as output:
+            json.dump(report, output, indent=2, sort_keys=True)
+    elif not arguments.compare:
+        print json.dumps(report, indent=2, sort_keys=True)
+
+    if arguments.compare:
+        with open(arguments.compare, 'r') as previous:
+            baseline = json.load(previous)
+        print '\n'.join(compare_reports(baseline, report))
+
+
+if __name__ == "__main__":
+    main()
@@ -12,6 +12,12 @@ Huazhong Ren, Chen Du, Qiming Qin, Rongyuan Liu, Jinjie Meng, Jing Li
 DUMMY_Ti_MEAN = 'Mean_Ti'
 DUMMY_Tj_MEAN = 'Mean_Tj'
 DUMMY_Rji = 'Ratio_ji'
+DUMMY_TiTj_MEAN = 'Mean_Product_ij'
+DUMMY_TiTi_MEAN = 'Mean_Square_i'
+DUMMY_COUNT = 'Window_Count'
+
+# relative rounding error of window sums, below which a denominator is zero
+SUMS_TOLERANCE = 1e-14
 
 
 # helper functions
@@ -31,7 +37,7 @@ class Column_Water_Vapor():
     -------------------------------------------------------------------------
     *Note,* this class produces valid expressions for GRASS GIS' mapcalc raster
     processing module and does not directly compute column water vapor
-    estimations.
+    estimations. For NumPy arrays, see column_water_vapor_arrays.
     -------------------------------------------------------------------------
 
     With a vital assumption that the atmosphere is unchanged over the
@@ -133,6 +139,10 @@ class Column_Water_Vapor():
         self.window_width = self.window_size
         self.adjacent_pixels = self._derive_adjacent_pixels()
 
+        # extent of the neighbourhood queried by the mapcalc modifiers
+        self.window_radius = max(abs(offset) for pixel in self.adjacent_pixels
+                                 for offset in pixel)
+
         # maps for transmittance
         self.ti = ti
         self.tj = tj
@@ -207,6 +217,17 @@ class Column_Water_Vapor():
         #                                                        cwv=cwv),
         return cwv
 
+    def stream_buffer_bytes(self, columns):
+        """
+        Return the approximate peak memory, in bytes, required by
+        stream_column_water_vapor() of column_water_vapor_arrays for rows of
+        the given number of columns.
+        """
+        size = 2 * self.window_radius + 1
+
+        # ring buffer of window sums, input rows, cumulative sums, output row
+        return 8 * columns * (5 * size + 2 + 10 + 5 + 8)
+
     def _derive_adjacent_pixels(self):
         """
         Derive a window/grid of "adjacent" pixels:
@@ -247,13 +268,12 @@ class Column_Water_Vapor():
         Return mapcalc expression for window medians based on the given mapcalc
         pixel modifiers.
 
-        r.mapcalc has a "median" function. Thus, just return the pixel
+        r.mapcalc has a "median" function. Thus, just pass it the pixel
         modifiers.
         """
         tx_median_expression = 'median({pixel_modifiers})'
-        # print tx_median_expression.format(pixel_modifiers=modifiers)
 
-        return tx_median_expression
+        return tx_median_expression.format(pixel_modifiers=', '.join(modifiers))
 
     def _numerator_for_ratio(self, mean_ti, mean_tj):
         """
@@ -343,6 +363,43 @@ class Column_Water_Vapor():
 
         return rji
 
+    def _ratio_ji_moments_expression(self, scale=0):
+        """
+        Returns a mapcalc expression for the Ratio ji based on window means of
+        Ti, Tj, Ti*Tj and Ti^2, for example as derived by r.neighbors, plus the
+        count of valid pixels in the window. Use this function for the
+        multi-pass approach, which does not require neighbourhood modifiers:
+
+        - Rji = ( mean(Ti*Tj) - mean(Ti) * mean(Tj) ) /
+                ( mean(Ti^2) - mean(Ti)^2 )
+
+        Windows containing null pixels are set to null, as in the big mapcalc
+        expression.
+
+        Window means do not cancel exactly either: the denominator of a
+        uniform window is of the order of the rounding error of the means,
+        which grows with the number of pixels. Denominators within
+        SUMS_TOLERANCE times the number of pixels of mean(Ti^2) + mean(Ti)^2
+        plus the 'scale' of the squared temperatures the means are derived
+        from (e.g. before subtracting an offset) are null, as the division
+        by zero in the big mapcalc expression.
+        """
+        rji = ('if( {count} < {pixels}, null(),'
+               ' if( abs({mean_ti_ti} - {mean_ti}^2) <='
+               ' {tolerance} * ({mean_ti_ti} + {mean_ti}^2 + {scale}), null(),'
+               ' ({mean_ti_tj} - {mean_ti} * {mean_tj}) /'
+               ' ({mean_ti_ti} - {mean_ti}^2) ) )')
+
+        pixels = len(self.adjacent_pixels)
+        return rji.format(count=DUMMY_COUNT,
+                          pixels=pixels,
+                          tolerance=repr(SUMS_TOLERANCE * pixels),
+                          scale=repr(float(scale)),
+                          mean_ti_tj=DUMMY_TiTj_MEAN,
+                          mean_ti=DUMMY_Ti_MEAN,
+                          mean_tj=DUMMY_Tj_MEAN,
+                          mean_ti_ti=DUMMY_TiTi_MEAN)
+
     def _column_water_vapor_expression(self):
         """
         Use this function for the step-by-step approach to estimate the column
@@ -399,26 +456,27 @@ class Column_Water_Vapor():
 
         return cwv_expression
     
-    def _big_cwv_expression_median():
+    def _big_cwv_expression_median(self):
         """
         Build and return a valid mapcalc expression for deriving a Column
         Water Vapor map from Landsat8's brightness temperature channels
-        B10, B11 based on the MSWCVM method (see citation).
+        B10, B11 based on the MSWCVM method (see citation), using the window
+        medians, instead of the means, of Ti and Tj.
         """
         modifiers_ti = self._derive_modifiers(self.ti)
-        ti_median = 'median({modifiers}'.format(modifiers=modifiers_ti)
+        ti_median = self._median_tirs_expression(modifiers_ti)
 
         modifiers_tj = self._derive_modifiers(self.tj)
-        tj_median = 'median({modifiers}'.format(modifiers=modifiers_tj)
+        tj_median = self._median_tirs_expression(modifiers_tj)
 
         string_for_median_ti = 'ti_median'
         string_for_median_tj = 'tj_median'
 
-        numerator = self._numerator_for_ratio_big(median_ti=string_for_median_ti,
-                                                  median_tj=string_for_median_tj)
+        numerator = self._numerator_for_ratio_big(mean_ti=string_for_median_ti,
+                                                  mean_tj=string_for_median_tj)
 
         denominator = \
-            self._denominator_for_ratio_big(median_ti=string_for_median_ti)
+            self._denominator_for_ratio_big(mean_ti=string_for_median_ti)
 
         cwv = ('eval('
                '\ \n  ti_median = {tim},'
@@ -0,0 +1,488 @@
+# -*- coding: utf-8 -*-
+"""
+Column water vapor for NumPy arrays: the window statistics of the MSWCVR
+method (see Column_Water_Vapor) derived from summed-area tables, sliding
+histograms for window medians, or streamed row by row, instead of the
+r.mapcalc expressions.
+"""
+
+import numpy
+from collections import namedtuple
+from column_water_vapor import SUMS_TOLERANCE
+
+# summed-area tables for the window statistics of Ti, Tj
+MomentTables = namedtuple('MomentTables',
+                          ['count', 'ti', 'tj', 'ti_ti', 'ti_tj'])
+
+
+# helper functions
+def summed_area_table(array):
+    """
+    Return the summed-area table (integral image) of a 2D array. The table is
+    padded with a leading row and column of zeros, so that the sum of any
+    rectangular window is derived from four look-ups.
+    """
+    table = numpy.zeros((array.shape[0] + 1, array.shape[1] + 1))
+    table[1:, 1:] = array.cumsum(axis=0).cumsum(axis=1)
+    return table
+
+
+def window_sums(table, radius):
+    """
+    Return the sum of the (2 * radius + 1)^2 window centred at each pixel,
+    looked up in a summed-area table.
+
+    Windows reaching beyond the edges of the array are set to NaN, as are
+    r.mapcalc's neighbourhood modifiers outside the computational region.
+    """
+    rows = table.shape[0] - 1
+    cols = table.shape[1] - 1
+    size = 2 * radius + 1
+
+    sums = numpy.empty((rows, cols))
+    sums.fill(numpy.nan)
+
+    inner = (table[size:, size:] - table[:-size, size:] -
+             table[size:, :-size] + table[:-size, :-size])
+    sums[radius:rows - radius, radius:cols - radius] = inner
+
+    return sums
+
+
+def window_sums_at(table, radius, rows, columns):
+    """
+    Return the sums of the (2 * radius + 1)^2 windows centred at the given
+    'rows' x 'columns' grid of pixels only, looked up in a summed-area table.
+    Centres must lie at least 'radius' pixels away from the edges.
+    """
+    size = 2 * radius + 1
+    top = numpy.ix_(rows - radius, columns - radius)
+    bottom = numpy.ix_(rows - radius + size, columns - radius)
+    top_right = numpy.ix_(rows - radius, columns - radius + size)
+    bottom_right = numpy.ix_(rows - radius + size, columns - radius + size)
+
+    return (table[bottom_right] - table[top_right] -
+            table[bottom] + table[top])
+
+
+def strided_positions(length, radius, stride):
+    """
+    Return every stride-th position along an axis of the given length, at
+    which a window of the given radius fits, always including the last one.
+    """
+    positions = numpy.arange(radius, length - radius, stride)
+    if len(positions) and positions[-1] != length - radius - 1:
+        positions = numpy.append(positions, length - radius - 1)
+    return positions
+
+
+def linear_interpolation(values, positions, length, axis):
+    """
+    Linearly interpolate 'values', known at the sorted 'positions' along
+    'axis', to all of the 0, 1, ..., length - 1 positions. Beyond the first
+    and last position, values are extrapolated.
+    """
+    values = numpy.rollaxis(values, axis)
+    targets = numpy.arange(length)
+
+    if len(positions) == 1:
+        result = numpy.repeat(values, length, axis=0)
+        return numpy.rollaxis(result, 0, axis + 1)
+
+    index = numpy.searchsorted(positions, targets, side='right') - 1
+    index = index.clip(0, len(positions) - 2)
+    weight = ((targets - positions[index]) /
+              (positions[index + 1] - positions[index]).astype(numpy.float64))
+    weight = weight.reshape((length,) + (1,) * (values.ndim - 1))
+
+    result = values[index] * (1 - weight) + values[index + 1] * weight
+    return numpy.rollaxis(result, 0, axis + 1)
+
+
+def bilinear_interpolation(coarse, rows, columns, shape):
+    """
+    Bilinearly interpolate the 2D array 'coarse', known at the grid of 'rows'
+    x 'columns' pixels, to a full grid of the given shape. NaN cells of the
+    coarse grid do not contribute; the weights of the remaining ones are
+    normalised.
+    """
+    valid = ~numpy.isnan(coarse)
+    values = numpy.where(valid, coarse, 0)
+    weights = valid.astype(numpy.float64)
+
+    for positions, length, axis in ((rows, shape[0], 0),
+                                    (columns, shape[1], 1)):
+        values = linear_interpolation(values, positions, length, axis)
+        weights = linear_interpolation(weights, positions, length, axis)
+
+    with numpy.errstate(divide='ignore', invalid='ignore'):
+        fine = values / weights
+    fine[weights < 1e-9] = numpy.nan
+
+    return fine
+
+
+def moment_offsets(ti, tj):
+    """
+    Return the means of Ti and Tj over the pixels valid in both, by which the
+    brightness temperatures are shifted before accumulating moments.
+    """
+    valid = ~(numpy.isnan(ti) | numpy.isnan(tj))
+    if not valid.any():
+        return 0, 0
+    return ti[valid].mean(), tj[valid].mean()
+
+
+def window_moment_tables(ti, tj, offsets=None):
+    """
+    Build the summed-area tables of Ti, Tj, Ti^2 and Ti*Tj, plus one counting
+    the valid (non-NaN) pixels, from which window means, the Ti-Tj covariance
+    and the Ti variance are derived at a cost independent of the window size.
+
+    Brightness temperatures are shifted by their scene mean (or the given
+    'offsets') before accumulating, to keep the cumulative sums of squares
+    small enough for the window variances to survive in double precision.
+    """
+    ti = numpy.asarray(ti, dtype=numpy.float64)
+    tj = numpy.asarray(tj, dtype=numpy.float64)
+
+    if offsets is None:
+        offsets = moment_offsets(ti, tj)
+
+    valid = ~(numpy.isnan(ti) | numpy.isnan(tj))
+    ti = numpy.where(valid, ti - offsets[0], 0)
+    tj = numpy.where(valid, tj - offsets[1], 0)
+
+    return MomentTables(count=summed_area_table(valid.astype(numpy.float64)),
+                        ti=summed_area_table(ti),
+                        tj=summed_area_table(tj),
+                        ti_ti=summed_area_table(ti * ti),
+                        ti_tj=summed_area_table(ti * tj))
+
+
+def sliding_window_median(array, radius, resolution=0.01, block_rows=256):
+    """
+    Return the median of the (2 * radius + 1)^2 window centred at each pixel
+    of a 2D array, with values quantised to 'resolution' (for brightness
+    temperatures, 0.01 K). Windows containing NaN, or reaching beyond the
+    array, are NaN.
+
+    The median is tracked in a histogram of the quantised values, which is
+    updated incrementally while the window slides along a row (Huang, Yang &
+    Tang, 1979): the leaving column is removed, the entering column is added
+    and the median bin moves from its previous position. The cost per pixel
+    grows with the window size n, instead of with n^2 * log(n) for sorting
+    each window. The rows of a block are processed side by side.
+    """
+    array = numpy.asarray(array, dtype=numpy.float64)
+    rows, columns = array.shape
+    size = 2 * radius + 1
+    middle = (size * size - 1) / 2
+
+    medians = numpy.empty((rows, columns))
+    medians.fill(numpy.nan)
+
+    valid = ~numpy.isnan(array)
+    if not valid.any() or rows < size or columns < size:
+        return medians
+
+    # quantised values, NaN in to one extra bin, never below the median
+    lowest = array[valid].min()
+    bins = numpy.zeros((rows, columns), dtype=numpy.int64)
+    bins[valid] = numpy.round((array[valid] - lowest) / resolution)
+    nan_bin = bins.max() + 1
+    bins[~valid] = nan_bin
+
+    count = window_sums(summed_area_table(valid.astype(numpy.float64)),
+                        radius)
+    with numpy.errstate(invalid='ignore'):
+        full = count > size * size - 0.5
+    offsets = numpy.arange(-radius, radius + 1)
+
+    for top in xrange(radius, rows - radius, block_rows):
+        centres = numpy.arange(top, min(top + block_rows, rows - radius))
+        block = len(centres)
+        window_rows = centres[:, None] + offsets
+
+        histogram = numpy.zeros(block * (nan_bin + 1), dtype=numpy.int64)
+        first = numpy.arange(block)[:, None] * (nan_bin + 1)
+        median_bin = numpy.zeros(block, dtype=numpy.int64)
+        below = numpy.zeros(block, dtype=numpy.int64)
+
+        for column in xrange(radius, columns - radius):
+
+            if column == radius:
+                entering = bins[window_rows[:, :, None],
+                                numpy.arange(size)].reshape(block, -1)
+            else:
+                leaving = bins[window_rows, column - radius - 1]
+                numpy.add.at(histogram, first + leaving, -1)
+                below -= (leaving < median_bin[:, None]).sum(axis=1)
+                entering = bins[window_rows, column + radius]
+
+            numpy.add.at(histogram, first + entering, 1)
+            below += (entering < median_bin[:, None]).sum(axis=1)
+
+            # move the median bin, only for windows without NaN
+            complete = full[centres, column]
+            index = first[:, 0]
+            while True:
+                down = complete & (below > middle)
+                if not down.any():
+                    break
+                median_bin[down] -= 1
+                below[down] -= histogram[index[down] + median_bin[down]]
+
+            while True:
+                up = complete & (below + histogram[index + median_bin] <=
+                                 middle)
+                if not up.any():
+                    break
+                below[up] += histogram[index[up] + median_bin[up]]
+                median_bin[up] += 1
+
+            medians[centres[complete], column] = \
+                lowest + median_bin[complete] * resolution
+
+    return medians
+
+
+def row_window_sums(ti, tj, valid, radius, offsets):
+    """
+    Return the sums, over the (2 * radius + 1) pixels wide horizontal window
+    centred at each pixel of a row, of the valid pixels, Ti, Tj, Ti^2 and
+    Ti*Tj, stacked in a (5, columns) array. Windows reaching beyond the row
+    are NaN.
+    """
+    ti = numpy.where(valid, ti - offsets[0], 0)
+    tj = numpy.where(valid, tj - offsets[1], 0)
+    moments = numpy.vstack((valid, ti, tj, ti * ti, ti * tj))
+
+    columns = len(ti)
+    size = 2 * radius + 1
+    table = numpy.zeros((5, columns + 1))
+    table[:, 1:] = moments.cumsum(axis=1)
+
+    sums = numpy.empty((5, columns))
+    sums.fill(numpy.nan)
+    sums[:, radius:columns - radius] = table[:, size:] - table[:, :-size]
+
+    return sums
+
+
+def null_row(columns):
+    """
+    Return a row of NaN, the equivalent of a row of nulls.
+    """
+    row = numpy.empty(columns)
+    row.fill(numpy.nan)
+    return row
+
+
+def zip_rows(rows_ti, rows_tj):
+    """
+    Iterate over pairs of rows, without materialising either iterable.
+    """
+    rows_tj = iter(rows_tj)
+    for row_ti in rows_ti:
+        yield row_ti, next(rows_tj)
+
+
+def compute_column_water_vapor_array(cwv, ti, tj, tables=None, stride=1):
+    """
+    Compute the column water vapor of a Column_Water_Vapor object for each
+    pixel of the 2D arrays ti, tj (NaN for null pixels).
+
+    The window means, the Ti-Tj covariance and the Ti variance are looked
+    up in summed-area tables (see window_moment_tables()), so the cost per
+    pixel does not depend on the window size. Pre-built 'tables' may be
+    passed in to share them among several windows.
+
+    The neighbourhood is the one of the mapcalc expressions (see
+    Column_Water_Vapor._derive_adjacent_pixels()). Windows containing a null
+    pixel, or reaching beyond the array, are NaN, as in the big mapcalc
+    expression.
+
+    With a 'stride' k > 1, the ratio Rji is evaluated only at every k-th
+    row and column (window centres) and the column water vapor is
+    bilinearly interpolated back to all pixels, reducing the work about
+    k^2 times. Pixels which are null in the exact estimation remain null.
+    """
+    if tables is None:
+        tables = window_moment_tables(ti, tj)
+
+    radius = cwv.window_radius
+
+    if stride > 1:
+        shape = (tables.count.shape[0] - 1, tables.count.shape[1] - 1)
+        rows = strided_positions(shape[0], radius, stride)
+        columns = strided_positions(shape[1], radius, stride)
+
+        coarse = numpy.empty((len(rows), len(columns)))
+        coarse.fill(numpy.nan)
+        if len(rows) and len(columns):
+            coarse = column_water_vapor_from_sums(
+                cwv, *[window_sums_at(table, radius, rows, columns)
+                       for table in tables], scale=tables.ti_ti[-1, -1])
+
+        estimation = bilinear_interpolation(coarse, rows, columns, shape)
+
+        # null where the exact estimation is null
+        count = window_sums(tables.count, radius)
+        with numpy.errstate(invalid='ignore'):
+            estimation[~(count > len(cwv.adjacent_pixels) - 0.5)] = numpy.nan
+
+        return estimation
+
+    return column_water_vapor_from_sums(
+        cwv,
+        window_sums(tables.count, radius),
+        window_sums(tables.ti, radius),
+        window_sums(tables.tj, radius),
+        window_sums(tables.ti_ti, radius),
+        window_sums(tables.ti_tj, radius),
+        scale=tables.ti_ti[-1, -1])
+
+
+def compute_column_water_vapor_median_array(cwv, ti, tj, resolution=0.01):
+    """
+    Compute the column water vapor of a Column_Water_Vapor object for each
+    pixel of the 2D arrays ti, tj, using the window medians, instead of the
+    means, of Ti and Tj, which is more robust to noise:
+
+    - Rji = SUM [ ( Tik - Ti_median ) * ( Tjk - Tj_median ) ] /
+            SUM [ ( Tik - Ti_median )^2 ]
+
+    Medians are derived from sliding histograms of the brightness
+    temperatures quantised at 'resolution' (K), see
+    sliding_window_median(). The sums are expanded in to window sums of
+    Ti, Tj, Ti^2 and Ti*Tj, looked up in summed-area tables.
+    """
+    ti = numpy.asarray(ti, dtype=numpy.float64)
+    tj = numpy.asarray(tj, dtype=numpy.float64)
+    radius = cwv.window_radius
+
+    offsets = moment_offsets(ti, tj)
+    tables = window_moment_tables(ti, tj, offsets)
+    median_ti = sliding_window_median(ti, radius, resolution) - offsets[0]
+    median_tj = sliding_window_median(tj, radius, resolution) - offsets[1]
+
+    return column_water_vapor_from_sums(
+        cwv, *[window_sums(table, radius) for table in tables],
+        center_ti=median_ti, center_tj=median_tj,
+        scale=tables.ti_ti[-1, -1])
+
+
+def stride_deviation(cwv, tables, stride):
+    """
+    Return the maximum and the mean absolute deviation of the column water
+    vapor interpolated from a coarse grid (see 'stride' in
+    compute_column_water_vapor_array()) from the exact estimation, over
+    the pixels valid in both.
+    """
+    exact = compute_column_water_vapor_array(cwv, None, None, tables)
+    coarse = compute_column_water_vapor_array(cwv, None, None, tables,
+                                              stride=stride)
+    deviation = numpy.abs(coarse - exact)
+    deviation = deviation[~numpy.isnan(deviation)]
+
+    if not len(deviation):
+        return numpy.nan, numpy.nan
+
+    return deviation.max(), deviation.mean()
+
+
+def stream_column_water_vapor(cwv, rows_ti, rows_tj):
+    """
+    Compute the column water vapor of a Column_Water_Vapor object row by row,
+    from two iterables yielding rows (1D arrays) of Ti and Tj. This is a
+    generator yielding one output row per input row, in the same order.
+
+    The window sums of the last window_size input rows are kept in a ring
+    buffer. An output row is emitted as soon as its neighbourhood is
+    complete, thus peak memory is proportional to window_size times the
+    number of columns (see Column_Water_Vapor.stream_buffer_bytes()), no
+    matter how many rows
+    are streamed. Results equal those of
+    compute_column_water_vapor_array().
+    """
+    radius = cwv.window_radius
+    size = 2 * radius + 1
+
+    ring = None
+    offsets = None
+    rows = 0
+
+    for ti, tj in zip_rows(rows_ti, rows_tj):
+        ti = numpy.asarray(ti, dtype=numpy.float64)
+        tj = numpy.asarray(tj, dtype=numpy.float64)
+
+        # shift by the first valid values seen, like window_moment_tables()
+        valid = ~(numpy.isnan(ti) | numpy.isnan(tj))
+        if offsets is None and valid.any():
+            offsets = (ti[valid].mean(), tj[valid].mean())
+
+        if ring is None:
+            ring = numpy.zeros((size, 5, len(ti)))
+            ring.fill(numpy.nan)
+
+        ring[rows % size] = row_window_sums(ti, tj, valid, radius,
+                                            offsets or (0, 0))
+        rows += 1
+
+        # the row 'radius' rows above is complete
+        if rows > radius:
+            if rows < size:
+                yield null_row(len(ti))
+            else:
+                sums = ring.sum(axis=0)
+
+                # Ti^2 of the rows accumulated, for the rounding error
+                scale = numpy.nansum(sums[3]) / size
+                yield column_water_vapor_from_sums(cwv, *sums, scale=scale)
+
+    # last rows, their windows reach beyond the stream
+    for row in xrange(min(rows, radius)):
+        yield null_row(ring.shape[2])
+
+
+def column_water_vapor_from_sums(cwv, count, sum_ti, sum_tj, sum_ti_ti,
+                                 sum_ti_tj, center_ti=None, center_tj=None,
+                                 scale=0):
+    """
+    Return the column water vapor, with the coefficients of a
+    Column_Water_Vapor object, from window sums of the valid pixels,
+    Ti, Tj, Ti^2 and Ti*Tj. The deviations are taken from the window means,
+    unless other window centers (e.g. medians) are given.
+
+    Sums looked up in summed-area tables do not cancel exactly: the
+    denominator of a uniform window is not zero, but of the order of the
+    rounding error of the accumulated values. Denominators within
+    SUMS_TOLERANCE of the window's sum of Ti^2 plus the 'scale' of the
+    accumulated Ti^2 (e.g. the last entry of a summed-area table) are
+    treated as zero.
+    """
+    pixels = (2 * cwv.window_radius + 1) ** 2
+
+    # N * covariance, N * variance
+    if center_ti is None:
+        numerator = sum_ti_tj - sum_ti * sum_tj / pixels
+        denominator = sum_ti_ti - sum_ti * sum_ti / pixels
+
+    # SUM (Ti - a) * (Tj - b), SUM (Ti - a)^2
+    else:
+        numerator = (sum_ti_tj - center_tj * sum_ti - center_ti * sum_tj +
+                     pixels * center_ti * center_tj)
+        denominator = (sum_ti_ti - 2 * center_ti * sum_ti +
+                       pixels * center_ti ** 2)
+
+    tolerance = SUMS_TOLERANCE * (numpy.abs(sum_ti_ti) + scale)
+
+    with numpy.errstate(divide='ignore', invalid='ignore'):
+        ratio_ji = numerator / denominator
+
+        # nulls, as in r.mapcalc: incomplete windows, division by zero
+        ratio_ji[(count < pixels - 0.5) |
+                 (numpy.abs(denominator) <= tolerance)] = numpy.nan
+
+    return cwv.c0 + cwv.c1 * ratio_ji + cwv.c2 * ratio_ji ** 2
@@ -36,11 +36,29 @@ Range 5|(5.0, 6.3)|-0.34808|0.98123|0.05599|-0.03518|11.96444|9.06710|-14.74085|
 Range 6|(0.0, 6.3)|-0.41165|1.00522|0.14543|-0.27297|4.06655|-6.92512|-18.27461|0.24468|0.87'''
 
 # required librairies
+import os
 import sys
 import csv
+import cPickle as pickle
 from collections import namedtuple
 import random
 
+# csv files, pre-serialised tables (see coefficient_tables()) in the user's
+# cache directory, not next to the installed module
+AE_CSVFILE = 'average_emissivity.csv'
+CWV_CSVFILE = 'cwv_coefficients.csv'
+CACHE_DIRECTORY = os.path.join(os.environ.get('XDG_CACHE_HOME') or
+                               os.path.join(os.path.expanduser('~'), '.cache'),
+                               'i.landsat8.swlst')
+CACHE_FILE = os.path.join(CACHE_DIRECTORY, 'coefficients.pickle')
+CACHE_FORMAT = 2  # plain lists of floats, no NumPy arrays
+
+# rows of the coefficient tables
+AverageEmissivity = namedtuple('AverageEmissivity', ['TIRS10', 'TIRS11'])
+CWVCoefficients = namedtuple('CWVCoefficients',
+                             ['subrange', 'b0', 'b1', 'b2', 'b3', 'b4', 'b5',
+                              'b6', 'b7', 'rmse'])
+
 
 # helper functions
 def set_csvfile():
@@ -116,11 +134,7 @@ def csv_reader(csv_file):
     '''
     with open(csv_file, 'rb') as csvfile:
         csvreader = csv.reader(csvfile, delimiter="|")  # delimiter?
-        string = str()
-        for row in csvreader:
-            string += '\n' + str('|'.join(row))
-        string = string.strip('\n')  # remove first newline!
-        return string
+        return '\n'.join('|'.join(row) for row in csvreader)
 
 
 def csv_to_dictionary(csv):
@@ -207,43 +221,175 @@ def csv_to_dictionary(csv):
     return dictionary
 
 
-def get_average_emissivities():
+def csv_to_rows(csv, columns):
     """
-    Read comma separated values for average emissivities and return a
-    dictionary wiht named tuples
+    Transform input from "special" csv into a list of keys and a list of
+    rows of floats, one row per key. A cell holding a tuple, like the CWV
+    subrange '(0.0, 2.5)', spans two columns. Only the first 'columns' cells
+    following the key are read.
+    """
+    keys = []
+    values = []
+    for row in csv.split('\n')[1:]:
+        if not row.strip():
+            continue
+        elements = row.split('|')
+        keys.append(replace_dot_comma_space(elements[0]))
+
+        numbers = []
+        for element in elements[1:columns + 1]:
+            if element.startswith('('):
+                numbers.extend(to_tuple(element))
+            else:
+                numbers.append(float(element))
+        values.append(numbers)
+
+    return keys, values
+
+
+def csv_signature(csv_file):
+    """
+    Return the absolute path, modification time and size of a csv file, or
+    None if it can not be read, in which case the built-in strings are used.
     """
-
     try:
-        # read csv for average emissivities, convert to string
-        csvstring = csv_reader("average_emissivity.csv")
+        status = os.stat(csv_file)
+    except OSError:
+        return None
+    return os.path.abspath(csv_file), status.st_mtime, status.st_size
 
-    except:
-        csvstring = AE_STRING
 
-    # convert string to dictionary
-    average_emissivities = csv_to_dictionary(csvstring)
+def parse_coefficient_tables():
+    """
+    Read the csv files for average emissivities and column water vapor
+    coefficients, or the built-in strings, in to keys and rows of floats.
+    """
+    tables = {}
+    for name, csv_file, string, columns in (('emissivities', AE_CSVFILE,
+                                             AE_STRING, 2),
+                                            ('column_water_vapor',
+                                             CWV_CSVFILE, CWV_STRING, 10)):
+        try:
+            csvstring = csv_reader(csv_file)
+        except IOError:
+            csvstring = string
+        tables[name] = csv_to_rows(csvstring, columns)
 
-    # return the dictionary with coefficients
-    return average_emissivities
+    return tables
 
 
-def get_column_water_vapor():
+def coefficient_tables(cache_file=CACHE_FILE):
     """
-    Read comma separated values for column water vapor coefficients and return
-    a dictionary wiht named tuples
+    Return the keys and rows of the coefficient tables (see
+    parse_coefficient_tables()), loaded from a pre-serialised cache file. The
+    cache is regenerated only if the csv files in use, or its format,
+    changed. The cache file, by default in the user's cache directory
+    ($XDG_CACHE_HOME or ~/.cache), is written on first access, its directory
+    created if missing. If it can not be written, the tables are parsed in
+    every process. Neither path imports NumPy.
     """
+    signature = [CACHE_FORMAT] + [csv_signature(csv_file) for csv_file in
+                                  (AE_CSVFILE, CWV_CSVFILE)]
+    try:
+        with open(cache_file, 'rb') as cache:
+            cached = pickle.load(cache)
+        if cached['signature'] == signature:
+            return cached['tables']
+    except Exception:
+        pass
+
+    tables = parse_coefficient_tables()
 
+    # write to a temporary file first, concurrent processes read whole files
+    temporary_file = '{name}.{pid}'.format(name=cache_file, pid=os.getpid())
     try:
-        # read csv for average emissivities, convert to string
-        csvstring = csv_reader("cwv_coefficients.csv")
-    except:
-        csvstring = CWV_STRING
+        directory = os.path.dirname(cache_file)
+        if directory and not os.path.isdir(directory):
+            os.makedirs(directory)
+        with open(temporary_file, 'wb') as cache:
+            pickle.dump({'signature': signature, 'tables': tables}, cache,
+                        pickle.HIGHEST_PROTOCOL)
+        os.rename(temporary_file, cache_file)
+    except (IOError, OSError):
+        pass
 
-    # convert string to dictionary
-    column_water_vapor_coefficients = csv_to_dictionary(csvstring)
+    return tables
 
-    # return the dictionary with coefficients
-    return column_water_vapor_coefficients
+
+class CoefficientTable(object):
+    """
+    A read-only dictionary of coefficients, one row per key, loaded on first
+    access. Rows are returned as namedtuples made by 'make_row' from a list
+    of floats.
+    """
+
+    def __init__(self, name, make_row):
+        self.name = name
+        self.make_row = make_row
+        self._index = None
+        self._values = None
+        self._rows = {}
+
+    def _load(self):
+        if self._index is None:
+            keys, self._values = coefficient_tables()[self.name]
+            self._index = dict((key, row) for row, key in enumerate(keys))
+
+    def keys(self):
+        self._load()
+        return sorted(self._index, key=self._index.get)
+
+    def __iter__(self):
+        return iter(self.keys())
+
+    def __len__(self):
+        self._load()
+        return len(self._index)
+
+    def __contains__(self, key):
+        self._load()
+        return key in self._index
+
+    def __getitem__(self, key):
+        if key not in self._rows:
+            self._load()
+            values = list(self._values[self._index[key]])
+            self._rows[key] = self.make_row(values)
+        return self._rows[key]
+
+    def __repr__(self):
+        return repr(dict((key, self[key]) for key in self.keys()))
+
+
+def cwv_coefficients_row(values):
+    """
+    Return CWVCoefficients from a row of floats: the subrange limits, the
+    coefficients b0 to b7 and the RMSE.
+    """
+    return CWVCoefficients(tuple(values[:2]), *values[2:])
+
+
+AVERAGE_EMISSIVITIES = CoefficientTable('emissivities',
+                                        lambda values:
+                                        AverageEmissivity(*values))
+COLUMN_WATER_VAPOR = CoefficientTable('column_water_vapor',
+                                      cwv_coefficients_row)
+
+
+def get_average_emissivities():
+    """
+    Return the average emissivities, a dictionary-like table of named tuples
+    (see CoefficientTable), loaded on first access.
+    """
+    return AVERAGE_EMISSIVITIES
+
+
+def get_column_water_vapor():
+    """
+    Return the column water vapor coefficients, a dictionary-like table of
+    named tuples (see CoefficientTable), loaded on first access.
+    """
+    return COLUMN_WATER_VAPOR
 
 
 # main
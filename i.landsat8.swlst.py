@@ -113,9 +113,29 @@
 #% description: Convert LST output to celsius degrees, apply color table
 #%end
 
+#%flag
+#% key: d
+#% description: Report the deviation of the column water vapor interpolated from a coarse grid (cwv_stride) from the exact estimation
+#%end
+
+#%flag
+#% key: f
+#% description: Fused single pass reading the input maps once and writing only the requested outputs | Column water vapor streamed row by row, emissivities looked up
+#%end
+
 #%flag
 #% key: n
-#% description: Set zero digital numbers in b10, b11 to NULL | ToDo: Perform in copy of input input maps!
+#% description: Set zero digital numbers in b10, b11 to NULL | In the computations, the input maps are left untouched
+#%end
+
+#%flag
+#% key: m
+#% description: Mask-free, apply the cloud map or the quality assessment as a null condition in the computations instead of a MASK | Several runs may share a mapset
+#%end
+
+#%flag
+#% key: p
+#% description: Profile the run, print wall and CPU time, memory, disk input/output per stage | Details per GRASS GIS command in the 'profile' file
 #%end
 
 #%option G_OPT_F_INPUT
@@ -138,6 +158,22 @@
 ##% collective: prefix, mtl
 ##%end
 
+#%option G_OPT_F_INPUT
+#% key: scenes
+#% key_desc: filename
+#% description: Batch processing: file listing one scene per line, an MTL file and optionally the band names prefix (default: <scene id>_B) | Outputs are suffixed with the scene id
+#% required: no
+#%end
+
+#%option
+#% key: workers
+#% type: integer
+#% key_desc: integer
+#% description: Batch processing: number of scenes processed in parallel, each in its own temporary mapset
+#% answer: 1
+#% required: no
+#%end
+
 #%option G_OPT_R_INPUT
 #% key: b10
 #% key_desc: name
@@ -223,6 +259,14 @@
 #% multiple: yes
 #%end
 
+#%option
+#% key: qa_conditions
+#% key_desc: condition
+#% description: Quality assessment conditions for which to mask pixels, in addition to 'qapixel' values | Single bits: fill, dropped_frame, terrain_occlusion; confidences, by default high: water, vegetation, snow_ice, cirrus, cloud, or for example cloud:medium
+#% required: no
+#% multiple: yes
+#%end
+
 #%rules
 #% excludes: prefix, b10, b11, qab
 #%end
@@ -281,6 +325,26 @@
 #% required : no
 #%end
 
+#%option
+#% key: bt_method
+#% key_desc: method
+#% description: Method converting digital numbers to brightness temperatures
+#% options: expression, lookup
+#% descriptions: expression;Digital numbers to radiance and radiance to brightness temperature via two r.mapcalc expressions;lookup;Look-up table of the brightness temperature of each digital number, applied via r.reclass and one r.mapcalc pass (integer bands only, else expression)
+#% answer: lookup
+#% required: no
+#%end
+
+#%option
+#% key: emissivity_method
+#% key_desc: method
+#% description: Method deriving emissivity maps from the FROM-GLC map
+#% options: expression, lookup
+#% descriptions: expression;Nested if() over ranges of FROM-GLC codes via r.mapcalc;lookup;256-entry look-up table following the FROM-GLC legend, applied via r.reclass (or r.recode for the emissivity_out, delta_emissivity_out maps)
+#% answer: expression
+#% required: no
+#%end
+
 #%rules
 #% required: landcover, emissivity_class
 #% exclusive: landcover, emissivity_class
@@ -297,9 +361,94 @@
 #%option
 #% key: window
 #% key_desc: integer
-#% description: Odd number n sizing an n^2 spatial window for column water vapor retrieval | Increase to reduce spatial discontinuation in the final LST
+#% description: Odd number n sizing an n^2 spatial window for column water vapor retrieval | Increase to reduce spatial discontinuation in the final LST | Multiple sizes produce one lst_wN (and cwv_wN) map each
 #% answer: 7
 #% required: yes
+#% multiple: yes
+#%end
+
+#%option
+#% key: cwv_method
+#% key_desc: method
+#% description: Method estimating column water vapor
+#% options: expression, neighbors, sat, stream
+#% descriptions: expression;One big r.mapcalc expression, cost per pixel grows with the window size;neighbors;Window means via r.neighbors and one small r.mapcalc expression (GRASS GIS modules only);sat;Window statistics from summed-area tables (NumPy), cost per pixel independent of the window size;stream;Row by row, keeping window_size rows in a ring buffer (NumPy), peak memory bounded by the memory option
+#% answer: expression
+#% required: no
+#%end
+
+#%option
+#% key: cwv_statistic
+#% key_desc: statistic
+#% description: Statistic of T10, T11 within the spatial window the column water vapor is centered on
+#% options: mean, median
+#% descriptions: mean;Window means (default);median;Window medians, robust against outliers such as cloud edges (temperatures quantised to 0.01 K with cwv_method=sat) | Requires cwv_method=expression or sat
+#% answer: mean
+#% required: no
+#%end
+
+#%option
+#% key: cwv_stride
+#% type: integer
+#% key_desc: integer
+#% description: Evaluate the column water vapor only at every k-th row and column and interpolate bilinearly in between | Requires cwv_method=sat
+#% answer: 1
+#% required: no
+#%end
+
+#%option
+#% key: memory
+#% type: integer
+#% key_desc: memory in MB
+#% description: Maximum memory to be used for streaming the column water vapor estimation (in MB)
+#% answer: 300
+#% required: no
+#%end
+
+#%option
+#% key: precision
+#% key_desc: precision
+#% description: Storage precision of intermediate and output maps
+#% options: double, float, scaled
+#% descriptions: double;Double precision floating point (DCELL);float;Single precision floating point (FCELL), also for the computations of the fused single pass (-f), except for the temporary brightness temperatures and column water vapor;scaled;Like float, though land surface and brightness temperatures stored as integers in hundredths of a degree (CELL)
+#% answer: double
+#% required: no
+#%end
+
+#%option
+#% key: nprocs
+#% type: integer
+#% key_desc: integer
+#% description: Number of row tiles evaluated in parallel by the column water vapor (cwv_method=expression) and land surface temperature r.mapcalc expressions, and of commands of independent stages run concurrently | Tiles overlap by the radius of the spatial window, the result is identical to the untiled one. Brightness temperatures of B10, B11 and average, delta emissivities are independent
+#% answer: 1
+#% required: no
+#%end
+
+#%option
+#% key: lst_method
+#% key_desc: method
+#% description: Method evaluating the split-window equation
+#% options: expression, folded
+#% descriptions: expression;Emissivity terms evaluated per pixel from average and delta emissivity maps;folded;Coefficients folded per land cover class and cwv subrange, looked up in maps of the land cover codes, two multiply-adds per pixel and subrange
+#% answer: expression
+#% required: no
+#%end
+
+#%option G_OPT_F_OUTPUT
+#% key: profile
+#% key_desc: filename
+#% description: Output file of the timing and resources of each stage and each spawned GRASS GIS command | Implies profiling (-p)
+#% required: no
+#%end
+
+#%option
+#% key: profile_format
+#% key_desc: format
+#% description: Format of the profile output file
+#% options: json, trace
+#% descriptions: json;Stages and commands with their measures;trace;Chrome trace event format, for chrome://tracing or Perfetto
+#% answer: json
+#% required: no
 #%end
 
 #%option G_OPT_R_OUTPUT
@@ -316,14 +465,20 @@ sys.path.insert(1, os.path.join(os.path.dirname(sys.path[0]),
                                 'etc', 'i.landsat8.swlst'))
 
 import atexit
+import itertools
 import grass.script as grass
 # from grass.exceptions import CalledModuleError
 from grass.pygrass.modules.shortcuts import general as g
 from grass.pygrass.modules.shortcuts import raster as r
 # from grass.pygrass.raster.abstract import Info
+from grass.pygrass.raster import RasterRow
+from grass.pygrass.raster.buffer import Buffer
 
 from split_window_lst import *
-from landsat8_mtl import Landsat8_MTL
+from swlst_batch import read_scene_list, run_batch
+from swlst_profile import Profiler
+from swlst_tasks import TaskGraph, TaskError
+from landsat8_mtl import load_mtl
 
 if "GISBASE" not in os.environ:
     print "You must be in GRASS GIS to run this program."
@@ -341,6 +496,17 @@ DUMMY_MAPCALC_STRING_CWV = 'Input_CWV'
 DUMMY_Ti_MEAN = 'Mean_Ti'
 DUMMY_Tj_MEAN = 'Mean_Tj'
 DUMMY_Rji = 'Ratio_ji'
+DUMMY_TiTj_MEAN = 'Mean_Product_ij'
+DUMMY_TiTi_MEAN = 'Mean_Square_i'
+DUMMY_COUNT = 'Window_Count'
+CELL_NULL = -2147483648
+BT_LOOKUP_SCALE = 1000000  # brightness temperatures looked up in micro-Kelvin
+TEMPERATURE_SCALE = 100  # scaled precision, hundredths of a degree
+
+# mask-free runs, set at startup: a map whose (non-)null cells are invalid
+mask_free = False
+validity_map = None
+validity_inverted = False
 
 
 # helper functions
@@ -351,6 +517,10 @@ def cleanup():
     grass.run_command('g.remove', flags='f', type="rast",
                       pattern='tmp.{pid}*'.format(pid=os.getpid()), quiet=True)
     
+    # a mask-free run leaves the MASK of other runs alone
+    if mask_free:
+        return
+
     if grass.find_file(name='MASK', element='cell')['file']:
         r.mask(flags='r', verbose=True)
 
@@ -381,6 +551,210 @@ def save_map(mapname):
     run('g.copy', raster=(mapname, 'DebuggingMap'))
 
 
+def import_array_engines():
+    """
+    Import NumPy and the NumPy engines (see swlst, quality_assessment,
+    column_water_vapor_arrays and split_window_lst_arrays) in to the globals
+    of the module. Called by main() only for the methods using them, runs of
+    r.mapcalc expressions alone do not import NumPy.
+    """
+    global numpy, swlst, quality_assessment
+    global column_water_vapor_arrays, split_window_lst_arrays
+    import numpy
+    import swlst
+    import quality_assessment
+    import column_water_vapor_arrays
+    import split_window_lst_arrays
+
+
+def read_rows(mapname):
+    """
+    Yield the rows of a raster map, inside the current computational region,
+    as 1D NumPy arrays of floats. Null cells are returned as NaN.
+    """
+    raster = RasterRow(mapname)
+    raster.open('r')
+    try:
+        for row in raster:
+            row = numpy.array(row, dtype=numpy.float64)
+
+            # integer nulls do not convert to NaN on their own
+            if raster.mtype == 'CELL':
+                row[row == CELL_NULL] = numpy.nan
+
+            yield row
+    finally:
+        raster.close()
+
+
+def valid_rows(rows):
+    """
+    Yield the 'rows' (see read_rows()) with cells failing the validity
+    condition of a mask-free run set to NaN. Unchanged if a MASK is used.
+    """
+    if not validity_map:
+        for row in rows:
+            yield row
+        return
+
+    for row, validity in itertools.izip(rows, read_rows(validity_map)):
+        invalid = numpy.isnan(validity)
+        if validity_inverted:
+            invalid = ~invalid
+        row[invalid] = numpy.nan
+        yield row
+
+
+def validity_expression(expression):
+    """
+    Null an r.mapcalc expression where the validity condition of a
+    mask-free run fails (see main()). Unchanged if a MASK is used.
+    """
+    if not validity_map:
+        return expression
+
+    invalid = 'isnull({map})'
+    if validity_inverted:
+        invalid = '!' + invalid
+    return 'if({invalid}, null(), {expression})'.format(
+        invalid=invalid.format(map=validity_map), expression=expression)
+
+
+def read_array(mapname):
+    """
+    Read a raster map, inside the current computational region, in to a 2D
+    NumPy array of floats. Null cells are returned as NaN.
+    """
+    return numpy.array(list(read_rows(mapname)))
+
+
+def write_array(array, outname, mtype='DCELL'):
+    """
+    Write a 2D NumPy array, shaped as the current computational region, to a
+    raster map. NaN cells are written as nulls.
+    """
+    raster = RasterRow(outname)
+    raster.open('w', mtype=mtype, overwrite=True)
+
+    row_buffer = Buffer((array.shape[1],), mtype=mtype)
+    for row in array:
+        row_buffer[:] = row
+        raster.put_row(row_buffer)
+
+    raster.close()
+
+
+def storage_type():
+    """
+    Return the raster map type of intermediate and output maps, following
+    the requested precision.
+
+    The temporary radiance, brightness temperature and column water vapor
+    maps are always stored in double precision: the column water vapor
+    selects the cwv subrange of each pixel, discontinuously, and rounding it,
+    or the temperatures it is derived from, moves pixels close to a subrange
+    boundary to the other side.
+    """
+    if precision == 'double':
+        return 'DCELL'
+    return 'FCELL'
+
+
+def storage_expression(expression, scaled=False):
+    """
+    Cast the result of an r.mapcalc expression to the requested precision.
+    For 'scaled' temperatures, round to hundredths of a degree, stored as
+    integers.
+    """
+    if scaled and precision == 'scaled':
+        return 'round(({expression}) * {scale})'.format(
+            expression=expression, scale=TEMPERATURE_SCALE)
+    if precision != 'double':
+        return 'float({expression})'.format(expression=expression)
+    return expression
+
+
+def support_scaled_temperature(mapname, title, units='Kelvin'):
+    """
+    Record the scale of a map of temperatures stored as integers in
+    hundredths of a degree.
+    """
+    description = ('{title} in hundredths of a degree, divide by {scale} '
+                   'for {units}').format(title=title, scale=TEMPERATURE_SCALE,
+                                         units=units)
+    run('r.support', map=mapname, title=title,
+        units='{units} / {scale}'.format(units=units, scale=TEMPERATURE_SCALE),
+        description=description)
+
+
+def row_tiles(rows, count, halo=0):
+    """
+    Split 'rows' in to at most 'count' tiles of consecutive rows. Returns a
+    list of (start, end, top, bottom) tuples: the tile's own rows are
+    start to end (exclusive) and, extended by a 'halo' of rows on either side
+    inside the region, top to bottom (exclusive).
+    """
+    count = max(1, min(count, rows))
+    bounds = [rows * tile // count for tile in xrange(count + 1)]
+    return [(start, end, max(0, start - halo), min(rows, end + halo))
+            for start, end in zip(bounds[:-1], bounds[1:])]
+
+
+def tiled_mapcalc(outname, expression, halo=0):
+    """
+    Evaluate an r.mapcalc expression in 'nprocs' tiles of rows in parallel and
+    patch the tiles together in to 'outname'.
+
+    Each tile is computed in its own region (via the GRASS_REGION variable)
+    extended by 'halo' rows, so that neighbourhood modifiers up to 'halo'
+    rows away read the same cells as in the full region. Rows outside a tile's
+    own rows are set to null, hence the patched map is identical to the one
+    computed in the full region.
+    """
+    if nprocs < 2:
+        grass.mapcalc(equation.format(result=outname, expression=expression),
+                      overwrite=True)
+        return
+
+    region = grass.region()
+    north = float(region['n'])
+    nsres = float(region['nsres'])
+    tiles = row_tiles(int(region['rows']), nprocs, halo)
+
+    msg = '\n |i Evaluating {name} in {count} tiles of rows in parallel'
+    g.message(msg.format(name=outname, count=len(tiles)))
+
+    tile_names = []
+    processes = []
+    for start, end, top, bottom in tiles:
+        tile_name = tmp_map_name('tile') + '.' + str(start)
+        tile_names.append(tile_name)
+
+        # row() counts from 1 at the top of the tile's extended region
+        tile_expression = ('if(row() > {first} && row() <= {last}, '
+                           '{expression}, null())')
+        tile_expression = tile_expression.format(first=start - top,
+                                                 last=end - top,
+                                                 expression=expression)
+        env = os.environ.copy()
+        env['GRASS_REGION'] = grass.region_env(n=repr(north - top * nsres),
+                                               s=repr(north - bottom * nsres),
+                                               e=region['e'], w=region['w'],
+                                               nsres=region['nsres'],
+                                               ewres=region['ewres'])
+        processes.append(grass.mapcalc_start(
+            equation.format(result=tile_name, expression=tile_expression),
+            overwrite=True, quiet=True, env=env))
+
+    failed = [process.wait() for process in processes]
+    if any(failed):
+        grass.fatal(_('Evaluating {name} in tiles failed').format(
+            name=outname))
+
+    run('r.patch', input=','.join(tile_names), output=outname, overwrite=True)
+    run('g.remove', flags='f', type='raster', name=','.join(tile_names))
+
+
 def random_digital_numbers(count=2):
     """
     Return a user-requested amount of random Digital Number values for testing
@@ -437,7 +811,7 @@ def add_timestamp(mtl_filename, outname):
     Retrieve metadata from MTL file.
     """
     import datetime
-    metadata = Landsat8_MTL(mtl_filename)
+    metadata = load_mtl(mtl_filename)
 
     # required format is: day=integer month=string year=integer time=hh:mm:ss.dd
     acquisition_date = str(metadata.date_acquired)  ### FixMe ###
@@ -453,17 +827,32 @@ def add_timestamp(mtl_filename, outname):
     del(date_time_string)
 
 
-def digital_numbers_to_radiance(outname, band, radiance_expression):
+def mapcalc_batch(equations):
     """
-    Convert Digital Number values to TOA Radiance. For details, see in Landsat8
-    class.  Zero (0) DNs set to NULL here (not via the class' function).
+    Evaluate several r.mapcalc equations, one per line, in a single
+    r.mapcalc process. The equations are evaluated in one row loop, reading
+    each input map once for all of them. A task, see swlst_tasks.
     """
-    if null:
-        msg = "\n|i Setting zero (0) Digital Numbers in {band} to NULL"
-        msg = msg.format(band=band)
-        g.message(msg)
-        run('r.null', map=band, setnull=0)
+    if len(equations) > 1:
+        msg = '\n|i Evaluating {count} equations in one r.mapcalc pass'
+        g.message(msg.format(count=len(equations)))
+
+    yield grass.mapcalc_start('\n'.join(equations), overwrite=True)
 
+    if info:
+        for batched_equation in equations:
+            outname = batched_equation.split('=', 1)[0].strip()
+            run('r.info', map=outname, flags='r')
+            #run('r.univar', map=outname)
+
+
+def digital_numbers_to_radiance(outname, band, radiance_expression):
+    """
+    Return the r.mapcalc equation converting Digital Number values to TOA
+    Radiance. For details, see in Landsat8 class.  Zero (0) DNs set to NULL
+    here (not via the class' function), in the expression, leaving the input
+    band untouched.
+    """
     msg = "\n|i Rescaling {band} digital numbers to spectral radiance "
     msg = msg.format(band=band)
 
@@ -474,23 +863,21 @@ def digital_numbers_to_radiance(outname, band, radiance_expression):
     radiance_expression = replace_dummies(radiance_expression,
                                           instring=DUMMY_MAPCALC_STRING_DN,
                                           outstring=band)
-    radiance_equation = equation.format(result=outname,
-                                        expression=radiance_expression)
-
-    grass.mapcalc(radiance_equation, overwrite=True)
-
-    if info:
-        run('r.info', map=outname, flags='r')
-        #run('r.univar', map=outname)
+    if null:
+        msg = "\n|i Setting zero (0) Digital Numbers of {band} to NULL"
+        g.message(msg.format(band=band))
+        radiance_expression = 'if({band} == 0, null(), {expression})'.format(
+            band=band, expression=radiance_expression)
+    radiance_expression = validity_expression(radiance_expression)
 
-    del(radiance_expression)
-    del(radiance_equation)
+    # double precision, see storage_type()
+    return equation.format(result=outname, expression=radiance_expression)
 
 
 def radiance_to_brightness_temperature(outname, radiance, temperature_expression):
     """
-    Convert Spectral Radiance to At-Satellite Brightness Temperature. For
-    details see Landsat8 class.
+    Return the r.mapcalc equation converting Spectral Radiance to
+    At-Satellite Brightness Temperature. For details see Landsat8 class.
     """
     temperature_expression = replace_dummies(temperature_expression,
                                              instring=DUMMY_MAPCALC_STRING_RADIANCE,
@@ -501,22 +888,47 @@ def radiance_to_brightness_temperature(outname, radiance, temperature_expression
         msg += "| Expression: " + str(temperature_expression)
     g.message(msg)
 
-    temperature_equation = equation.format(result=outname,
-                                           expression=temperature_expression)
+    # double precision, see storage_type()
+    return equation.format(result=outname, expression=temperature_expression)
 
-    grass.mapcalc(temperature_equation, overwrite=True)
 
-    if info:
-        run('r.info', map=outname, flags='r')
-        #run('r.univar', map=outname)
+def lookup_brightness_temperature(outname, band, landsat8, band_number):
+    """
+    Convert Digital Numbers to At-Satellite Brightness Temperature via a
+    look-up table of all Digital Numbers in the range of the band (see
+    Landsat8_MTL class). The table is applied by an r.reclass map, of
+    temperatures scaled to integers. Returns the r.mapcalc equation
+    rescaling it, in one pass. Neither a radiance map nor a logarithm per
+    pixel is computed.
+    """
+    band_info = grass.raster_info(band)
+    low, high = 0, 2**16 - 1
+    if band_info['min'] is not None:
+        low, high = int(band_info['min']), int(band_info['max'])
 
-    del(temperature_expression)
-    del(temperature_equation)
+    msg = ('\n|i Looking up brightness temperatures for the digital numbers '
+           '[{low}, {high}] of {band}')
+    g.message(msg.format(low=low, high=high, band=band))
 
+    # zero DNs left out of the rules, hence null
+    rules = swlst.brightness_temperature_reclass_rules(landsat8, band_number,
+                                                       low, high,
+                                                       BT_LOOKUP_SCALE, null)
+    tmp_reclass = tmp_map_name('bt_reclass') + '.' + band_number
+    grass.write_command('r.reclass', input=band, output=tmp_reclass,
+                        rules='-', stdin=rules, overwrite=True, quiet=True)
 
-def tirs_to_at_satellite_temperature(tirs_1x, mtl_file):
+    temperature_expression = '{name} / {scale}.'.format(name=tmp_reclass,
+                                                        scale=BT_LOOKUP_SCALE)
+    temperature_expression = validity_expression(temperature_expression)
+
+    # double precision, see storage_type()
+    return equation.format(result=outname, expression=temperature_expression)
+
+
+def tirs_to_at_satellite_temperatures(tirs, mtl_file, method='expression'):
     """
-    Helper function to convert TIRS bands 10 or 11 in to at-satellite
+    Helper function to convert TIRS bands 10 and/or 11 in to at-satellite
     temperatures.
 
     This function uses the pre-defined functions:
@@ -525,75 +937,192 @@ def tirs_to_at_satellite_temperature(tirs_1x, mtl_file):
     - digital_numbers_to_radiance()
     - radiance_to_brightness_temperature()
 
+    or, for the 'lookup' method and integer bands,
+    lookup_brightness_temperature().
+
     The inputs are:
 
-    - a name for the input tirs band (10 or 11)
+    - a list of names of the input tirs bands (10, 11)
     - a Landsat8 MTL file
+    - the conversion method, 'expression' or 'lookup'
 
-    The output is a temporary at-Satellite Temperature map.
+    The equations of all bands are batched, one r.mapcalc per step (see
+    mapcalc_batch()). The outputs are temporary at-Satellite Temperature
+    maps. A task (see swlst_tasks), its result is a dictionary of the names
+    of the maps by input band.
     """
-    # which band number and MTL file
-    band_number = extract_number_from_string(tirs_1x)
-    tmp_radiance = tmp_map_name('radiance') + '.' + band_number
-    tmp_brightness_temperature = tmp_map_name('brightness_temperature') + '.' + \
-        band_number
-    landsat8 = Landsat8_MTL(mtl_file)
+    landsat8 = load_mtl(mtl_file)
+    radiance_equations = []
+    temperature_equations = []
+    temperatures = {}
 
-    # rescale DNs to spectral radiance
-    radiance_expression = landsat8.toar_radiance(band_number)
-    digital_numbers_to_radiance(tmp_radiance, tirs_1x, radiance_expression)
+    for tirs_1x in tirs:
 
-    # convert spectral radiance to at-satellite temperature
-    temperature_expression = landsat8.radiance_to_temperature(band_number)
-    radiance_to_brightness_temperature(tmp_brightness_temperature,
-                                       tmp_radiance,
-                                       temperature_expression)
+        # which band number
+        band_number = extract_number_from_string(tirs_1x)
+        tmp_radiance = tmp_map_name('radiance') + '.' + band_number
+        tmp_brightness_temperature = tmp_map_name('brightness_temperature') + \
+            '.' + band_number
+        temperatures[tirs_1x] = tmp_brightness_temperature
 
-    del(radiance_expression)
-    del(temperature_expression)
+        if (method == 'lookup' and
+                grass.raster_info(tirs_1x)['datatype'] == 'CELL'):
+            temperature_equations.append(lookup_brightness_temperature(
+                tmp_brightness_temperature, tirs_1x, landsat8, band_number))
 
-    # save Brightness Temperature map?
-    if brightness_temperature_prefix:
-        bt_output = brightness_temperature_prefix + band_number
-        run('g.rename', raster=(tmp_brightness_temperature, bt_output))
-        tmp_brightness_temperature = bt_output
-        del(bt_output)
-
-    return tmp_brightness_temperature
-
-
-def mask_clouds(qa_band, qa_pixel):
+        else:
+            # rescale DNs to spectral radiance
+            radiance_expression = landsat8.toar_radiance(band_number)
+            radiance_equations.append(digital_numbers_to_radiance(
+                tmp_radiance, tirs_1x, radiance_expression))
+
+            # convert spectral radiance to at-satellite temperature
+            temperature_expression = landsat8.radiance_to_temperature(
+                band_number)
+            temperature_equations.append(radiance_to_brightness_temperature(
+                tmp_brightness_temperature, tmp_radiance,
+                temperature_expression))
+
+            del(radiance_expression)
+            del(temperature_expression)
+
+    if radiance_equations:
+        for process in mapcalc_batch(radiance_equations):
+            yield process
+    for process in mapcalc_batch(temperature_equations):
+        yield process
+
+    # save Brightness Temperature maps, in copies of the requested precision?
+    if brightness_temperature_prefix and precision != 'double':
+        bt_outputs = []
+        bt_equations = []
+        for tirs_1x in tirs:
+            bt_output = (brightness_temperature_prefix +
+                         extract_number_from_string(tirs_1x))
+            bt_outputs.append(bt_output)
+            bt_expression = storage_expression(temperatures[tirs_1x],
+                                               scaled=True)
+            bt_equations.append(equation.format(result=bt_output,
+                                                expression=bt_expression))
+        for process in mapcalc_batch(bt_equations):
+            yield process
+        if precision == 'scaled':
+            for bt_output in bt_outputs:
+                support_scaled_temperature(bt_output,
+                                           'Brightness temperature')
+
+    elif brightness_temperature_prefix:
+        for tirs_1x in tirs:
+            bt_output = (brightness_temperature_prefix +
+                         extract_number_from_string(tirs_1x))
+            run('g.rename', raster=(temperatures[tirs_1x], bt_output))
+            temperatures[tirs_1x] = bt_output
+            del(bt_output)
+
+    yield temperatures
+
+
+def mask_clouds(qa_band, qa_pixel, qa_conditions=''):
     """
-    ToDo:
-
-    - a better, independent mechanism for QA. --> see also Landsat8 class.
-    - support for multiple qa_pixel values (eg. input as a list of values)
-
     Create and apply a cloud mask based on the Quality Assessment Band
     (BQA.) Source: <http://landsat.usgs.gov/L8QualityAssessmentBand.php
 
+    Pixels are masked if equal to any of the 'qa_pixel' values or matching
+    any of the named 'qa_conditions' (see quality_assessment). The bit logic
+    is evaluated once per distinct value of the QA band and the clear values
+    are applied as the categories of a reclassified MASK, a lookup without a
+    pass materialising the MASK.
+
     See also:
     http://courses.neteler.org/processing-landsat8-data-in-grass-gis-7/#Applying_the_Landsat_8_Quality_Assessment_%28QA%29_Band
     """
     msg = ('\n|i Masking for pixel values <{qap}> '
            'in the Quality Assessment band.'.format(qap=qa_pixel))
+    if qa_conditions:
+        msg += ' Conditions: <{conditions}>'.format(conditions=qa_conditions)
     g.message(msg)
 
-    #tmp_cloudmask = tmp_map_name('cloudmask')
-    #qabits_expression = 'if({band} == {pixel}, 1, null())'.format(band=qa_band,
-    #                                                              pixel=qa_pixel)
+    clear = qa_clear_categories(qa_band, qa_pixel, qa_conditions)
+    r.mask(raster=qa_band, maskcats=clear, overwrite=True)
 
-    #cloud_masking_equation = equation.format(result=tmp_cloudmask,
-    #                                         expression=qabits_expression)
-    #grass.mapcalc(cloud_masking_equation)
 
-    r.mask(raster=qa_band, maskcats=qa_pixel, flags='i', overwrite=True)
+def qa_clear_categories(qa_band, qa_pixel, qa_conditions=''):
+    """
+    Return the clear values of the Quality Assessment band, as categories
+    for r.mask or r.reclass (see mask_clouds()).
+    """
+    pixels = [int(value) for value in qa_pixel.split(',') if value.strip()]
+    try:
+        quality_assessment.parse_conditions(qa_conditions)
+    except ValueError as error:
+        grass.fatal(str(error))
+
+    values = [int(float(line.split()[0])) for line in
+              grass.read_command('r.stats', input=qa_band, flags='n',
+                                 quiet=True).splitlines() if line.strip()]
+    masked = quality_assessment.lookup_table(values, qa_conditions, pixels)
+    clear = quality_assessment.clear_categories(values, masked)
+    if not clear:
+        grass.fatal(_('All pixels of <{band}> are masked by the quality '
+                      'assessment'.format(band=qa_band)))
+
+    msg = ('|i {masked} of {count} distinct QA values masked'
+           .format(masked=int(masked.sum()), count=len(values)))
+    grass.verbose(msg)
+    return clear
+
+
+def qa_validity_map(qa_band, qa_pixel, qa_conditions=''):
+    """
+    Return a temporary map of the Quality Assessment band reclassified to 1
+    for clear values and null otherwise, for mask-free runs. A reclassified
+    map is a lookup table, not a pass over the band.
+    """
+    msg = ('\n|i Nulling pixel values <{qap}> of the Quality Assessment '
+           'band in the computations.'.format(qap=qa_pixel))
+    if qa_conditions:
+        msg += ' Conditions: <{conditions}>'.format(conditions=qa_conditions)
+    g.message(msg)
+
+    clear = qa_clear_categories(qa_band, qa_pixel, qa_conditions)
+    tmp_qa_clear = tmp_map_name('qa_clear')
+    grass.write_command('r.reclass', input=qa_band, output=tmp_qa_clear,
+                        rules='-', stdin=clear + ' = 1\n', overwrite=True,
+                        quiet=True)
+    return tmp_qa_clear
 
-    # save for debuging
-    #save_map(tmp_cloudmask)
 
-    #del(qabits_expression)
-    #del(cloud_masking_equation)
+def valid_temperatures(names):
+    """
+    Copy given at-satellite temperature maps, nulled where the validity
+    condition of a mask-free run fails, in one r.mapcalc pass (see
+    mapcalc_batch()). A task (see swlst_tasks), its result is the list of
+    names of the copies.
+    """
+    msg = '\n|i Nulling invalid pixels of {names}'
+    g.message(msg.format(names=', '.join(names)))
+
+    outnames = []
+    equations = []
+    for name in names:
+        outname = tmp_map_name('valid') + '.' + grass.basename(name)
+        outnames.append(outname)
+        equations.append(equation.format(
+            result=outname, expression=validity_expression(name)))
+    for process in mapcalc_batch(equations):
+        yield process
+    yield outnames
+
+
+def run_tasks(tasks):
+    """
+    Run a TaskGraph (see swlst_tasks), fatal if a command fails. Returns the
+    results by task name.
+    """
+    try:
+        return tasks.run()
+    except TaskError as error:
+        grass.fatal(str(error))
 
 
 def replace_dummies(string, *args, **kwargs):
@@ -691,8 +1220,8 @@ def replace_dummies(string, *args, **kwargs):
 
 def determine_average_emissivity(outname, landcover_map, avg_lse_expression):
     """
-    Produce an average emissivity map based on FROM-GLC map covering the region
-    of interest.
+    Return the r.mapcalc equation producing an average emissivity map based on
+    FROM-GLC map covering the region of interest.
     """
     msg = ('\n|i Determining average land surface emissivity based on a '
            'look-up table ')
@@ -705,26 +1234,14 @@ def determine_average_emissivity(outname, landcover_map, avg_lse_expression):
                                          instring=DUMMY_MAPCALC_STRING_FROM_GLC,
                                          outstring=landcover_map)
 
-    avg_lse_equation = equation.format(result=outname,
-                                       expression=avg_lse_expression)
-
-    grass.mapcalc(avg_lse_equation, overwrite=True)
-
-    if info:
-        run('r.info', map=outname, flags='r')
-
-    del(avg_lse_expression)
-    del(avg_lse_equation)
-    
-    # save land surface emissivity map?
-    if emissivity_output:
-        run('g.rename', raster=(outname, emissivity_output))
+    return equation.format(result=outname,
+                           expression=storage_expression(avg_lse_expression))
 
 
 def determine_delta_emissivity(outname, landcover_map, delta_lse_expression):
     """
-    Produce a delta emissivity map based on the FROM-GLC map covering the
-    region of interest.
+    Return the r.mapcalc equation producing a delta emissivity map based on
+    the FROM-GLC map covering the region of interest.
     """
     msg = ('\n|i Determining delta land surface emissivity based on a '
            'look-up table ')
@@ -737,73 +1254,103 @@ def determine_delta_emissivity(outname, landcover_map, delta_lse_expression):
                                            instring=DUMMY_MAPCALC_STRING_FROM_GLC,
                                            outstring=landcover_map)
 
-    delta_lse_equation = equation.format(result=outname,
-                                         expression=delta_lse_expression)
+    return equation.format(result=outname,
+                           expression=storage_expression(delta_lse_expression))
 
-    grass.mapcalc(delta_lse_equation, overwrite=True)
+
+def lookup_emissivity(outname, landcover_map, table, output=None,
+                      scale=10000):
+    """
+    Produce an emissivity map from a 256-entry look-up table indexed by the
+    FROM-GLC land cover codes (see emissivity_lookup_tables() of
+    split_window_lst_arrays).
+
+    A temporary map is an r.reclass map of emissivities scaled by 'scale'. No
+    new raster is written and the returned r.mapcalc expression rescales it.
+    If an 'output' is requested, or if scaling would round the emissivities,
+    a floating point map is written via r.recode and its name is returned.
+    A task (see swlst_tasks), its result is the expression.
+    """
+    msg = ('\n|i Looking up land surface emissivities for the land cover '
+           'codes of {landcover}')
+    g.message(msg.format(landcover=landcover_map))
+
+    known = table[~numpy.isnan(table)]
+    scaled = known * scale
+    lossless = numpy.allclose(scaled, numpy.round(scaled), rtol=0, atol=1e-6)
+
+    if output or not lossless:
+        outname = output or outname
+        rules = split_window_lst_arrays.emissivity_recode_rules(table)
+        rules_file = grass.tempfile()
+        with open(rules_file, 'w') as recode_rules:
+            recode_rules.write(rules)
+        yield grass.start_command('r.recode', input=landcover_map,
+                                  output=outname, rules=rules_file,
+                                  overwrite=True, quiet=True)
+        expression = outname
+
+    else:
+        rules = split_window_lst_arrays.emissivity_reclass_rules(table,
+                                                                 scale)
+        grass.write_command('r.reclass', input=landcover_map, output=outname,
+                            rules='-', stdin=rules, overwrite=True,
+                            quiet=True)
+        expression = '({name} / {scale}.)'.format(name=outname, scale=scale)
 
     if info:
         run('r.info', map=outname, flags='r')
 
-    del(delta_lse_expression)
-    del(delta_lse_equation)
+    yield expression
 
-    # save delta land surface emissivity map?
-    if delta_emissivity_output:
-        run('g.rename', raster=(outname, delta_emissivity_output))
 
-
-def get_cwv_window_means(outname, t1x, t1x_mean_expression):
+def lookup_folded_coefficient(outname, landcover_map, table):
     """
-
-    ***
-    This function is NOT used.  It was part of an initial step-by-step approach,
-    while coding and testing.  Kept for future plans!?
-    ***
-
-    Get window means for T1x
+    Produce a map of a folded split-window coefficient from a 256-entry
+    look-up table indexed by the FROM-GLC land cover codes (see
+    folded_lookup_tables() of split_window_lst_arrays), via r.recode. Codes
+    of unknown classes are null. A task (see swlst_tasks), its result is the
+    name of the map.
     """
-    msg = ('\n |i Deriving window means from {Tx} ')
-    msg += ('using the expression:\n {exp}')
-    msg = msg.format(Tx=t1x, exp=t1x_mean_expression)
-    g.message(msg)
+    rules_file = grass.tempfile()
+    with open(rules_file, 'w') as recode_rules:
+        recode_rules.write(
+            split_window_lst_arrays.emissivity_recode_rules(table))
 
-    tx_mean_equation = equation.format(result=outname,
-                                       expression=t1x_mean_expression)
-    grass.mapcalc(tx_mean_equation, overwrite=True)
+    # double precision unless requested otherwise, see storage_type()
+    recode_flags = 'd' if precision == 'double' else ''
+    yield grass.start_command('r.recode', input=landcover_map, output=outname,
+                              rules=rules_file, flags=recode_flags,
+                              overwrite=True, quiet=True)
 
     if info:
         run('r.info', map=outname, flags='r')
 
-    del(t1x_mean_expression)
-    del(tx_mean_equation)
-    
-    # save for debuging
-    #save_map(outname)
+    yield outname
 
 
-def estimate_ratio_ji(outname, tmp_ti_mean, tmp_tj_mean, ratio_expression):
+def get_cwv_window_means(outname, t1x, window_size, count_outname=None):
     """
+    Get window means for T1x via r.neighbors. Part of the multi-pass approach
+    estimating the column water vapor without neighbourhood modifiers.
 
-    ***
-    This function is NOT used.  It was part of an initial step-by-step approach,
-    while coding and testing.  Kept for future plans!?
-    ***
-
-    Estimate Ratio ji for the Column Water Vapor retrieval equation.
+    Optionally, write the count of non-null pixels in each window to
+    'count_outname', as required to null incomplete windows.
     """
-    msg = '\n |i Estimating ratio Rji...'
-    msg += '\n' + ratio_expression
+    msg = ('\n |i Deriving window means from {Tx} '
+           'via r.neighbors, window size {n}')
+    msg = msg.format(Tx=t1x, n=window_size)
     g.message(msg)
 
-    ratio_expression = replace_dummies(ratio_expression,
-                                       in_ti=DUMMY_Ti_MEAN, out_ti=tmp_ti_mean,
-                                       in_tj=DUMMY_Tj_MEAN, out_tj=tmp_tj_mean)
+    methods = 'average'
+    outputs = outname
 
-    ratio_equation = equation.format(result=outname,
-                                     expression=ratio_expression)
+    if count_outname:
+        methods += ',count'
+        outputs += ',' + count_outname
 
-    grass.mapcalc(ratio_equation, overwrite=True)
+    run('r.neighbors', input=t1x, output=outputs, method=methods,
+        size=window_size, overwrite=True)
 
     if info:
         run('r.info', map=outname, flags='r')
@@ -812,24 +1359,43 @@ def estimate_ratio_ji(outname, tmp_ti_mean, tmp_tj_mean, ratio_expression):
     #save_map(outname)
 
 
-def estimate_column_water_vapor(outname, ratio, cwv_expression):
+def estimate_ratio_ji(means, ratio_expression):
     """
+    Estimate Ratio ji for the Column Water Vapor retrieval equation. Returns
+    the ratio expression in which the dummy strings are replaced by the names
+    of the maps in 'means', a dictionary keyed by dummy strings. The result is
+    meant to be combined with the column water vapor expression in one small
+    mapcalc expression.
+    """
+    msg = '\n |i Estimating ratio Rji...'
+    if info:
+        msg += '\n' + ratio_expression
+    g.message(msg)
+
+    for dummy, mean in means.items():
+        ratio_expression = replace_dummies(ratio_expression,
+                                           instring=dummy,
+                                           outstring=mean)
 
-    ***
-    This function is NOT used.  It was part of an initial step-by-step approach,
-    while coding and testing.  Kept for future plans!?
-    ***
+    return ratio_expression
 
+
+def estimate_column_water_vapor(outname, ratio, cwv_expression):
+    """
+    Estimate the column water vapor from the ratio Rji, either a map or a
+    mapcalc expression (see estimate_ratio_ji()).
     """
     msg = "\n|i Estimating atmospheric column water vapor "
-    msg += '| Mapcalc expression: '
-    msg += cwv_expression
+    if info:
+        msg += '| Mapcalc expression: '
+        msg += cwv_expression
     g.message(msg)
 
     cwv_expression = replace_dummies(cwv_expression,
                                      instring=DUMMY_Rji,
-                                     outstring=ratio)
+                                     outstring='(' + ratio + ')')
 
+    # double precision, see storage_type()
     cwv_equation = equation.format(result=outname, expression=cwv_expression)
 
     grass.mapcalc(cwv_equation, overwrite=True)
@@ -837,18 +1403,71 @@ def estimate_column_water_vapor(outname, ratio, cwv_expression):
     if info:
         run('r.info', map=outname, flags='r')
 
-    # save Column Water Vapor map?
-    if cwv_output:
-        run('g.rename', raster=(outname, cwv_output))
-
     # save for debuging
     #save_map(outname)
 
 
-def estimate_cwv_big_expression(outname, t10, t11, cwv_expression):
+def estimate_cwv_window_moments(outname, t10, t11, cwv):
+    """
+    Derive a column water vapor map in multiple passes, using GRASS GIS
+    modules only:
+
+    - products (T10 - o10) * (T11 - o11) and (T10 - o10)^2, where o1x is the
+      center of the range of T1x, keeping the moments small in magnitude
+    - window means of T10, T11 and of both products, via r.neighbors
+    - Rji and column water vapor via one small r.mapcalc expression
+    """
+    info_t10 = grass.raster_info(t10)
+    offset_t10 = (info_t10['min'] + info_t10['max']) / 2
+    offset_t11 = grass.raster_info(t11)
+    offset_t11 = (offset_t11['min'] + offset_t11['max']) / 2
+
+    tmp_ti_tj = tmp_map_name('ti_tj')
+    tmp_ti_ti = tmp_map_name('ti_ti')
+    ti = '({t10} - {o10})'.format(t10=t10, o10=offset_t10)
+    tj = '({t11} - {o11})'.format(t11=t11, o11=offset_t11)
+
+    product_equation = equation.format(result=tmp_ti_tj,
+                                       expression=ti + ' * ' + tj)
+    grass.mapcalc(product_equation, overwrite=True)
+
+    square_equation = equation.format(result=tmp_ti_ti,
+                                      expression=ti + '^2')
+    grass.mapcalc(square_equation, overwrite=True)
+
+    # window means
+    window_size = 2 * cwv.window_radius + 1
+    tmp_ti_mean = tmp_map_name('ti_mean')
+    tmp_tj_mean = tmp_map_name('tj_mean')
+    tmp_ti_tj_mean = tmp_map_name('ti_tj_mean')
+    tmp_ti_ti_mean = tmp_map_name('ti_ti_mean')
+    tmp_count = tmp_map_name('count')
+
+    get_cwv_window_means(tmp_ti_mean, t10, window_size,
+                         count_outname=tmp_count)
+    get_cwv_window_means(tmp_tj_mean, t11, window_size)
+    get_cwv_window_means(tmp_ti_tj_mean, tmp_ti_tj, window_size)
+    get_cwv_window_means(tmp_ti_ti_mean, tmp_ti_ti, window_size)
+
+    # means of the shifted T10, T11
+    means = {DUMMY_Ti_MEAN: '({m} - {o})'.format(m=tmp_ti_mean, o=offset_t10),
+             DUMMY_Tj_MEAN: '({m} - {o})'.format(m=tmp_tj_mean, o=offset_t11),
+             DUMMY_TiTj_MEAN: tmp_ti_tj_mean,
+             DUMMY_TiTi_MEAN: tmp_ti_ti_mean,
+             DUMMY_COUNT: tmp_count}
+
+    # rounding errors of the means scale with the unshifted temperatures
+    scale = max(abs(info_t10['min']), abs(info_t10['max'])) ** 2
+    ratio = estimate_ratio_ji(means, cwv._ratio_ji_moments_expression(scale))
+    estimate_column_water_vapor(outname, ratio,
+                                cwv.column_water_vapor_expression)
+
+
+def estimate_cwv_big_expression(outname, t10, t11, cwv_expression, halo=0):
     """
     Derive a column water vapor map using a single mapcalc expression based on
-    eval.
+    eval. The expression reads neighbours up to 'halo' rows away, the overlap
+    of the tiles evaluated in parallel (see tiled_mapcalc()).
 
             *** To Do: evaluate -- does it work correctly? *** !
     """
@@ -864,34 +1483,343 @@ def estimate_cwv_big_expression(outname, t10, t11, cwv_expression):
         msg += '\n'
         print msg
 
-    cwv_equation = equation.format(result=outname, expression=cwv_expression)
-    grass.mapcalc(cwv_equation, overwrite=True)
+    # double precision, see storage_type()
+    tiled_mapcalc(outname, cwv_expression, halo)
+
+    if info:
+        run('r.info', map=outname, flags='r')
+
+    del(cwv_expression)
+
+
+def estimate_cwv_summed_area_tables(outname, t10, t11, cwv, tables=None,
+                                    stride=1):
+    """
+    Derive a column water vapor map from window statistics looked up in
+    summed-area tables of T10, T11 (see Column_Water_Vapor class). The cost
+    per pixel does not depend on the size of the spatial window.
+
+    The 'tables' built by window_moment_tables() of column_water_vapor_arrays
+    may be passed in, to share
+    a single read of T10, T11 among several window sizes.
+
+    With a 'stride' k > 1, the column water vapor is evaluated at every k-th
+    row and column only and bilinearly interpolated in between.
+    """
+    msg = ("\n|i Estimating atmospheric column water vapor "
+           "| Window statistics from summed-area tables")
+    if stride > 1:
+        msg += " | Coarse grid of every {k}th pixel".format(k=stride)
+    g.message(msg)
+
+    if tables is None:
+        tables = column_water_vapor_arrays.window_moment_tables(
+            read_array(t10), read_array(t11))
+
+    cwv_array = column_water_vapor_arrays.compute_column_water_vapor_array(
+        cwv, None, None, tables, stride=stride)
+
+    if stride > 1 and stride_deviation:
+        maximum, mean = column_water_vapor_arrays.stride_deviation(cwv, tables,
+                                                                   stride)
+        msg = ('\n|i Deviation of the interpolated from the exact column '
+               'water vapor (g/cm^2) for a {n}^2 window and a stride of {k}: '
+               'maximum {max:.4f}, mean {mean:.4f}')
+        g.message(msg.format(n=cwv.window_size, k=stride, max=maximum,
+                             mean=mean))
+    write_array(cwv_array, outname, 'DCELL')
+    del(cwv_array)
+
+    if info:
+        run('r.info', map=outname, flags='r')
+
+
+def estimate_cwv_sliding_median(outname, t10, t11, cwv):
+    """
+    Derive a column water vapor map centered on the window medians of T10,
+    T11 (see Column_Water_Vapor class). The medians are maintained in running
+    histograms while the window slides along each row, at a resolution of
+    0.01 K.
+    """
+    msg = ("\n|i Estimating atmospheric column water vapor "
+           "| Window medians from sliding histograms")
+    g.message(msg)
+
+    cwv_array = \
+        column_water_vapor_arrays.compute_column_water_vapor_median_array(
+            cwv, read_array(t10), read_array(t11))
+    write_array(cwv_array, outname, 'DCELL')
+    del(cwv_array)
+
+    if info:
+        run('r.info', map=outname, flags='r')
+
+
+def estimate_cwv_row_stream(outname, t10, t11, cwv, memory):
+    """
+    Derive a column water vapor map row by row. T10 and T11 are read one row
+    at a time, the window statistics of the last window_size rows are kept in
+    a ring buffer and each output row is written as soon as its neighbourhood
+    is complete (see Column_Water_Vapor class).
+
+    Peak memory is proportional to the window size times the number of
+    columns and is checked against the 'memory' budget (MB).
+    """
+    columns = int(grass.region()['cols'])
+    required = cwv.stream_buffer_bytes(columns) / 1024. ** 2
+    if required > memory:
+        grass.fatal(_('Streaming a spatial window of size {n} over {cols} '
+                      'columns requires about {req:.1f} MB, more than the '
+                      'memory budget of {mem} MB.').format(n=cwv.window_size,
+                                                          cols=columns,
+                                                          req=required,
+                                                          mem=memory))
+
+    msg = ("\n|i Estimating atmospheric column water vapor "
+           "| Streaming rows, ring buffer of about {req:.1f} MB")
+    g.message(msg.format(req=required))
+
+    raster_t10 = RasterRow(t10)
+    raster_t10.open('r')
+    raster_t11 = RasterRow(t11)
+    raster_t11.open('r')
+
+    # double precision, see storage_type()
+    raster_cwv = RasterRow(outname)
+    raster_cwv.open('w', mtype='DCELL', overwrite=True)
+    row_buffer = Buffer((columns,), mtype='DCELL')
+
+    for row in column_water_vapor_arrays.stream_column_water_vapor(
+            cwv, raster_t10, raster_t11):
+        row_buffer[:] = row
+        raster_cwv.put_row(row_buffer)
+
+    raster_cwv.close()
+    raster_t11.close()
+    raster_t10.close()
 
     if info:
         run('r.info', map=outname, flags='r')
 
-    # save Column Water Vapor map?
+
+def fused_single_pass(tirs, landsat8, split_window_lst, cwv_window_sizes,
+                      lst_output, lst_method, memory,
+                      average_emissivity_map=None, delta_emissivity_map=None):
+    """
+    Derive the land surface temperature, for each spatial window size, in one
+    pass over the rows of the input maps. The rescaling to radiance and
+    brightness temperature (see Landsat8_MTL class), the emissivity look-up,
+    the column water vapor window statistics (streamed through a ring buffer,
+    see Column_Water_Vapor class) and the split-window equation are composed
+    per row. Only the requested outputs are written, intermediate ones
+    (prefix_bt, cwv, emissivity_out, delta_emissivity_out) from the same
+    pass. The current MASK applies while reading. Unless the precision is
+    'double', emissivities and the land surface temperature are computed in
+    single precision, brightness temperatures and the column water vapor,
+    which selects the cwv subranges, in double precision (see
+    lst_from_arrays() in swlst).
+
+    'tirs' holds a (map name, band number) pair for each of the bands 10, 11.
+    With a band number, the map holds digital numbers, converted via the
+    'landsat8' metadata. Else, it holds brightness temperatures.
+
+    Returns the lists of LST and CWV output map names.
+    """
+    region = grass.region()
+    rows = int(region['rows'])
+    columns = int(region['cols'])
+
+    cwvs = [Column_Water_Vapor(size, *[name for name, band in tirs])
+            for size in cwv_window_sizes]
+    largest_window = max(cwv.window_radius for cwv in cwvs) * 2 + 1
+
+    # ring buffers plus the input rows kept until their outputs are complete
+    required = sum(cwv.stream_buffer_bytes(columns) for cwv in cwvs)
+    required += 8 * columns * 6 * (largest_window + 1)
+    required /= 1024. ** 2
+    if required > memory:
+        grass.fatal(_('A fused pass over {cols} columns with a largest '
+                      'spatial window of size {n} requires about {req:.1f} '
+                      'MB, more than the memory budget of {mem} '
+                      'MB.').format(cols=columns, n=largest_window,
+                                    req=required, mem=memory))
+
+    msg = ('\n|i Fused single pass: brightness temperatures, emissivities, '
+           'column water vapor and land surface temperature per row, about '
+           '{req:.1f} MB')
+    g.message(msg.format(req=required))
+
+    # inputs
+    if precision == 'double':
+        dtype = numpy.float64
+    else:
+        dtype = numpy.float32
+    band_rows = [read_rows(name) for name, band in tirs]
+    if validity_map:
+        validity_rows = valid_rows(numpy.zeros(columns)
+                                   for row in xrange(rows))
+
+    fixed_emissivities = bool(split_window_lst.landcover_class)
+    read_emissivities = (not fixed_emissivities and average_emissivity_map and
+                         delta_emissivity_map)
+    read_landcover = not fixed_emissivities and (not read_emissivities or
+                                                 lst_method == 'folded')
+    if read_emissivities:
+        avg_lse_rows = read_rows(average_emissivity_map)
+        delta_lse_rows = read_rows(delta_emissivity_map)
+    if read_landcover:
+        landcover_rows = read_rows(landcover_map)
+        lse_tables = [table.astype(dtype) for table in
+                      split_window_lst_arrays.emissivity_lookup_tables()]
+
+    def read_bundles():
+        """
+        Yield the input rows, as dictionaries, converted to brightness
+        temperatures and emissivities (see split_window_rows()).
+        """
+        for row in xrange(rows):
+            bundle = {}
+            for key, rows_1x, (name, band) in zip(('t10', 't11'), band_rows,
+                                                  tirs):
+                if band:
+                    bundle[key] = swlst.brightness_temperature(
+                        next(rows_1x), landsat8, band, null)
+                else:
+                    bundle[key] = next(rows_1x)
+
+            # cells nulled by the validity condition of a mask-free run
+            if validity_map:
+                invalid = numpy.isnan(next(validity_rows))
+                bundle['t10'][invalid] = numpy.nan
+                bundle['t11'][invalid] = numpy.nan
+
+            if fixed_emissivities:
+                bundle['avg_lse'] = split_window_lst.average_emissivity
+                bundle['delta_lse'] = split_window_lst.delta_emissivity
+            if read_landcover:
+                bundle['landcover'] = next(landcover_rows)
+                bundle['avg_lse'], bundle['delta_lse'] = \
+                    split_window_lst_arrays.lookup_emissivities(
+                        bundle['landcover'], lse_tables)
+            if read_emissivities:
+                bundle['avg_lse'] = next(avg_lse_rows)
+                bundle['delta_lse'] = next(delta_lse_rows)
+
+            yield bundle
+
+    # outputs, temperatures optionally scaled to integers
+    writers = []
+    row_buffers = {}
+
+    def open_output(name, scaled=False):
+        if scaled and precision == 'scaled':
+            mtype = 'CELL'
+        else:
+            mtype = storage_type()
+        raster = RasterRow(name)
+        raster.open('w', mtype=mtype, overwrite=True)
+        writers.append(raster)
+        if mtype not in row_buffers:
+            row_buffers[mtype] = Buffer((columns,), mtype=mtype)
+        return raster
+
+    def put_row(raster, values):
+        if raster.mtype == 'CELL':
+            values = numpy.where(numpy.isnan(values), CELL_NULL,
+                                 numpy.round(values * TEMPERATURE_SCALE))
+        row_buffer = row_buffers[raster.mtype]
+        row_buffer[:] = values
+        raster.put_row(row_buffer)
+
+    bt_outputs = {}
+    if brightness_temperature_prefix:
+        for key, (name, band) in zip(('t10', 't11'), tirs):
+            if band:
+                bt_outputs[key] = open_output(brightness_temperature_prefix +
+                                              band, scaled=True)
+
+    lse_outputs = {}
+    if read_landcover and emissivity_output:
+        lse_outputs['avg_lse'] = open_output(emissivity_output)
+    if read_landcover and delta_emissivity_output:
+        lse_outputs['delta_lse'] = open_output(delta_emissivity_output)
+
+    if len(cwv_window_sizes) > 1:
+        window_suffixes = ['_w' + str(size) for size in cwv_window_sizes]
+    else:
+        window_suffixes = ['']
+
+    lst_outputs = [lst_output + suffix for suffix in window_suffixes]
+    lst_writers = [open_output(name, scaled=True) for name in lst_outputs]
+    cwv_outputs = []
+    cwv_writers = []
     if cwv_output:
+        cwv_outputs = [cwv_output + suffix for suffix in window_suffixes]
+        cwv_writers = [open_output(name) for name in cwv_outputs]
 
-        # strings for metadata
-        history_cwv = 'FixMe -- Column Water Vapor model: '
-        history_cwv += 'FixMe -- Add equation?'
-        title_cwv = 'Column Water Vapor'
-        description_cwv = 'Column Water Vapor'
-        units_cwv = 'g/cm^2'
-        source1_cwv = 'FixMe'
-        source2_cwv = 'FixMe'
+    for bundle, cwv_rows, lst_rows in \
+            swlst.split_window_rows(read_bundles(), split_window_lst,
+                                    cwv_window_sizes, lst_method == 'folded',
+                                    dtype):
 
-        # history entry
-        run("r.support", map=outname, title=title_cwv,
-            units=units_cwv, description=description_cwv,
-            source1=source1_cwv, source2=source2_cwv,
-            history=history_cwv)
+        for key, raster in bt_outputs.items() + lse_outputs.items():
+            put_row(raster, bundle[key])
+
+        for window, (cwv_row, lst_row) in enumerate(zip(cwv_rows, lst_rows)):
+            if cwv_writers:
+                put_row(cwv_writers[window], cwv_row)
+            if celsius:
+                lst_row = lst_row - 273.15
+            put_row(lst_writers[window], lst_row)
+
+    for raster in writers:
+        raster.close()
 
+    if precision == 'scaled':
+        for raster in bt_outputs.values():
+            support_scaled_temperature(raster.name, 'Brightness temperature')
+
+    if info:
+        for name in lst_outputs + cwv_outputs:
+            run('r.info', map=name, flags='r')
+
+    return lst_outputs, cwv_outputs
+
+
+def save_cwv_map(outname, cwv_output):
+    """
+    Add metadata to a column water vapor map and rename it to the requested
+    output name. Unless the precision is 'double', the output is a copy of
+    the requested precision instead (see storage_type()).
+
+    Returns the name of the double precision map to derive the land surface
+    temperature from.
+    """
+    # strings for metadata
+    history_cwv = 'FixMe -- Column Water Vapor model: '
+    history_cwv += 'FixMe -- Add equation?'
+    title_cwv = 'Column Water Vapor'
+    description_cwv = 'Column Water Vapor'
+    units_cwv = 'g/cm^2'
+    source1_cwv = 'FixMe'
+    source2_cwv = 'FixMe'
+
+    if precision != 'double':
+        grass.mapcalc(equation.format(result=cwv_output,
+                                      expression=storage_expression(outname)),
+                      overwrite=True)
+    else:
         run('g.rename', raster=(outname, cwv_output))
 
-    del(cwv_expression)
-    del(cwv_equation)
+    # history entry
+    run("r.support", map=cwv_output, title=title_cwv,
+        units=units_cwv, description=description_cwv,
+        source1=source1_cwv, source2=source2_cwv,
+        history=history_cwv)
+
+    if precision != 'double':
+        return outname
+    return cwv_output
 
 
 def estimate_lst(outname, t10, t11, avg_lse_map, delta_lse_map, cwv_map, lst_expression):
@@ -940,37 +1868,67 @@ def estimate_lst(outname, t10, t11, avg_lse_map, delta_lse_map, cwv_map, lst_exp
     # Convert to Celsius?
     if celsius:
         split_window_expression = '({swe}) - 273.15'.format(swe=split_window_expression)
-        split_window_equation = equation.format(result=outname,
-                                            expression=split_window_expression)
-    else:
-        split_window_equation = equation.format(result=outname,
-                                            expression=split_window_expression)
 
-    grass.mapcalc(split_window_equation, overwrite=True)
+    tiled_mapcalc(outname, storage_expression(split_window_expression,
+                                              scaled=True))
 
     if info:
         run('r.info', map=outname, flags='r')
 
     del(split_window_expression)
-    del(split_window_equation)
+
+def process_scenes(scene_list, workers):
+    """
+    Process the scenes of a scene list (see swlst_batch) on a pool of worker
+    processes and report the success or failure of each scene.
+    """
+    scenes = read_scene_list(scene_list)
+    if not scenes:
+        grass.fatal(_('No scenes listed in {name}').format(name=scene_list))
+
+    msg = '\n|i Processing {count} scenes on {workers} worker processes'
+    g.message(msg.format(count=len(scenes), workers=workers))
+
+    results = run_batch(scenes, options, flags, workers)
+
+    for result in results:
+        if result.success:
+            msg = '|i Scene {name}: done in {seconds:.0f} s | Maps: {maps}'
+            g.message(msg.format(name=result.scene.name,
+                                 seconds=result.seconds,
+                                 maps=', '.join(result.outputs)))
+        else:
+            msg = 'Scene {name}: failed after {seconds:.0f} s | {message}'
+            grass.warning(msg.format(name=result.scene.name,
+                                     seconds=result.seconds,
+                                     message=result.message))
+
+    failed = len([result for result in results if not result.success])
+    msg = '\n|i {done} of {count} scenes processed successfully'
+    g.message(msg.format(done=len(results) - failed, count=len(results)))
+
+    if failed == len(results):
+        grass.fatal(_('All scenes failed'))
+
 
 def main():
     """
     Main program
     """
 
-    # Temporary filenames
+    # set first, a mask-free run failing early must not remove a MASK
+    global mask_free
+    mask_free = flags['m']
 
-    # The following three are meant for a test step-by-step cwv estimation, see
-    # unused functions!
+    # several scenes, each processed by this module in its own mapset
+    if options['scenes']:
+        process_scenes(options['scenes'], int(options['workers']))
+        return
 
-    # tmp_ti_mean = tmp_map_name('ti_mean')  # for cwv
-    # tmp_tj_mean = tmp_map_name('tj_mean')  # for cwv
-    # tmp_ratio = tmp_map_name('ratio')  # for cwv
+    # Temporary filenames
 
     tmp_avg_lse = tmp_map_name('avg_lse')
     tmp_delta_lse = tmp_map_name('delta_lse')
-    tmp_cwv = tmp_map_name('cwv')
     #tmp_lst = tmp_map_name('lst')
 
     # basic equation for mapcalc
@@ -1008,6 +1966,7 @@ def main():
             qab = False
 
     qapixel = options['qapixel']
+    qa_conditions = options['qa_conditions']
     lst_output = options['lst']
     
     # save Brightness Temperature maps?
@@ -1018,12 +1977,57 @@ def main():
         brightness_temperature_prefix = None
 
     global cwv_output
-    cwv_window_size = int(options['window'])
+    cwv_window_sizes = [int(size) for size in options['window'].split(',')]
     assertion_for_cwv_window_size_msg = ('A spatial window of size 5^2 or less is not '
                                          'recommended. Please select a larger window. '
                                          'Refer to the manual\'s notes for details.')
-    assert cwv_window_size >= 7, assertion_for_cwv_window_size_msg
+    assert min(cwv_window_sizes) >= 7, assertion_for_cwv_window_size_msg
     cwv_output = options['cwv']
+    cwv_method = options['cwv_method']
+    memory = int(options['memory'])
+    cwv_stride = int(options['cwv_stride'])
+    if cwv_stride > 1 and cwv_method != 'sat':
+        grass.fatal(_('A coarse grid for the column water vapor (cwv_stride) '
+                      'requires cwv_method=sat'))
+    lst_method = options['lst_method']
+    if lst_method == 'folded' and (options['emissivity'] or
+                                   options['delta_emissivity']):
+        grass.fatal(_('Coefficients folded per land cover class '
+                      '(lst_method=folded) are derived from the land cover, '
+                      'they do not use emissivity or delta_emissivity maps'))
+    cwv_statistic = options['cwv_statistic']
+    if cwv_statistic == 'median':
+        if cwv_method not in ('expression', 'sat'):
+            grass.fatal(_('Window medians for the column water vapor '
+                          'require cwv_method=expression or sat'))
+        if cwv_stride > 1:
+            grass.fatal(_('Window medians for the column water vapor '
+                          'do not support a coarse grid (cwv_stride)'))
+
+    global nprocs, precision
+    nprocs = int(options['nprocs'])
+    precision = options['precision']
+
+    # time and resources per stage and per spawned command
+    profile_output = options['profile']
+    profiler = Profiler(enabled=flags['p'] or bool(profile_output))
+    profiler.install()
+
+    fused = flags['f']
+    if fused and nprocs > 1:
+        grass.fatal(_('The fused single pass (-f) is not split in tiles, '
+                      'nprocs requires evaluating r.mapcalc expressions'))
+    if fused and (cwv_statistic != 'mean' or cwv_stride > 1):
+        grass.fatal(_('The fused single pass (-f) streams window means of '
+                      'the column water vapor and supports neither '
+                      'cwv_statistic=median nor a coarse grid (cwv_stride)'))
+
+    # NumPy engines: summed-area tables, row streams, the fused pass, look-up
+    # tables and the quality assessment band
+    if (fused or qab or cwv_method in ('sat', 'stream') or
+            'lookup' in (options['bt_method'], options['emissivity_method']) or
+            lst_method == 'folded'):
+        import_array_engines()
 
     # optional maps
     average_emissivity_map = options['emissivity']
@@ -1037,10 +2041,13 @@ def main():
     global landcover_map, emissivity_class
     landcover_map = options['landcover']
     emissivity_class = options['emissivity_class']
+    emissivity_method = options['emissivity_method']
+    bt_method = options['bt_method']
 
     # flags
-    global info, null
+    global info, null, stride_deviation
     info = flags['i']
+    stride_deviation = flags['d']
     # keep_region = flags['k']
     scene_extent = flags['k']
     timestamping = flags['t']
@@ -1083,7 +2090,20 @@ def main():
     # 1. Mask clouds
     #
 
-    if cloud_map:
+    profiler.stage('mask')
+
+    global validity_map, validity_inverted
+    if mask_free and cloud_map:
+        # non-null cells of the cloud map are invalid
+        msg = '\n|i Nulling the cells of {cmap} in the computations'
+        g.message(msg.format(cmap=cloud_map))
+        validity_map = cloud_map
+        validity_inverted = True
+
+    elif mask_free:
+        validity_map = qa_validity_map(qab, qapixel, qa_conditions)
+
+    elif cloud_map:
         # user-fed cloud map?
         msg = '\n|i Using {cmap} as a MASK'.format(cmap=cloud_map)
         g.message(msg)
@@ -1091,30 +2111,71 @@ def main():
 
     else:
         # using the quality assessment band and a "QA" pixel value
-        mask_clouds(qab, qapixel)
+        mask_clouds(qab, qapixel, qa_conditions)
 
     #
-    # 2. TIRS > Brightness Temperatures
+    # 2. - 5. Fused single pass
     #
 
-    if mtl_file:
+    if fused:
+        profiler.stage('fused')
+        tirs = []
+        for band, dn_map, bt_map in (('10', b10, options['t10']),
+                                     ('11', b11, options['t11'])):
+            if mtl_file and dn_map:
+                tirs.append((dn_map, band))
+            else:
+                tirs.append((bt_map, None))
+
+        landsat8 = load_mtl(mtl_file) if mtl_file else None
+        split_window_lst = SplitWindowLST(emissivity_class)
+        citation_lst = split_window_lst.citation
+        cwv = Column_Water_Vapor(min(cwv_window_sizes),
+                                 *[name for name, band in tirs])
+        citation_cwv = cwv.citation
+
+        lst_outputs, cwv_outputs = \
+            fused_single_pass(tirs, landsat8, split_window_lst,
+                              cwv_window_sizes, lst_output, lst_method,
+                              memory, average_emissivity_map,
+                              delta_emissivity_map)
 
-        # if MTL and b10 given, use it to compute at-satellite temperature t10
-        if b10:
-            # convert DNs to at-satellite temperatures
-            t10 = tirs_to_at_satellite_temperature(b10, mtl_file)
+    #
+    # 2. TIRS > Brightness Temperatures
+    #
 
-        # likewise for b11 -> t11
-        if b11:
-            # convert DNs to at-satellite temperatures
-            t11 = tirs_to_at_satellite_temperature(b11, mtl_file)
+    # the brightness temperature and emissivity stages are tasks, run
+    # concurrently for nprocs > 1 and joined before CWV and LST
+    concurrent = nprocs > 1
+    tasks = TaskGraph(nprocs)
+    results = {}
+
+    # if MTL and b10, b11 given, use them to compute at-satellite
+    # temperatures t10, t11, both bands in one r.mapcalc per step
+    tirs_bands = [band for band in (b10, b11) if band]
+    if mtl_file and not fused and tirs_bands:
+        tasks.add('bt', tirs_to_at_satellite_temperatures(tirs_bands, mtl_file,
+                                                          bt_method))
+
+    # given temperatures of a mask-free run, nulled in a pass of their own
+    given_temperatures = [key for key, dn in (('t10', b10), ('t11', b11))
+                          if not (mtl_file and dn)]
+    if validity_map and not fused and given_temperatures:
+        tasks.add('valid', valid_temperatures([options[key] for key in
+                                               given_temperatures]))
+
+    if not fused and not concurrent:
+        profiler.stage('bt')
+        results.update(run_tasks(tasks))
+        tasks = TaskGraph(nprocs)
 
     #
     # Initialise a SplitWindowLST object
     #
 
-    split_window_lst = SplitWindowLST(emissivity_class)
-    citation_lst = split_window_lst.citation
+    if not fused:
+        split_window_lst = SplitWindowLST(emissivity_class)
+        citation_lst = split_window_lst.citation
 
     #
     # 3. Land Surface Emissivities
@@ -1144,74 +2205,181 @@ def main():
         g.message(msg)
 
     # use the FROM-GLC map
-    elif landcover_map:
+    elif landcover_map and not fused:
 
         if average_emissivity_map:
             tmp_avg_lse = average_emissivity_map
 
-        if not average_emissivity_map:
-            determine_average_emissivity(tmp_avg_lse, landcover_map,
-                                         split_window_lst.average_lse_mapcalc)
-            if options['emissivity_out']:
-                tmp_avg_lse = options['emissivity_out']
+        # folded coefficients read the land cover map directly
+        avg_lse_required = lst_method != 'folded' or emissivity_output
+        delta_lse_required = (lst_method != 'folded' or
+                              delta_emissivity_output)
+
+        if emissivity_method == 'lookup':
+            avg_lse_table, delta_lse_table = \
+                split_window_lst_arrays.emissivity_lookup_tables()
+
+        # both expressions read the land cover map once, in one r.mapcalc
+        lse_equations = []
+
+        if (not average_emissivity_map and avg_lse_required and
+                emissivity_method == 'lookup'):
+            tasks.add('avg_lse', lookup_emissivity(tmp_avg_lse, landcover_map,
+                                                   avg_lse_table,
+                                                   emissivity_output))
+
+        elif not average_emissivity_map and avg_lse_required:
+            tmp_avg_lse = emissivity_output or tmp_avg_lse
+            lse_equations.append(determine_average_emissivity(
+                tmp_avg_lse, landcover_map,
+                split_window_lst.average_lse_mapcalc))
 
         if delta_emissivity_map:
             tmp_delta_lse = delta_emissivity_map
 
-        if not delta_emissivity_map:
-            determine_delta_emissivity(tmp_delta_lse, landcover_map,
-                                       split_window_lst.delta_lse_mapcalc)
-            if options['delta_emissivity_out']:
-                tmp_delta_lse = options['delta_emissivity_out']
+        if (not delta_emissivity_map and delta_lse_required and
+                emissivity_method == 'lookup'):
+            tasks.add('delta_lse', lookup_emissivity(tmp_delta_lse,
+                                                     landcover_map,
+                                                     delta_lse_table,
+                                                     delta_emissivity_output))
+
+        elif not delta_emissivity_map and delta_lse_required:
+            tmp_delta_lse = delta_emissivity_output or tmp_delta_lse
+            lse_equations.append(determine_delta_emissivity(
+                tmp_delta_lse, landcover_map,
+                split_window_lst.delta_lse_mapcalc))
+
+        if lse_equations:
+            tasks.add('lse', mapcalc_batch(lse_equations))
+
+        # maps of the folded coefficients B, C per cwv subrange
+        if lst_method == 'folded':
+            msg = ('\n|i Looking up folded split-window coefficients for the '
+                   'land cover codes of {landcover}')
+            g.message(msg.format(landcover=landcover_map))
+            folded_tables = split_window_lst_arrays.folded_lookup_tables(
+                split_window_lst)
+            for coefficient, subrange in sorted(folded_tables):
+                name = 'folded_{0}_{1}'.format(coefficient, subrange)
+                tasks.add(name, lookup_folded_coefficient(
+                    tmp_map_name(name), landcover_map,
+                    folded_tables[(coefficient, subrange)]))
+
+    # join the tasks
+    if not fused:
+        profiler.stage('bt+emissivity' if concurrent else 'emissivity')
+        results.update(run_tasks(tasks))
+
+        valid = dict(zip(given_temperatures, results.get('valid', ())))
+        temperatures = results.get('bt') or {}
+        t10 = temperatures.get(b10) or valid.get('t10') or options['t10']
+        t11 = temperatures.get(b11) or valid.get('t11') or options['t11']
+        tmp_avg_lse = results.get('avg_lse', tmp_avg_lse)
+        tmp_delta_lse = results.get('delta_lse', tmp_delta_lse)
 
     #
     # 4. Modified Split-Window Variance-Covariance Matrix > Column Water Vapor
     #
     
 
-    if info:
-        msg = '\n|i Spatial window of size {n} for Column Water Vapor estimation: '
-        msg = msg.format(n=cwv_window_size)
-        g.message(msg)
+    if not fused:
+
+        if lst_method == 'folded':
+            lst_expression = split_window_lst._build_folded_swlst_mapcalc()
+            if landcover_map and not emissivity_class:
+                for coefficient, subrange in sorted(folded_tables):
+                    name = 'folded_{0}_{1}'.format(coefficient, subrange)
+                    lst_expression = replace_dummies(
+                        lst_expression,
+                        instring=folded_map_dummy(coefficient, subrange),
+                        outstring=results[name])
+        else:
+            lst_expression = split_window_lst.sw_lst_mapcalc
 
-    cwv = Column_Water_Vapor(cwv_window_size, t10, t11)
-    citation_cwv = cwv.citation
-    estimate_cwv_big_expression(tmp_cwv, t10, t11, cwv._big_cwv_expression())
-    if cwv_output:
-        tmp_cwv = cwv_output
+        # one read of T10, T11 shared by all window sizes
+        if cwv_method == 'sat' and cwv_statistic == 'mean':
+            profiler.stage('cwv')
+            tables = column_water_vapor_arrays.window_moment_tables(
+                read_array(t10), read_array(t11))
 
-    #
-    # 5. Estimate Land Surface Temperature
-    #
+        lst_outputs = []
+        cwv_outputs = []
+
+        for cwv_window_size in cwv_window_sizes:
+
+            # one pair of lst_wN, cwv_wN maps per window size
+            if len(cwv_window_sizes) > 1:
+                window_suffix = '_w' + str(cwv_window_size)
+            else:
+                window_suffix = ''
+
+            if info:
+                msg = '\n|i Spatial window of size {n} for Column Water Vapor estimation: '
+                msg = msg.format(n=cwv_window_size)
+                g.message(msg)
+
+            profiler.stage('cwv', window=cwv_window_size)
+            cwv = Column_Water_Vapor(cwv_window_size, t10, t11)
+            citation_cwv = cwv.citation
+            tmp_cwv = tmp_map_name('cwv') + window_suffix
+
+            if cwv_method == 'sat' and cwv_statistic == 'median':
+                estimate_cwv_sliding_median(tmp_cwv, t10, t11, cwv)
+
+            elif cwv_method == 'sat':
+                estimate_cwv_summed_area_tables(tmp_cwv, t10, t11, cwv, tables,
+                                                cwv_stride)
 
-    if info and emissivity_class == 'Random':
-        msg = '\n|* Will pick a random emissivity class!'
-        grass.verbose(msg)
+            elif cwv_method == 'neighbors':
+                estimate_cwv_window_moments(tmp_cwv, t10, t11, cwv)
 
-    estimate_lst(lst_output, t10, t11,
-                 tmp_avg_lse, tmp_delta_lse, tmp_cwv,
-                 split_window_lst.sw_lst_mapcalc)
+            elif cwv_method == 'stream':
+                estimate_cwv_row_stream(tmp_cwv, t10, t11, cwv, memory)
+
+            elif cwv_statistic == 'median':
+                estimate_cwv_big_expression(tmp_cwv, t10, t11,
+                                            cwv._big_cwv_expression_median(),
+                                            cwv.window_radius)
+
+            else:
+                estimate_cwv_big_expression(tmp_cwv, t10, t11,
+                                            cwv._big_cwv_expression(),
+                                            cwv.window_radius)
+
+            # save Column Water Vapor map?
+            if cwv_output:
+                tmp_cwv = save_cwv_map(tmp_cwv, cwv_output + window_suffix)
+                cwv_outputs.append(cwv_output + window_suffix)
+
+            #
+            # 5. Estimate Land Surface Temperature
+            #
+
+            if info and emissivity_class == 'Random':
+                msg = '\n|* Will pick a random emissivity class!'
+                grass.verbose(msg)
+
+            profiler.stage('lst', window=cwv_window_size)
+            estimate_lst(lst_output + window_suffix, t10, t11,
+                         tmp_avg_lse, tmp_delta_lse, tmp_cwv,
+                         lst_expression)
+            lst_outputs.append(lst_output + window_suffix)
 
     #
     # Post-production actions
     #
 
+    profiler.stage('post')
+
     # remove MASK
-    r.mask(flags='r', verbose=True)
+    if not mask_free:
+        r.mask(flags='r', verbose=True)
 
     # time-stamping
     if timestamping:
-        add_timestamp(mtl_file, lst_output)
-
-        if cwv_output:
-            add_timestamp(mtl_file, cwv_output)
-
-    # Apply color table
-    if celsius:
-        run('r.colors', map=lst_output, color='celsius')
-    else:
-        # color table for kelvin
-        run('r.colors', map=lst_output, color='kelvin')
+        for outname in lst_outputs + cwv_outputs:
+            add_timestamp(mtl_file, outname)
 
     # ToDo: helper function for r.support
     # strings for metadata
@@ -1229,15 +2397,34 @@ def main():
         title_lst = 'Land Surface Temperature (K)'
         units_lst = 'Kelvin'
 
-    landsat8_metadata = Landsat8_MTL(mtl_file)
+    # temperatures stored as integers in hundredths of a degree
+    if precision == 'scaled':
+        description_lst += ('Stored in hundredths of a degree, divide by '
+                            '{scale} for {units}.').format(
+                                scale=TEMPERATURE_SCALE, units=units_lst)
+        units_lst = '{units} / {scale}'.format(units=units_lst,
+                                               scale=TEMPERATURE_SCALE)
+
+    landsat8_metadata = load_mtl(mtl_file)
     source1_lst = landsat8_metadata.scene_id
     source2_lst = landsat8_metadata.origin
 
-    # history entry
-    run("r.support", map=lst_output, title=title_lst,
-        units=units_lst, description=description_lst,
-        source1=source1_lst, source2=source2_lst,
-        history=history_lst)
+    for outname in lst_outputs:
+
+        # Apply color table, the absolute ones do not fit scaled values
+        if precision == 'scaled':
+            run('r.colors', map=outname, color='bcyr')
+        elif celsius:
+            run('r.colors', map=outname, color='celsius')
+        else:
+            # color table for kelvin
+            run('r.colors', map=outname, color='kelvin')
+
+        # history entry
+        run("r.support", map=outname, title=title_lst,
+            units=units_lst, description=description_lst,
+            source1=source1_lst, source2=source2_lst,
+            history=history_lst)
 
     # (re)name the LST product
     #run("g.rename", rast=(tmp_lst, lst_output))
@@ -1248,6 +2435,13 @@ def main():
         grass.del_temp_region()  # restoring previous region settings
         g.message("|! Original Region restored")
 
+    profiler.finish()
+    profiler.uninstall()
+    if flags['p']:
+        g.message('\n|i Profile\n' + '\n'.join(profiler.summary()))
+    if profile_output:
+        profiler.write(profile_output, options['profile_format'])
+
     # print citation
     if info:
         print '\nSource: ' + citation_lst
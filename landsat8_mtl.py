@@ -5,8 +5,9 @@
 @author nik |
 """
 
+import os
 import sys
-from collections import namedtuple
+from collections import OrderedDict
 
 
 # globals
@@ -14,6 +15,10 @@ MTLFILE = ''
 DUMMY_MAPCALC_STRING_RADIANCE = 'Radiance'
 DUMMY_MAPCALC_STRING_DN = 'DigitalNumber'
 
+# parsed MTL files and Landsat8_MTL objects, keyed by path and modification time
+METADATA_CACHE = {}
+MTL_CACHE = {}
+
 
 # helper functions
 def set_mtlfile():
@@ -26,6 +31,127 @@ def set_mtlfile():
         return False
 
 
+def mtl_value(string):
+    """
+    Convert a raw MTL value to its type. Quoted values are strings, unquoted
+    ones integers or floats where they parse as such, else strings (dates and
+    times).
+    """
+    if string.startswith('"'):
+        return string.strip('"')
+
+    for convert in (int, float):
+        try:
+            return convert(string)
+        except ValueError:
+            pass
+
+    return string
+
+
+class MTLMetadata(object):
+    """
+    The fields of an MTL file, split in to their groups. The values of a group
+    are converted to their types (see mtl_value()) on the first access to the
+    group, either per group:
+
+        metadata.group('TIRS_THERMAL_CONSTANTS')['K1_CONSTANT_BAND_10']
+
+    or per field, as attributes:
+
+        metadata.K1_CONSTANT_BAND_10
+    """
+
+    def __init__(self, mtl_lines):
+        """
+        Split the lines of an MTL file in to groups of raw values.
+        """
+        self.lines = []
+        self._raw_groups = OrderedDict()
+        self._groups = {}
+        self._field_groups = OrderedDict()
+
+        groups = []
+        for line in mtl_lines:
+            line = line.strip()
+            if '=' not in line:
+                continue
+
+            field, value = [part.strip() for part in line.split('=', 1)]
+            if field == 'GROUP':
+                groups.append(value)
+                continue
+            if field == 'END_GROUP':
+                groups.pop()
+                continue
+
+            group = groups[-1] if groups else ''
+            self._raw_groups.setdefault(group, []).append((field, value))
+            self._field_groups[field] = group
+            self.lines.append(line)
+
+    @property
+    def _fields(self):
+        """
+        Names of all fields, in the order of the MTL file.
+        """
+        return tuple(self._field_groups)
+
+    def groups(self):
+        """
+        Return the names of the groups, in the order of the MTL file.
+        """
+        return self._raw_groups.keys()
+
+    def group(self, name):
+        """
+        Return the fields of a group as an ordered dictionary of typed values.
+        """
+        if name not in self._groups:
+            self._groups[name] = OrderedDict((field, mtl_value(value))
+                                             for field, value in
+                                             self._raw_groups[name])
+        return self._groups[name]
+
+    def __getattr__(self, field):
+        """
+        Return the typed value of a field.
+        """
+        try:
+            group = self.__dict__['_field_groups'][field]
+        except KeyError:
+            raise AttributeError(field)
+        return self.group(group)[field]
+
+
+def read_metadata(mtl_filename):
+    """
+    Return the MTLMetadata of an MTL file. Each file is read once, further
+    requests are served from a cache keyed by the file's absolute path and
+    modification time.
+    """
+    key = (os.path.abspath(mtl_filename), os.path.getmtime(mtl_filename))
+    if key not in METADATA_CACHE:
+        with open(mtl_filename, 'r') as mtl_file:
+            METADATA_CACHE[key] = MTLMetadata(mtl_file.readlines())
+
+    return METADATA_CACHE[key]
+
+
+def load_mtl(mtl_filename):
+    """
+    Return a Landsat8_MTL object for an MTL file, shared by all callers (and
+    with it the look-up tables built by its methods) as long as the file is
+    not modified. Loading many MTL files, for example to select scenes by
+    their cloud cover, converts only the groups of the fields accessed.
+    """
+    key = (os.path.abspath(mtl_filename), os.path.getmtime(mtl_filename))
+    if key not in MTL_CACHE:
+        MTL_CACHE[key] = Landsat8_MTL(mtl_filename)
+
+    return MTL_CACHE[key]
+
+
 class Landsat8_MTL():
     """
     Retrieve metadata from a Landsat8 MTL file.
@@ -34,8 +160,8 @@ class Landsat8_MTL():
     ToDo:
 
     - Implement toar_reflectance
-    - Implement mechanism to translate QA pixel values to QA bits, and vice
-      versa?
+    - Translate QA bits to QA pixel values? See quality_assessment for the
+      opposite
     - Other Landsat8 related functions/algorithms?
     """
 
@@ -43,17 +169,8 @@ class Landsat8_MTL():
         """
         Initialise class object based on a Landsat8 MTL filename.
         """
-        # read lines
-        with open(mtl_filename, 'r') as mtl_file:
-                mtl_lines = mtl_file.readlines()
-
-        # close and remove 'mtl_file'
-        mtl_file.close()
-        del(mtl_file)
-
-        # clean and convert MTL lines in to a named tuple
-        self.mtl = self._to_namedtuple(mtl_lines, 'metadata')
-        self._set_attributes()
+        # parse once, typed values converted per group on first access
+        self.mtl = read_metadata(mtl_filename)
 
         # shorten LANDSAT_SCENE_ID, SENSOR_ID
         self.scene_id = self.mtl.LANDSAT_SCENE_ID
@@ -70,57 +187,19 @@ class Landsat8_MTL():
                                      self.mtl.CORNER_LR_PROJECTION_Y_PRODUCT)
         self.cloud_cover = self.mtl.CLOUD_COVER
 
-    def _to_namedtuple(self, list_of_lines, name_for_tuple):
-        """
-        This function performs the following actions on the given
-        'list_of_lines':
-        - excludes lines containing the strings 'GROUP' and 'END'
-        - removes whitespaces and doublequotes from strings
-        - converts list of lines in to a named tuple
-        """
-        import string
-
-        # exclude lines containing 'GROUP', 'END'
-        lines = [line.strip() for line in list_of_lines
-                 if not any(x in line for x in ('GROUP', 'END'))]
-
-        # keep a copy, maybe useful?
-        self._mtl_lines = lines
-        del(list_of_lines)
-
-        # empty variables to hold values
-        field_names = []
-        field_values = []
-
-        # loop over lines, do some cleaning
-        for idx in range(len(lines)):
-
-            # split line in '='
-            line = lines[idx]
-            line_split = line.split('=')
-
-            # get field name & field value, clean whitespaces and "
-            field_name = line_split[0].strip()
-            field_names.append(field_name)
-            field_value = line_split[1].strip()
-            field_value = field_value.translate(string.maketrans("", "",), '"')
-            field_values.append(field_value)
+        # look-up tables of brightness temperatures, built on demand (see
+        # brightness_temperature_table() of swlst)
+        self.temperature_tables = {}
 
-        # named tuple
-        named_tuple = namedtuple(name_for_tuple, field_names)
-
-        # return named tuple
-        return named_tuple(*field_values)
-
-    def _set_attributes(self):
+    def __getattr__(self, name):
         """
-        Set all parsed field names and values, from the MTL file, fed to the
-        named tuple 'self.mtl', as attributes to the object.
+        Return the value of an MTL field by its lowercase name, for example
+        'wrs_path' for WRS_PATH.
         """
-        for field in self.mtl._fields:
-            field_lowercase = field.lower()
-            field_value = getattr(self.mtl, field)
-            setattr(self, field_lowercase, field_value)
+        try:
+            return getattr(self.__dict__['mtl'], name.upper())
+        except KeyError:
+            raise AttributeError(name)
 
     def __str__(self):
         """
@@ -134,7 +213,7 @@ class Landsat8_MTL():
         Return the "hidden" copy of the MTL lines before cleaning (lines
         containing 'GROUP' or 'END' are though excluded).
         """
-        return self._mtl_lines
+        return self.mtl.lines
 
     def toar_radiance(self, bandnumber):
         """
@@ -177,6 +256,18 @@ class Landsat8_MTL():
 
         return mapcalc
 
+    def toar_radiance_array(self, bandnumber, digital_numbers):
+        """
+        Convert an array of Digital Numbers to TOA Radiance, as in
+        toar_radiance(), for NumPy arrays instead of GRASS GIS' r.mapcalc.
+        """
+        multiplicative_factor = float(getattr(self.mtl, 'RADIANCE_MULT_BAND_' +
+                                              str(bandnumber)))
+        additive_factor = float(getattr(self.mtl, 'RADIANCE_ADD_BAND_' +
+                                        str(bandnumber)))
+
+        return multiplicative_factor * digital_numbers + additive_factor
+
     def toar_reflectance(self, bandnumber):
         """
         Note, this function returns a valid expression for GRASS GIS' r.mapcalc
@@ -0,0 +1,157 @@
+# -*- coding: utf-8 -*-
+"""
+Decode the Quality Assessment band (BQA) of Landsat 8, pre-collection bit
+layout, in to named conditions. Source:
+<http://landsat.usgs.gov/L8QualityAssessmentBand.php>
+
+A scene holds a few hundred distinct QA values. The bit logic of the
+requested conditions is evaluated once per distinct value, giving a boolean
+lookup table, which is applied to the pixels in one indexed read (see
+qa_mask()) or, in GRASS GIS, as the categories of a reclassified MASK (see
+clear_categories()).
+
+Conditions are given by name:
+
+- single bit conditions: 'fill', 'dropped_frame', 'terrain_occlusion'
+- confidence conditions: 'water', 'vegetation', 'snow_ice', 'cirrus',
+  'cloud', optionally with a minimum confidence, as in 'cloud:medium'.
+  Without, the confidence is 'high'.
+
+Example:
+
+    from quality_assessment import qa_mask
+
+    masked = qa_mask(qa, ['fill', 'cloud:medium', 'cirrus'])
+"""
+
+import numpy
+
+# globals
+# name: (first bit, number of bits)
+QA_BITS = {'fill': (0, 1),
+           'dropped_frame': (1, 1),
+           'terrain_occlusion': (2, 1),
+           'water': (4, 2),
+           'vegetation': (8, 2),
+           'snow_ice': (10, 2),
+           'cirrus': (12, 2),
+           'cloud': (14, 2)}
+
+# 2-bit confidences: 00 not determined, 01 low (0-33%), 10 medium (34-66%),
+# 11 high (67-100%)
+CONFIDENCE = {'low': 1, 'medium': 2, 'high': 3}
+QA_VALUES = 2 ** 16
+
+
+def parse_conditions(conditions):
+    """
+    Parse names of QA conditions (a list, or a string of comma separated
+    names) in to a list of (name, first bit, number of bits, minimum value)
+    tuples. Raises a ValueError for unknown names or confidences.
+    """
+    if isinstance(conditions, basestring):
+        conditions = conditions.split(',')
+
+    parsed = []
+    for condition in conditions:
+        condition = condition.strip().lower()
+        if not condition:
+            continue
+        name, separator, confidence = condition.partition(':')
+        if name not in QA_BITS:
+            names = ', '.join(sorted(QA_BITS))
+            raise ValueError('Unknown QA condition <{name}>, expected one of: '
+                             '{names}'.format(name=name, names=names))
+        shift, width = QA_BITS[name]
+
+        if width == 1:
+            if confidence:
+                raise ValueError('The QA condition <{name}> is a single bit, '
+                                 'without confidence'.format(name=name))
+            minimum = 1
+        else:
+            if confidence and confidence not in CONFIDENCE:
+                raise ValueError('Unknown confidence <{level}>, expected one '
+                                 'of: low, medium, '
+                                 'high'.format(level=confidence))
+            minimum = CONFIDENCE[confidence or 'high']
+
+        parsed.append((name, shift, width, minimum))
+
+    return parsed
+
+
+def decode(values, conditions):
+    """
+    Return a boolean array, True where any of the 'conditions' (see
+    parse_conditions()) holds for the QA 'values'.
+    """
+    values = numpy.asarray(values, dtype=numpy.int64)
+    matches = numpy.zeros(values.shape, dtype=bool)
+    for name, shift, width, minimum in parse_conditions(conditions):
+        field = (values >> shift) & (2 ** width - 1)
+        matches |= field >= minimum
+    return matches
+
+
+def lookup_table(values, conditions=(), pixels=()):
+    """
+    Return the masked ones of the distinct QA 'values' as a boolean array:
+    those matching any of the 'conditions' (see decode()) or equal to any of
+    the QA 'pixels' values.
+    """
+    values = numpy.asarray(values, dtype=numpy.int64)
+    masked = decode(values, conditions)
+    if len(pixels):
+        masked |= numpy.in1d(values, numpy.asarray(pixels, dtype=numpy.int64))
+    return masked
+
+
+def distinct_values(qa):
+    """
+    Return the sorted distinct values of a QA array, counted in one pass
+    over the 16-bit range.
+    """
+    counts = numpy.bincount(numpy.asarray(qa, dtype=numpy.intp).ravel(),
+                            minlength=QA_VALUES)
+    return numpy.flatnonzero(counts)
+
+
+def qa_mask(qa, conditions=(), pixels=()):
+    """
+    Return a boolean array, True for the pixels of the QA array 'qa' to mask
+    (see lookup_table()). The bit logic is evaluated per distinct value and
+    applied to the pixels as one indexed read.
+    """
+    qa = numpy.asarray(qa)
+    values = distinct_values(qa)
+    table = numpy.zeros(QA_VALUES, dtype=bool)
+    table[values] = lookup_table(values, conditions, pixels)
+    return table[qa]
+
+
+def clear_categories(values, masked):
+    """
+    Return the clear (not 'masked') ones of the sorted distinct QA 'values'
+    as categories for r.mask or r.reclass, for example '2720 thru 2800 20480'.
+    Values absent from the scene are free to join a range, so that each run
+    of clear values between two masked ones makes a single 'low thru high'
+    range. Returns an empty string if all values are masked.
+    """
+    ranges = []
+    low = high = None
+    for value, mask in zip(values, masked):
+        if mask:
+            if low is not None:
+                ranges.append((low, high))
+            low = None
+        else:
+            if low is None:
+                low = value
+            high = value
+    if low is not None:
+        ranges.append((low, high))
+
+    return ' '.join(str(low) if low == high else
+                    '{low} thru {high}'.format(low=low, high=high)
+                    for low, high in ranges)
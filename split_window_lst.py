@@ -6,10 +6,11 @@ A class for the Split Window Algorithm for Land Surface Temperature estimation
 
 # import average emissivities
 import random
+from collections import namedtuple
 import csv_to_dictionary as coefficients
 from column_water_vapor import Column_Water_Vapor
 
-# globals
+# globals, coefficient tables loaded on first access
 EMISSIVITIES = coefficients.get_average_emissivities()
 COLUMN_WATER_VAPOR = coefficients.get_column_water_vapor()
 DUMMY_MAPCALC_STRING_T10 = 'Input_T10'
@@ -18,6 +19,11 @@ DUMMY_MAPCALC_STRING_AVG_LSE = 'Input_AVG_LSE'
 DUMMY_MAPCALC_STRING_DELTA_LSE = 'Input_DELTA_LSE'
 DUMMY_MAPCALC_STRING_FROM_GLC = 'Input_FROMGLC'
 DUMMY_MAPCALC_STRING_CWV = 'Input_CWV'
+DUMMY_MAPCALC_STRING_FOLDED = 'Input_Folded'
+
+# split-window coefficients folded with a class' emissivities, per subrange:
+# LST = A + B * (t10 + t11) / 2 + C * (t10 - t11) / 2 + D * (t10 - t11)^2
+FoldedCoefficients = namedtuple('FoldedCoefficients', ['A', 'B', 'C', 'D'])
 
 # Remove from here, improve and use named tuples!
 FROM_GLC_CODES = [10, 11, 12, 13,
@@ -43,6 +49,14 @@ FROM_GLC_LEGEND = {'Cropland': (10, 11, 12, 13),
 
 
 # helper functions
+def cwv_subranges():
+    """
+    Return the column water vapor subranges in order, the last one being the
+    complete CWV range.
+    """
+    return sorted(COLUMN_WATER_VAPOR.keys())
+
+
 def check_t1x_range(number):
     """
     Check if Brigthness Temperature (Kelvin degrees) values for T10, T11, lie
@@ -77,6 +91,17 @@ def check_cwv(cwv):
         return True
 
 
+def folded_map_dummy(coefficient, subrange):
+    """
+    Return the "dummy" name of the map of a folded coefficient, 'B' or 'C',
+    for the given cwv subrange, in the expression of
+    _build_folded_swlst_mapcalc().
+    """
+    return '{prefix}_{coefficient}_{subrange}'.format(
+        prefix=DUMMY_MAPCALC_STRING_FOLDED, coefficient=coefficient,
+        subrange=subrange)
+
+
 class SplitWindowLST():
     """
     A class implementing the split-window algorithm for Landsat8 imagery
@@ -636,8 +661,8 @@ class SplitWindowLST():
                 # print "Fixed land cover class"
                 emissivity_t10 = float(self.emissivity_t10)
                 emissivity_t11 = float(self.emissivity_t11)
-                avg_lse = self._compute_delta_emissivity(emissivity_t10,
-                                                         emissivity_t11)
+                avg_lse = self._compute_average_emissivity(emissivity_t10,
+                                                           emissivity_t11)
                 delta_lse = \
                     self._compute_delta_emissivity(emissivity_t10,
                                                    emissivity_t11)
@@ -671,10 +696,14 @@ class SplitWindowLST():
 
         return mapcalc
 
-    def _build_swlst_mapcalc(self):
+    def _build_swlst_mapcalc(self, expressions=None, assignments=''):
         """
         Build and return a valid expression for GRASS GIS' r.mapcalc to
         determine LST.
+
+        Optionally, the six subrange 'expressions' and a string of
+        'assignments' (comma separated, ending in a comma) to be evaluated
+        ahead of them, may be given (see _build_folded_swlst_mapcalc()).
         """
         # subrange limits, low, high
         low_1, high_1 = COLUMN_WATER_VAPOR['Range_1'].subrange
@@ -685,17 +714,16 @@ class SplitWindowLST():
         low_6, high_6 = COLUMN_WATER_VAPOR['Range_6'].subrange  # unused
 
         # build mapcalc expression for each subrange
-        expression_range_1 = self._build_subrange_mapcalc('Range_1')
-        expression_range_2 = self._build_subrange_mapcalc('Range_2')
-        expression_range_3 = self._build_subrange_mapcalc('Range_3')
-        expression_range_4 = self._build_subrange_mapcalc('Range_4')
-        expression_range_5 = self._build_subrange_mapcalc('Range_5')
+        if expressions is None:
+            expressions = [self._build_subrange_mapcalc(subrange)
+                           for subrange in cwv_subranges()]
 
-        # complete range
-        expression_range_6 = self._build_subrange_mapcalc('Range_6')
+        expression_range_1, expression_range_2, expression_range_3, \
+            expression_range_4, expression_range_5, \
+            expression_range_6 = expressions  # complete range
 
         # build one big expression using mighty eval
-        expression = ('eval( sw_lst_1 = {exp_1},'
+        expression = ('eval( {assignments}sw_lst_1 = {exp_1},'
                       '\ \n sw_lst_2 = {exp_2},'
                       '\ \n sw_lst_12 = (sw_lst_1 + sw_lst_2) / 2,'
                       '\ \n sw_lst_3 = {exp_3},'
@@ -722,7 +750,8 @@ class SplitWindowLST():
                       ' sw_lst_6 ))))))))))')  # ' null() ))))))))))')
 
         # replace keywords appropriately
-        swlst_expression = expression.format(exp_1=expression_range_1,
+        swlst_expression = expression.format(assignments=assignments,
+                                             exp_1=expression_range_1,
                                              low_1=low_1,
                                              DUMMY_CWV=DUMMY_MAPCALC_STRING_CWV,
                                              high_1=high_1,
@@ -738,6 +767,101 @@ class SplitWindowLST():
 
         return swlst_expression
 
+    def _fold_cwv_coefficients(self, subrange, avg_lse, delta_lse):
+        """
+        Fold the coefficients of the given cwv subrange with an average and a
+        delta emissivity, as in the r.mapcalc expression (see
+        _build_subrange_mapcalc()), and return a FoldedCoefficients
+        namedtuple:
+
+        A = b0
+        B = b1 + b2 * (1 - ae) / ae^2 + b3 * de / ae^2
+        C = b4 + b5 * (1 - ae) / ae + b6 * de / ae^2
+        D = b7
+        """
+        b0, b1, b2, b3, b4, b5, b6, b7 = \
+            self._retrieve_cwv_coefficients(subrange)
+        avg = float(avg_lse)
+        delta = float(delta_lse)
+        return FoldedCoefficients(A=b0,
+                                  B=b1 + b2 * (1 - avg) / avg**2 +
+                                  b3 * delta / avg**2,
+                                  C=b4 + b5 * (1 - avg) / avg +
+                                  b6 * delta / avg**2,
+                                  D=b7)
+
+    def _landcover_classes(self):
+        """
+        Return the land cover classes to fold coefficients for: the object's
+        fixed class or else all FROM-GLC classes with known emissivities.
+        """
+        if self.landcover_class:
+            return [self.landcover_class]
+        return sorted(key for key in FROM_GLC_LEGEND if key in EMISSIVITIES)
+
+    def folded_coefficients(self):
+        """
+        Return a dictionary of FoldedCoefficients for each (land cover class,
+        cwv subrange) pair. The average and delta emissivities take only one
+        value per class, hence LST per pixel reduces to a look-up plus two
+        multiply-adds on (t10 + t11) / 2 and (t10 - t11) / 2.
+        """
+        folded = {}
+        for landcover_class in self._landcover_classes():
+            emissivity_t10, emissivity_t11 = \
+                self._retrieve_average_emissivities(landcover_class)
+            avg_lse = self._compute_average_emissivity(emissivity_t10,
+                                                       emissivity_t11)
+            delta_lse = self._compute_delta_emissivity(emissivity_t10,
+                                                       emissivity_t11)
+            for subrange in cwv_subranges():
+                folded[(landcover_class, subrange)] = \
+                    self._fold_cwv_coefficients(subrange, avg_lse, delta_lse)
+        return folded
+
+    def _build_folded_subrange_mapcalc(self, subrange, folded):
+        """
+        Build formula for GRASS GIS' mapcalc for the given cwv subrange from
+        folded coefficients. For a land cover map, B and C are read from
+        maps looked up per land cover code (see folded_lookup_tables() of
+        split_window_lst_arrays), named by folded_map_dummy().
+        """
+        formula = ('{A} + {B} * mean_t1x + {C} * half_delta_t1x + '
+                   '({D}) * delta_t1x_2')
+
+        classes = self._landcover_classes()
+        if self.landcover_class:
+            coefficients = folded[(self.landcover_class, subrange)]
+            return formula.format(**coefficients._asdict())
+
+        A = folded[(classes[0], subrange)].A
+        D = folded[(classes[0], subrange)].D
+        return formula.format(A=A, B=folded_map_dummy('B', subrange),
+                              C=folded_map_dummy('C', subrange), D=D)
+
+    def _build_folded_swlst_mapcalc(self):
+        """
+        Build and return a valid expression for GRASS GIS' r.mapcalc to
+        determine LST from coefficients folded per land cover class (see
+        folded_coefficients()). Instead of average and delta emissivity maps,
+        the expression reads, unless a fixed land cover class is used, the
+        maps of B and C per cwv subrange (see folded_map_dummy()), null where
+        the land cover class is unknown.
+        """
+        folded = self.folded_coefficients()
+
+        assignments = ('mean_t1x = ({DUMMY_T10} + {DUMMY_T11}) / 2,'
+                       '\ \n half_delta_t1x = ({DUMMY_T10} - {DUMMY_T11}) / 2,'
+                       '\ \n delta_t1x_2 = ({DUMMY_T10} - {DUMMY_T11})^2,'
+                       '\ \n ')
+        assignments = assignments.format(DUMMY_T10=DUMMY_MAPCALC_STRING_T10,
+                                         DUMMY_T11=DUMMY_MAPCALC_STRING_T11)
+
+        expressions = [self._build_folded_subrange_mapcalc(subrange, folded)
+                       for subrange in cwv_subranges()]
+
+        return self._build_swlst_mapcalc(expressions, assignments)
+
 # reusable & stand-alone
 if __name__ == "__main__":
     print ('Split-Window Algorithm for Estimating Land Surface Temperature '
@@ -0,0 +1,319 @@
+# -*- coding: utf-8 -*-
+"""
+Split-window Land Surface Temperature for NumPy arrays: look-up tables of
+emissivities and folded coefficients indexed by FROM-GLC code, and the
+split-window equation of a SplitWindowLST object evaluated per pixel, instead
+of the r.mapcalc expressions.
+"""
+
+import numpy
+from collections import namedtuple
+from split_window_lst import COLUMN_WATER_VAPOR, EMISSIVITIES, FROM_GLC_LEGEND
+from split_window_lst import FoldedCoefficients, cwv_subranges
+
+# per pixel validity of the inputs to compute_lst_array()
+LSTValidity = namedtuple('LSTValidity', ['t10', 't11', 'cwv'])
+
+
+# helper functions
+def cwv_subrange_table(subranges=None):
+    """
+    Return the sorted boundaries of the column water vapor subranges and a
+    table holding, for each slot between and on these boundaries, the indices
+    (in 'subranges') of the one or two subranges a CWV value falls in.
+
+    A CWV value is located in the table via:
+
+        slot = searchsorted(boundaries, cwv, 'left') +
+               searchsorted(boundaries, cwv, 'right')
+
+    so that even slots are the open intervals between two boundaries and odd
+    slots the boundaries themselves. The selection follows the big r.mapcalc
+    expression: 'low < cwv < high' for the first five subranges, the first
+    overlapping pair wins, anything else falls back to the complete range.
+    """
+    if subranges is None:
+        subranges = cwv_subranges()
+    limits = [COLUMN_WATER_VAPOR[key].subrange for key in subranges[:-1]]
+    complete = len(subranges) - 1
+
+    boundaries = numpy.unique([limit for pair in limits for limit in pair])
+    probes = numpy.concatenate(([boundaries[0] - 1],
+                                boundaries,
+                                (boundaries[:-1] + boundaries[1:]) / 2,
+                                [boundaries[-1] + 1]))
+    probes.sort()
+
+    table = numpy.empty((len(probes), 2), dtype=numpy.intp)
+    for slot, cwv in enumerate(probes):
+        result = [index for index, (low, high) in enumerate(limits)
+                  if low < cwv < high]
+        if len(result) == 1:
+            table[slot] = result[0], result[0]
+        elif len(result) >= 2:
+            table[slot] = result[0], result[1]
+        else:
+            table[slot] = complete, complete
+
+    return boundaries, table
+
+
+def locate_cwv_subranges(cwv, boundaries, table):
+    """
+    Return two arrays of subrange indices, the first and the second subrange
+    each CWV value falls in (identical where it falls in one subrange only).
+    See cwv_subrange_table().
+    """
+    slots = (numpy.searchsorted(boundaries, cwv, 'left') +
+             numpy.searchsorted(boundaries, cwv, 'right'))
+    return table[slots, 0], table[slots, 1]
+
+
+def landcover_class_table(classes, legend=None):
+    """
+    Return a 256-entry table mapping FROM-GLC land cover codes to the index of
+    their class in 'classes' (see FROM_GLC_LEGEND). Codes of no class in
+    'classes' map to -1.
+    """
+    if legend is None:
+        legend = FROM_GLC_LEGEND
+    table = numpy.empty(256, dtype=numpy.intp)
+    table.fill(-1)
+    for index, landcover_class in enumerate(classes):
+        table[list(legend[landcover_class])] = index
+    return table
+
+
+def emissivity_lookup_tables(legend=None):
+    """
+    Return two 256-entry look-up tables, of average and of delta emissivity,
+    indexed by FROM-GLC land cover code. Codes of no class with known
+    emissivities (see EMISSIVITIES, FROM_GLC_LEGEND) hold NaN.
+    """
+    if legend is None:
+        legend = FROM_GLC_LEGEND
+    average = numpy.empty(256)
+    average.fill(numpy.nan)
+    delta = average.copy()
+    for landcover_class, codes in legend.items():
+        if landcover_class not in EMISSIVITIES:
+            continue
+        emissivity_t10 = float(EMISSIVITIES[landcover_class].TIRS10)
+        emissivity_t11 = float(EMISSIVITIES[landcover_class].TIRS11)
+        average[list(codes)] = 0.5 * (emissivity_t10 + emissivity_t11)
+        delta[list(codes)] = emissivity_t10 - emissivity_t11
+    return average, delta
+
+
+def lookup_emissivities(landcover, tables=None):
+    """
+    Return average and delta emissivity arrays for an array of FROM-GLC land
+    cover codes, via one numpy.take per table (see
+    emissivity_lookup_tables()). Null (NaN) or out of range codes yield NaN.
+    """
+    if tables is None:
+        tables = emissivity_lookup_tables()
+    landcover = numpy.asarray(landcover, dtype=numpy.float64)
+    with numpy.errstate(invalid='ignore'):
+        outside = ~((landcover >= 0) & (landcover < 256))
+    # code 0 belongs to no class, thus looks up NaN
+    codes = numpy.where(outside, 0, numpy.nan_to_num(landcover))
+    codes = codes.astype(numpy.intp)
+    return tuple(numpy.take(table, codes) for table in tables)
+
+
+def emissivity_reclass_rules(table, scale=10000):
+    """
+    Return rules for GRASS GIS' r.reclass assigning each FROM-GLC code its
+    emissivity from a look-up table, scaled by 'scale' and rounded to an
+    integer. Codes holding NaN are left out, hence become null.
+    """
+    rules = ('{code} = {value}'.format(code=code,
+                                       value=int(round(value * scale)))
+             for code, value in enumerate(table) if not numpy.isnan(value))
+    return '\n'.join(rules) + '\n'
+
+
+def emissivity_recode_rules(table):
+    """
+    Return rules for GRASS GIS' r.recode assigning each FROM-GLC code its
+    emissivity, or folded coefficient (see folded_lookup_tables()), from a
+    look-up table. Codes holding NaN are left
+    out, hence become null.
+    """
+    rules = ('{code}:{code}:{value!r}'.format(code=code,
+                                              value=round(value, 10))
+             for code, value in enumerate(table) if not numpy.isnan(value))
+    return '\n'.join(rules) + '\n'
+
+
+def compute_lst_array(split_window_lst, t10, t11, cwv, avg_lse=None,
+                      delta_lse=None, dtype=numpy.float64):
+    """
+    Compute Land Surface Temperature for arrays of brightness temperatures
+    T10, T11 and column water vapor, with the coefficients of a
+    SplitWindowLST object. Average and delta emissivities are either arrays
+    (eg derived from a land cover map) or, if not given, the ones of the
+    object's fixed land cover class.
+
+    Each pixel is assigned its one or two CWV subranges by a look-up in
+    the boundary table (see cwv_subrange_table()) and only the coefficient
+    sets of these subranges are evaluated. In the overlap of two adjacent
+    subranges, the two temperatures are averaged. The formula is the one
+    of the r.mapcalc expression (see
+    SplitWindowLST._build_subrange_mapcalc()).
+
+    Returns a tuple of the LST array and an LSTValidity namedtuple of
+    boolean arrays, True where T10, T11 lie in [200, 330] and the CWV in
+    [-0.5, 6.8] respectively, instead of raising like check_t1x_range()
+    and check_cwv(). Null (NaN) inputs yield a null LST.
+
+    With a 'dtype' of numpy.float32, the equation is evaluated in single
+    precision, while the subranges are located from the CWV converted to
+    double precision. For brightness temperatures in [200, 330] K, the LST
+    then differs from the double precision one by less than 0.001 K,
+    provided the CWV itself is of double precision: the subranges are
+    discontinuous at their boundaries, a CWV rounded across one selects
+    other coefficients, shifting the LST by up to about 0.1 K.
+    """
+    if avg_lse is None:
+        avg_lse = split_window_lst.average_emissivity
+    if delta_lse is None:
+        delta_lse = split_window_lst.delta_emissivity
+
+    t10, t11, avg_lse, delta_lse = [numpy.asarray(array, dtype=dtype)
+                                    for array in (t10, t11, avg_lse,
+                                                  delta_lse)]
+    # subranges are located at full precision
+    cwv = numpy.asarray(cwv, dtype=numpy.float64)
+    t10, t11, cwv, avg_lse, delta_lse = \
+        numpy.broadcast_arrays(t10, t11, cwv, avg_lse, delta_lse)
+    shape = t10.shape
+    t10, t11, cwv, avg_lse, delta_lse = [array.ravel() for array in
+                                         (t10, t11, cwv, avg_lse,
+                                          delta_lse)]
+
+    # emissivity and temperature terms, common to all subranges
+    term_b2 = (1 - avg_lse) / avg_lse**2
+    term_b5 = (1 - avg_lse) / avg_lse
+    term_b3_b6 = delta_lse / avg_lse**2
+    mean_t1x = (t10 + t11) / 2
+    half_delta_t1x = (t10 - t11) / 2
+
+    boundaries, table = cwv_subrange_table()
+    first, second = locate_cwv_subranges(cwv, boundaries, table)
+    weight = numpy.where(first == second, 1.0, 0.5).astype(dtype)
+
+    lst = numpy.zeros(cwv.shape, dtype=dtype)
+    for index, subrange in enumerate(cwv_subranges()):
+        pixels = numpy.flatnonzero((first == index) | (second == index))
+        if not pixels.size:
+            continue
+
+        b0, b1, b2, b3, b4, b5, b6, b7 = \
+            split_window_lst._retrieve_cwv_coefficients(subrange)
+        half_delta = half_delta_t1x[pixels]
+        lst[pixels] += weight[pixels] * (
+            b0 +
+            (b1 + b2 * term_b2[pixels] + b3 * term_b3_b6[pixels]) *
+            mean_t1x[pixels] +
+            (b4 + b5 * term_b5[pixels] + b6 * term_b3_b6[pixels]) *
+            half_delta +
+            b7 * (2 * half_delta)**2)
+
+    lst[numpy.isnan(cwv)] = numpy.nan
+
+    with numpy.errstate(invalid='ignore'):
+        validity = LSTValidity(
+            t10=((t10 >= 200) & (t10 <= 330)).reshape(shape),
+            t11=((t11 >= 200) & (t11 <= 330)).reshape(shape),
+            cwv=((cwv >= 0.0 - .5) & (cwv <= 6.3 + .5)).reshape(shape))
+
+    return lst.reshape(shape), validity
+
+
+def compute_lst_array_folded(split_window_lst, t10, t11, cwv, landcover=None,
+                             dtype=numpy.float64):
+    """
+    Compute Land Surface Temperature for arrays of brightness temperatures
+    T10, T11 and column water vapor, like compute_lst_array(), from the
+    coefficients of a SplitWindowLST object folded per land cover class (see
+    SplitWindowLST.folded_coefficients()).
+
+    The 'landcover' array holds FROM-GLC codes. If not given, the object's
+    fixed land cover class is used. Codes of unknown classes yield a null
+    (NaN) LST. The 'dtype' is the one of compute_lst_array().
+    """
+    classes, table = folded_coefficient_tables(split_window_lst)
+    table = table.astype(dtype)
+    if landcover is None:
+        landcover = numpy.zeros(numpy.shape(cwv), dtype=numpy.intp)
+    else:
+        landcover = landcover_class_table(classes)[
+            numpy.clip(numpy.nan_to_num(numpy.asarray(landcover)),
+                       0, 255).astype(numpy.intp)]
+
+    t10, t11, cwv, landcover = \
+        numpy.broadcast_arrays(numpy.asarray(t10, dtype=dtype),
+                               numpy.asarray(t11, dtype=dtype),
+                               numpy.asarray(cwv, dtype=numpy.float64),
+                               landcover)
+    shape = t10.shape
+    t10, t11, cwv, landcover = [array.ravel() for array in
+                                (t10, t11, cwv, landcover)]
+
+    boundaries, subranges = cwv_subrange_table()
+    first, second = locate_cwv_subranges(cwv, boundaries, subranges)
+    weight = numpy.where(first == second, 1.0, 0.5).astype(dtype)
+
+    lst = numpy.zeros(cwv.shape, dtype=dtype)
+    for index in range(len(cwv_subranges())):
+        pixels = numpy.flatnonzero((first == index) | (second == index))
+        if not pixels.size:
+            continue
+
+        A, B, C, D = table[landcover[pixels], index].T
+        delta_t1x = t10[pixels] - t11[pixels]
+        lst[pixels] += weight[pixels] * (
+            A + B * (t10[pixels] + t11[pixels]) / 2 + C * delta_t1x / 2 +
+            D * delta_t1x**2)
+
+    lst[numpy.isnan(cwv) | (landcover < 0)] = numpy.nan
+    return lst.reshape(shape)
+
+
+def folded_coefficient_tables(split_window_lst):
+    """
+    Return the land cover classes of a SplitWindowLST object and a NumPy
+    look-up table of shape (classes, subranges, 4) holding the folded
+    coefficients A, B, C, D in the order of cwv_subranges().
+    """
+    classes = split_window_lst._landcover_classes()
+    folded = split_window_lst.folded_coefficients()
+    table = numpy.array([[folded[(landcover_class, subrange)]
+                          for subrange in cwv_subranges()]
+                         for landcover_class in classes])
+    return classes, table
+
+
+def folded_lookup_tables(split_window_lst):
+    """
+    Return a dictionary of 256-entry look-up tables, indexed by FROM-GLC
+    land cover code, of the folded coefficients B and C of a SplitWindowLST
+    object, for each (coefficient, cwv subrange) pair. Codes of no class with
+    known emissivities hold NaN. A and D do not depend on the land cover
+    class.
+    """
+    classes, table = folded_coefficient_tables(split_window_lst)
+    codes = landcover_class_table(classes)
+    known = codes >= 0
+
+    tables = {}
+    for index, subrange in enumerate(cwv_subranges()):
+        for coefficient in ('B', 'C'):
+            lookup = numpy.empty(256)
+            lookup.fill(numpy.nan)
+            column = FoldedCoefficients._fields.index(coefficient)
+            lookup[known] = table[codes[known], index, column]
+            tables[(coefficient, subrange)] = lookup
+    return tables
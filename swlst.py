@@ -0,0 +1,277 @@
+# -*- coding: utf-8 -*-
+"""
+Split-Window Land Surface Temperature for NumPy arrays, independent of GRASS
+GIS. The arrays may be in memory or numpy.memmap views of raw band files, they
+are processed row by row (see split_window_rows()).
+
+Example:
+
+    import numpy
+    from swlst import lst_from_arrays
+
+    b10 = numpy.memmap('B10.raw', dtype='uint16', mode='r', shape=(rows, cols))
+    b11 = numpy.memmap('B11.raw', dtype='uint16', mode='r', shape=(rows, cols))
+    landcover = numpy.memmap('FROM_GLC.raw', dtype='uint8', mode='r',
+                             shape=(rows, cols))
+
+    result = lst_from_arrays(b10, b11, 'MTL.txt', landcover=landcover,
+                             window=9)
+    result.lst, result.cwv, result.avg_lse, result.delta_lse
+"""
+
+import numpy
+from collections import namedtuple
+from landsat8_mtl import Landsat8_MTL, load_mtl
+from split_window_lst import SplitWindowLST
+from split_window_lst_arrays import compute_lst_array, compute_lst_array_folded
+from split_window_lst_arrays import emissivity_lookup_tables
+from split_window_lst_arrays import lookup_emissivities
+from column_water_vapor import Column_Water_Vapor
+from column_water_vapor_arrays import stream_column_water_vapor
+
+# results of lst_from_arrays()
+SplitWindowArrays = namedtuple('SplitWindowArrays',
+                               ['lst', 'cwv', 'avg_lse', 'delta_lse'])
+
+
+def radiance_to_temperature_array(landsat8, bandnumber, radiance):
+    """
+    Convert an array of spectral radiance to At-Satellite Brightness
+    Temperature, as in Landsat8_MTL.radiance_to_temperature(), for NumPy
+    arrays instead of GRASS GIS' r.mapcalc.
+    """
+    k2 = float(getattr(landsat8.mtl, ('K2_CONSTANT_BAND_' + str(bandnumber))))
+    k1 = float(getattr(landsat8.mtl, ('K1_CONSTANT_BAND_' + str(bandnumber))))
+
+    with numpy.errstate(divide='ignore', invalid='ignore'):
+        return k2 / numpy.log(k1 / radiance + 1)
+
+
+def brightness_temperature_table(landsat8, bandnumber, dtype=numpy.float64):
+    """
+    Return a look-up table of At-Satellite Brightness Temperatures for each
+    of the 2^16 Digital Numbers of TIRS band 10 or 11 of a Landsat8_MTL
+    object, computed once via Landsat8_MTL.toar_radiance_array() and
+    radiance_to_temperature_array(), and kept in its 'temperature_tables'.
+    Indexing the table by Digital Numbers replaces both conversions,
+    logarithm included, per pixel.
+    """
+    key = (int(bandnumber), numpy.dtype(dtype))
+    if key not in landsat8.temperature_tables:
+        digital_numbers = numpy.arange(2**16, dtype=numpy.float64)
+        radiance = landsat8.toar_radiance_array(bandnumber, digital_numbers)
+        table = radiance_to_temperature_array(landsat8, bandnumber, radiance)
+        landsat8.temperature_tables[key] = table.astype(dtype)
+
+    return landsat8.temperature_tables[key]
+
+
+def brightness_temperature_lookup(landsat8, bandnumber, digital_numbers,
+                                  dtype=numpy.float64):
+    """
+    Convert an array of Digital Numbers to At-Satellite Brightness
+    Temperature via the look-up table of brightness_temperature_table().
+    Null (NaN) or out of range Digital Numbers yield NaN.
+    """
+    table = brightness_temperature_table(landsat8, bandnumber, dtype)
+    digital_numbers = numpy.asarray(digital_numbers, dtype=numpy.float64)
+    with numpy.errstate(invalid='ignore'):
+        outside = ~((digital_numbers >= 0) &
+                    (digital_numbers < len(table)))
+    codes = numpy.where(outside, 0, numpy.nan_to_num(digital_numbers))
+    temperatures = numpy.take(table, codes.astype(numpy.intp))
+    temperatures[outside] = numpy.nan
+    return temperatures
+
+
+def brightness_temperature_reclass_rules(landsat8, bandnumber, low=0,
+                                         high=2**16 - 1, scale=1000000,
+                                         null=False):
+    """
+    Return rules for GRASS GIS' r.reclass assigning each Digital Number
+    in [low, high] its At-Satellite Brightness Temperature, scaled by
+    'scale' and rounded to an integer. With 'null', the zero Digital
+    Number is left out, hence becomes null.
+    """
+    table = brightness_temperature_table(landsat8, bandnumber)
+    if null:
+        low = max(low, 1)
+    rules = ('{dn} = {value}'.format(dn=dn,
+                                     value=int(round(table[dn] * scale)))
+             for dn in xrange(low, high + 1)
+             if numpy.isfinite(table[dn]))
+    return '\n'.join(rules) + '\n'
+
+
+def brightness_temperature(digital_numbers, mtl, bandnumber, null=False,
+                           dtype=numpy.float64):
+    """
+    Convert Digital Numbers of TIRS band 10 or 11 to at-satellite brightness
+    temperatures (K), looked up in the table of all 16-bit Digital Numbers of
+    a Landsat8_MTL object (see brightness_temperature_table()). With 'null',
+    zero DNs are returned as NaN. The result is of type 'dtype'.
+    """
+    temperatures = brightness_temperature_lookup(mtl, bandnumber,
+                                                 digital_numbers, dtype)
+    if null:
+        temperatures[numpy.asarray(digital_numbers) == 0] = numpy.nan
+    return temperatures
+
+
+def split_window_rows(rows, split_window_lst, windows, folded=False,
+                      dtype=numpy.float64):
+    """
+    Compute column water vapor and land surface temperature row by row.
+
+    'rows' is an iterable yielding, per input row, a dictionary of 1D arrays
+    (or scalars for the emissivities):
+
+    - 't10', 't11': brightness temperatures
+    - 'avg_lse', 'delta_lse': average and delta emissivity
+    - 'landcover': FROM-GLC codes, required only if 'folded'
+
+    For each input row, the generator yields a tuple of the input dictionary,
+    a list of CWV rows and a list of LST rows, one per spatial window size in
+    'windows'. With 'folded', LST is derived from coefficients folded per land
+    cover class (see compute_lst_array_folded()). LST rows are computed, and
+    CWV rows returned, in the precision of 'dtype'. The column water vapor
+    selecting the cwv subrange of each pixel is always computed in double
+    precision, so that pixels close to a subrange boundary do not switch
+    sides. Brightness temperatures in double precision are required
+    for that too.
+
+    Input rows are read once and kept only until the window statistics of all
+    window sizes are complete (see stream_column_water_vapor()), hence memory
+    is bounded by the largest window times the number of columns.
+    """
+    cwvs = [Column_Water_Vapor(size, 'T10', 'T11') for size in windows]
+
+    # input rows are read once, kept until the outputs of all windows are out
+    bundles = enumerate(rows)
+    cache = {}
+    exhausted = []
+
+    def get_bundle(index):
+        while index not in cache and not exhausted:
+            try:
+                read, bundle = next(bundles)
+            except StopIteration:
+                exhausted.append(True)
+                break
+            cache[read] = bundle
+        return cache.get(index)
+
+    def temperature_rows(key):
+        index = 0
+        while get_bundle(index) is not None:
+            yield get_bundle(index)[key]
+            index += 1
+
+    streams = [stream_column_water_vapor(cwv, temperature_rows('t10'),
+                                         temperature_rows('t11'))
+               for cwv in cwvs]
+
+    index = 0
+    while get_bundle(index) is not None:
+        bundle = get_bundle(index)
+
+        cwv_rows = [next(stream) for stream in streams]
+        lst_rows = []
+        for cwv_row in cwv_rows:
+            if folded:
+                lst_row = compute_lst_array_folded(
+                    split_window_lst, bundle['t10'], bundle['t11'], cwv_row,
+                    bundle.get('landcover'), dtype)
+            else:
+                lst_row, validity = compute_lst_array(
+                    split_window_lst, bundle['t10'], bundle['t11'], cwv_row,
+                    bundle['avg_lse'], bundle['delta_lse'], dtype)
+            lst_rows.append(lst_row)
+
+        cwv_rows = [cwv_row.astype(dtype) for cwv_row in cwv_rows]
+        yield bundle, cwv_rows, lst_rows
+
+        del(cache[index])
+        index += 1
+
+
+def lst_from_arrays(b10, b11, mtl, landcover=None, emissivity_class=None,
+                    window=7, null=False, celsius=False, folded=False,
+                    dtype=numpy.float64):
+    """
+    Estimate land surface temperature from 2D arrays of TIRS bands 10, 11.
+
+    Inputs are:
+
+    - b10, b11: Digital Numbers, NumPy arrays or numpy.memmap views. If 'mtl'
+      is None, brightness temperatures (K) instead.
+    - mtl: a Landsat8 MTL filename or Landsat8_MTL object
+    - landcover: an array of FROM-GLC codes, or else
+    - emissivity_class: a fixed land cover class (see SplitWindowLST)
+    - window: odd size n of the n^2 spatial window for column water vapor
+    - null: treat zero Digital Numbers as null (NaN)
+    - celsius: return LST in degrees Celsius instead of Kelvin
+    - folded: use coefficients folded per land cover class
+    - dtype: numpy.float32 computes emissivities and LST in single
+      precision, halving the memory of the outputs
+
+    Returns a SplitWindowArrays namedtuple of LST, CWV, average and delta
+    emissivity arrays, of type 'dtype'. Null pixels are NaN.
+
+    Brightness temperatures and the column water vapor, which selects the cwv
+    subrange of each pixel, are always computed in double precision (see
+    split_window_rows()). In single precision, the LST then differs from the
+    double precision one by less than 0.001 K and the CWV by less than
+    1e-6 g/cm^2, well below the accuracy of the algorithm (about 1 K).
+    """
+    if (landcover is None) == (emissivity_class is None):
+        raise ValueError('Either a landcover array or an emissivity_class is '
+                         'required')
+
+    if mtl is not None and not isinstance(mtl, Landsat8_MTL):
+        mtl = load_mtl(mtl)
+
+    split_window_lst = SplitWindowLST(emissivity_class or '')
+    if landcover is None and not split_window_lst.landcover_class:
+        raise ValueError('Unknown land cover class {name}'.format(
+            name=emissivity_class))
+
+    shape = numpy.shape(b10)
+    lse_tables = [table.astype(dtype) for table in emissivity_lookup_tables()]
+
+    def read_rows():
+        for index in xrange(shape[0]):
+            if mtl is None:
+                bundle = {'t10': numpy.array(b10[index], dtype=numpy.float64),
+                          't11': numpy.array(b11[index], dtype=numpy.float64)}
+            else:
+                bundle = {'t10': brightness_temperature(b10[index], mtl, 10,
+                                                        null),
+                          't11': brightness_temperature(b11[index], mtl, 11,
+                                                        null)}
+
+            if landcover is None:
+                bundle['avg_lse'] = split_window_lst.average_emissivity
+                bundle['delta_lse'] = split_window_lst.delta_emissivity
+            else:
+                bundle['landcover'] = numpy.array(landcover[index],
+                                                  dtype=numpy.float64)
+                bundle['avg_lse'], bundle['delta_lse'] = \
+                    lookup_emissivities(bundle['landcover'], lse_tables)
+            yield bundle
+
+    result = SplitWindowArrays(*[numpy.empty(shape, dtype=dtype) for field in
+                                 SplitWindowArrays._fields])
+
+    rows = split_window_rows(read_rows(), split_window_lst, [window], folded,
+                             dtype)
+    for index, (bundle, cwv_rows, lst_rows) in enumerate(rows):
+        result.cwv[index] = cwv_rows[0]
+        result.lst[index] = lst_rows[0]
+        result.avg_lse[index] = bundle['avg_lse']
+        result.delta_lse[index] = bundle['delta_lse']
+
+    if celsius:
+        result.lst[:] -= 273.15
+
+    return result
@@ -0,0 +1,181 @@
+# -*- coding: utf-8 -*-
+"""
+Batch processing of several Landsat8 scenes with i.landsat8.swlst on a pool of
+worker processes. Each scene runs in its own temporary mapset, with a copy of
+the current computational region, hence scenes do not interfere. The output
+maps of a successful scene are copied in to the current mapset, named after
+the scene.
+"""
+
+import os
+import shutil
+import time
+import multiprocessing
+from collections import namedtuple
+import grass.script as grass
+from landsat8_mtl import load_mtl
+
+# globals
+MODULE = 'i.landsat8.swlst'
+SCENE_OPTIONS = ('scenes', 'workers', 'mtl', 'prefix', 'b10', 'b11', 't10',
+                 't11', 'qab', 'clouds')
+SUFFIXED_OUTPUTS = ('lst', 'cwv', 'emissivity_out', 'delta_emissivity_out')
+
+# one entry of the scene list and the outcome of processing it
+Scene = namedtuple('Scene', ['name', 'mtl', 'prefix'])
+SceneResult = namedtuple('SceneResult', ['scene', 'success', 'outputs',
+                                         'message', 'seconds'])
+
+
+def read_scene_list(filename):
+    """
+    Read a list of scenes, one per line: an MTL file and, optionally, the
+    prefix of the band names. Without a prefix, bands are expected to be named
+    after the scene's identifier, for example LC81840332014146LGN00_B10.
+    Empty lines and lines starting with '#' are skipped.
+    """
+    scenes = []
+    with open(filename, 'r') as scene_list:
+        for line in scene_list:
+            fields = line.split()
+            if not fields or fields[0].startswith('#'):
+                continue
+
+            mtl = fields[0]
+            name = load_mtl(mtl).scene_id
+            if len(fields) > 1:
+                prefix = fields[1]
+            else:
+                prefix = name + '_B'
+            scenes.append(Scene(name=name, mtl=mtl, prefix=prefix))
+
+    return scenes
+
+
+def scene_options(options, scene):
+    """
+    Return the options of i.landsat8.swlst for a single scene: the batch
+    options without the per-scene inputs, plus the scene's MTL file and
+    prefix. Output names are suffixed with the scene's name.
+    """
+    arguments = dict((key, value) for key, value in options.items()
+                     if value and key not in SCENE_OPTIONS)
+    arguments['mtl'] = scene.mtl
+    arguments['prefix'] = scene.prefix
+
+    for key in SUFFIXED_OUTPUTS:
+        if key in arguments:
+            arguments[key] += '_' + scene.name
+    if 'prefix_bt' in arguments:
+        arguments['prefix_bt'] += '_' + scene.name + '_'
+    if 'profile' in arguments:
+        root, extension = os.path.splitext(arguments['profile'])
+        arguments['profile'] = root + '_' + scene.name + extension
+
+    return arguments
+
+
+def write_gisrc(filename, gisdbase, location, mapset):
+    """
+    Write a GRASS GIS session file pointing to the given mapset.
+    """
+    with open(filename, 'w') as gisrc:
+        gisrc.write('GISDBASE: {dbase}\n'
+                    'LOCATION_NAME: {location}\n'
+                    'MAPSET: {mapset}\n'.format(dbase=gisdbase,
+                                                location=location,
+                                                mapset=mapset))
+
+
+def process_scene(task):
+    """
+    Process one scene in a temporary mapset and copy its output maps in to the
+    original mapset. Runs in a worker process, hence 'task' is a plain tuple of
+    the scene, the options and flags for i.landsat8.swlst, the session's
+    GISDBASE, LOCATION_NAME, MAPSET and the name of the saved region.
+
+    Returns a SceneResult, failures do not raise.
+    """
+    scene, arguments, flags, gisdbase, location, mapset, region = task
+    start = time.time()
+
+    tmp_mapset = 'tmp_swlst_{pid}_{name}'.format(pid=os.getpid(),
+                                                 name=scene.name)
+    gisrc = grass.tempfile()
+    write_gisrc(gisrc, gisdbase, location, mapset)
+    env = os.environ.copy()
+    env['GISRC'] = gisrc
+
+    try:
+        # own mapset, seeing the original one, and own region
+        grass.run_command('g.mapset', flags='c', mapset=tmp_mapset,
+                          quiet=True, env=env)
+        grass.run_command('g.mapsets', operation='add', mapset=mapset,
+                          quiet=True, env=env)
+        grass.run_command('g.region', region=region + '@' + mapset,
+                          quiet=True, env=env)
+
+        process = grass.start_command(MODULE, flags=flags, overwrite=True,
+                                      quiet=True, stderr=grass.PIPE, env=env,
+                                      **arguments)
+        stdout, stderr = process.communicate()
+        if process.returncode != 0:
+            message = stderr.strip().splitlines()
+            message = message[-1] if message else 'exit status {code}'.format(
+                code=process.returncode)
+            return SceneResult(scene, False, [], message, time.time() - start)
+
+        outputs = grass.read_command('g.list', type='raster',
+                                     mapset=tmp_mapset, env=env).split()
+        for name in outputs:
+            grass.run_command('g.copy',
+                              raster=(name + '@' + tmp_mapset, name),
+                              overwrite=True, quiet=True)
+
+        return SceneResult(scene, True, outputs, '', time.time() - start)
+
+    except Exception as error:
+        return SceneResult(scene, False, [], str(error), time.time() - start)
+
+    finally:
+        shutil.rmtree(os.path.join(gisdbase, location, tmp_mapset),
+                      ignore_errors=True)
+        os.remove(gisrc)
+
+
+def run_batch(scenes, options, flags, workers=1):
+    """
+    Process a list of scenes (see read_scene_list()) with i.landsat8.swlst on
+    'workers' processes and return a list of SceneResult, in the order of the
+    scenes. The 'options' and 'flags' are those of the batch call (see
+    scene_options()).
+    """
+    environment = grass.gisenv()
+    gisdbase = environment['GISDBASE']
+    location = environment['LOCATION_NAME']
+    mapset = environment['MAPSET']
+
+    # each worker starts from a copy of the current region
+    region = 'tmp_swlst_batch_{pid}'.format(pid=os.getpid())
+    grass.run_command('g.region', save=region, overwrite=True, quiet=True)
+
+    flags = ''.join(sorted(key for key, value in flags.items()
+                           if value and len(key) == 1))
+    tasks = [(scene, scene_options(options, scene), flags, gisdbase,
+              location, mapset, region) for scene in scenes]
+
+    try:
+        if workers > 1:
+            pool = multiprocessing.Pool(min(workers, len(tasks)))
+            try:
+                results = pool.map(process_scene, tasks, chunksize=1)
+            finally:
+                pool.close()
+                pool.join()
+        else:
+            results = [process_scene(task) for task in tasks]
+    finally:
+        grass.run_command('g.remove', flags='f', type='region', name=region,
+                          quiet=True)
+
+    return results
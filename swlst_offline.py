@@ -0,0 +1,1458 @@
+# -*- coding: utf-8 -*-
+"""
+In-process stand-in for the GRASS GIS calls of i.landsat8.swlst, backed by a
+store of NumPy arrays, so that the module's main() runs, is profiled (-p) and
+benchmarked without a GRASS GIS installation or session.
+
+It covers what the module uses:
+
+- grass.script: mapcalc(), mapcalc_start(), run_command(), read_command(),
+  write_command(), parse_command(), raster_info(), region(), region_env(),
+  find_file(), use_temp_region(), del_temp_region(), messages
+- r.mapcalc expressions of the subset the module generates: arithmetic,
+  comparison and logical operators, neighbourhood modifiers, eval(), if(),
+  isnull(), null(), float(), double(), int(), round(), log(), exp(), sqrt(),
+  abs(), min(), max(), median(), row(), col() and a few more
+- the commands r.mask, r.null, r.info, r.support, r.colors, r.timestamp,
+  r.reclass, r.recode, r.patch, r.neighbors, r.univar, r.stats (integer
+  maps, without counts), g.region, g.copy, g.rename, g.remove, g.list and
+  g.message
+- pygrass: the 'g' and 'r' module shortcuts, RasterRow and Buffer
+
+Maps are read within the current region, nearest neighbour, and through the
+MASK as in GRASS GIS. Null cells are NaN. Commands not covered raise a
+ScriptError.
+
+Example:
+
+    from swlst_offline import RasterStore, run_module
+
+    store = RasterStore(rows=512, cols=512)
+    store.write('B10', b10, 'CELL')
+    store.write('B11', b11, 'CELL')
+    store.write('BQA', qa, 'CELL')
+    store.write('FROM_GLC', landcover, 'CELL')
+    run_module(store, {'mtl': 'MTL.txt', 'b10': 'B10', 'b11': 'B11',
+                       'qab': 'BQA', 'landcover': 'FROM_GLC', 'lst': 'LST'},
+               flags='p')
+    lst = store.read('LST')
+"""
+
+import os
+import re
+import sys
+import imp
+import types
+import string
+import fnmatch
+import warnings
+import itertools
+import subprocess
+import __builtin__
+import numpy
+from collections import namedtuple
+from tempfile import mkstemp
+
+# globals
+SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                      'i.landsat8.swlst.py')
+CELL_NULL = -2147483648
+KINDS = ('CELL', 'FCELL', 'DCELL')
+DTYPES = {'CELL': numpy.int32, 'FCELL': numpy.float32, 'DCELL': numpy.float64}
+REGION_KEYS = (('north', 'n'), ('south', 's'), ('east', 'e'), ('west', 'w'),
+               ('rows', 'rows'), ('cols', 'cols'), ('n-s resol', 'nsres'),
+               ('e-w resol', 'ewres'))
+
+# a map of the store: values (NaN for nulls), type, extent and metadata
+StoredRaster = namedtuple('StoredRaster', ['array', 'mtype', 'region',
+                                           'metadata'])
+
+# the store the installed stand-ins operate on (see install())
+STORE = None
+VERBOSE = False
+
+# the parse trees of big expressions, e.g. CWV over a 21^2 window, are deep
+RECURSION_LIMIT = 10000
+
+
+class ScriptError(Exception):
+    """
+    Raised by failing commands and by fatal(), as grass.script does when
+    raising on errors.
+    """
+    pass
+
+
+def make_region(north, south, east, west, rows, cols):
+    """
+    Return a region dictionary, keyed as the one of grass.script.region().
+    """
+    rows, cols = int(rows), int(cols)
+    return {'n': float(north), 's': float(south), 'e': float(east),
+            'w': float(west), 'rows': rows, 'cols': cols,
+            'cells': rows * cols,
+            'nsres': (float(north) - float(south)) / rows,
+            'ewres': (float(east) - float(west)) / cols}
+
+
+def strip_mapset(name):
+    """
+    Return a map name without its '@mapset' part.
+    """
+    return name.split('@')[0]
+
+
+def names(value):
+    """
+    Return the list of names of a command parameter, given as a comma
+    separated string or a sequence.
+    """
+    if isinstance(value, basestring):
+        value = value.split(',')
+    return [strip_mapset(str(name).strip()) for name in value if name]
+
+
+def cast(values, kind):
+    """
+    Round values to the precision of a raster type: integers are truncated,
+    single precision floating point values are rounded to float32.
+    """
+    values = numpy.asarray(values, dtype=numpy.float64)
+    if kind == 'FCELL':
+        return values.astype(numpy.float32).astype(numpy.float64)
+    if kind == 'CELL':
+        return numpy.trunc(values)
+    return values
+
+
+class RasterStore(object):
+    """
+    Raster maps held as 2D NumPy arrays, with a current computational region.
+    The default region is of Landsat8's 30 m pixels, its north-west corner at
+    the origin.
+    """
+
+    def __init__(self, rows, cols, north=None, south=0, east=None, west=0):
+        if north is None:
+            north = south + 30 * rows
+        if east is None:
+            east = west + 30 * cols
+        self.region = make_region(north, south, east, west, rows, cols)
+        self.maps = {}
+        self.saved_regions = {}
+        self.temporary_regions = []
+
+    def exists(self, name):
+        return strip_mapset(name) in self.maps
+
+    def get(self, name):
+        """
+        Return the StoredRaster of a map, or raise a ScriptError.
+        """
+        try:
+            return self.maps[strip_mapset(name)]
+        except KeyError:
+            raise ScriptError('Raster map <{name}> not found'.format(
+                name=name))
+
+    def write(self, name, array, mtype='DCELL', region=None, overwrite=True,
+              **metadata):
+        """
+        Store a 2D array, shaped as the given or current region, as a map.
+        NaN cells are nulls.
+        """
+        name = strip_mapset(name)
+        if name in self.maps and not overwrite:
+            raise ScriptError('Raster map <{name}> exists, overwriting not '
+                              'allowed'.format(name=name))
+        region = dict(region or self.region)
+        array = cast(array, mtype)
+        if array.shape != (region['rows'], region['cols']):
+            raise ScriptError('Array of shape {shape} does not match the '
+                              'region of {rows} x {cols} cells'.format(
+                                  shape=array.shape, rows=region['rows'],
+                                  cols=region['cols']))
+        self.maps[name] = StoredRaster(array, mtype, region, metadata)
+
+    def read(self, name, region=None, masked=True):
+        """
+        Return the values of a map within the given or current region, as a
+        2D array of floats, NaN for nulls. With 'masked', cells which are
+        null or zero in the MASK are null.
+        """
+        raster = self.get(name)
+        region = region or self.region
+        values = self.resample(raster, region)
+
+        if masked and 'MASK' in self.maps and strip_mapset(name) != 'MASK':
+            mask = self.resample(self.maps['MASK'], region)
+            values = numpy.where(numpy.isnan(mask) | (mask == 0), numpy.nan,
+                                 values)
+        return values
+
+    def resample(self, raster, region):
+        """
+        Return the values of a StoredRaster at the cell centres of a region,
+        nearest neighbour. Cells outside the map's extent are null.
+        """
+        extent = raster.region
+        if all(region[key] == extent[key]
+               for key in ('n', 's', 'e', 'w', 'rows', 'cols')):
+            return raster.array.copy()
+
+        north = region['n'] - (numpy.arange(region['rows']) + 0.5) * \
+            region['nsres']
+        east = region['w'] + (numpy.arange(region['cols']) + 0.5) * \
+            region['ewres']
+        rows = numpy.floor((extent['n'] - north) / extent['nsres'])
+        cols = numpy.floor((east - extent['w']) / extent['ewres'])
+        inside_rows = (rows >= 0) & (rows < extent['rows'])
+        inside_cols = (cols >= 0) & (cols < extent['cols'])
+
+        values = raster.array[numpy.ix_(rows.clip(0, extent['rows'] - 1)
+                                        .astype(int),
+                                        cols.clip(0, extent['cols'] - 1)
+                                        .astype(int))]
+        inside = inside_rows[:, numpy.newaxis] & inside_cols[numpy.newaxis, :]
+        return numpy.where(inside, values, numpy.nan)
+
+    def remove(self, name):
+        self.maps.pop(strip_mapset(name), None)
+
+    def rename(self, old, new, overwrite=False):
+        raster = self.get(old)
+        self.write(new, raster.array, raster.mtype, raster.region, overwrite,
+                   **raster.metadata)
+        self.remove(old)
+
+    def copy(self, old, new, overwrite=False):
+        raster = self.get(old)
+        self.write(new, raster.array.copy(), raster.mtype, raster.region,
+                   overwrite, **dict(raster.metadata))
+
+    def info(self, name):
+        """
+        Return a dictionary as the one of grass.script.raster_info(), minimum
+        and maximum being None for maps of nulls only.
+        """
+        raster = self.get(name)
+        valid = raster.array[~numpy.isnan(raster.array)]
+        minimum = maximum = None
+        if valid.size:
+            minimum, maximum = float(valid.min()), float(valid.max())
+        region = raster.region
+        information = {'north': region['n'], 'south': region['s'],
+                       'east': region['e'], 'west': region['w'],
+                       'nsres': region['nsres'], 'ewres': region['ewres'],
+                       'rows': region['rows'], 'cols': region['cols'],
+                       'cells': region['cells'], 'datatype': raster.mtype,
+                       'min': minimum, 'max': maximum, 'ncats': 0,
+                       'map': strip_mapset(name), 'title': '', 'units': None,
+                       'vdatum': None, 'source1': '', 'source2': '',
+                       'description': '', 'comments': '', 'timestamp': None}
+        information.update(raster.metadata)
+        return information
+
+
+# r.mapcalc expressions
+
+TOKENS = re.compile(r'''
+    (?P<space>[\s\\]+)
+  | (?P<number>(?:\d+\.\d*|\.\d+|\d+)(?:[eE][-+]?\d+)?)
+  | (?P<name>[A-Za-z_][\w.]*(?:@[\w.]+)?)
+  | (?P<quoted>"[^"]*")
+  | (?P<operator>&&&|\|\|\||&&|\|\||==|!=|<=|>=|[-+*/%^<>!?:(),\[\]=;])
+''', re.VERBOSE)
+
+BINARY_OPERATORS = (('||', '|||'), ('&&', '&&&'), ('==', '!='),
+                    ('<', '<=', '>', '>='), ('+', '-'), ('*', '/', '%'))
+
+
+def tokenize(expression):
+    """
+    Split an r.mapcalc expression in to (type, text) tokens. Backslashes and
+    newlines are white space.
+    """
+    tokens = []
+    position = 0
+    while position < len(expression):
+        match = TOKENS.match(expression, position)
+        if not match:
+            raise ScriptError('Syntax error in r.mapcalc expression near '
+                              '"{text}"'.format(
+                                  text=expression[position:position + 20]))
+        position = match.end()
+        if match.lastgroup != 'space':
+            tokens.append((match.lastgroup, match.group()))
+    return tokens
+
+
+class MapcalcParser(object):
+    """
+    Recursive descent parser of r.mapcalc statements in to nested tuples,
+    following r.mapcalc's precedence of operators: unary operators bind
+    tighter than the exponentiation, which is right associative.
+    """
+
+    def __init__(self, expression):
+        self.tokens = tokenize(expression)
+        self.position = 0
+
+    def peek(self, offset=0):
+        index = self.position + offset
+        if index < len(self.tokens):
+            return self.tokens[index][1]
+        return None
+
+    def take(self, expected=None):
+        if self.position >= len(self.tokens):
+            raise ScriptError('Unexpected end of r.mapcalc expression')
+        kind, text = self.tokens[self.position]
+        if expected is not None and text != expected:
+            raise ScriptError('Expected "{expected}" in r.mapcalc expression, '
+                              'found "{text}"'.format(expected=expected,
+                                                      text=text))
+        self.position += 1
+        return kind, text
+
+    def statements(self):
+        """
+        Return a list of (name, expression) of 'name = expression' statements.
+        """
+        statements = []
+        while self.position < len(self.tokens):
+            if self.peek() == ';':
+                self.take()
+                continue
+            kind, name = self.take()
+            if kind not in ('name', 'quoted'):
+                raise ScriptError('Expected a map name in r.mapcalc '
+                                  'statement, found "{name}"'.format(
+                                      name=name))
+            self.take('=')
+            statements.append((strip_mapset(name.strip('"')),
+                               self.expression()))
+        return statements
+
+    def expression(self):
+        condition = self.binary(0)
+        if self.peek() == '?':
+            self.take()
+            true = self.expression()
+            self.take(':')
+            false = self.expression()
+            return ('call', 'if', [condition, true, false])
+        return condition
+
+    def binary(self, level):
+        if level == len(BINARY_OPERATORS):
+            return self.power()
+        node = self.binary(level + 1)
+        while self.peek() in BINARY_OPERATORS[level]:
+            operator = self.take()[1]
+            node = ('binary', operator, node, self.binary(level + 1))
+        return node
+
+    def power(self):
+        node = self.unary()
+        if self.peek() == '^':
+            self.take()
+            node = ('binary', '^', node, self.power())
+        return node
+
+    def unary(self):
+        if self.peek() in ('-', '+', '!'):
+            operator = self.take()[1]
+            return ('unary', operator, self.unary())
+        return self.primary()
+
+    def primary(self):
+        kind, text = self.take()
+        if kind == 'number':
+            if re.match(r'^\d+$', text):
+                return ('number', float(text), 'CELL')
+            return ('number', float(text), 'DCELL')
+        if text == '(':
+            node = self.expression()
+            self.take(')')
+            return node
+        if kind == 'quoted':
+            return ('map', strip_mapset(text.strip('"')), 0, 0)
+        if kind != 'name':
+            raise ScriptError('Unexpected "{text}" in r.mapcalc '
+                              'expression'.format(text=text))
+
+        if self.peek() == '(':
+            self.take()
+            arguments = []
+            while self.peek() != ')':
+                if self.peek(1) == '=' and text == 'eval':
+                    name = self.take()[1]
+                    self.take('=')
+                    arguments.append(('assign', name, self.expression()))
+                else:
+                    arguments.append(self.expression())
+                if self.peek() == ',':
+                    self.take()
+            self.take(')')
+            return ('call', text, arguments)
+
+        if self.peek() == '[':
+            self.take()
+            rows = self.offset()
+            columns = 0
+            if self.peek() == ',':
+                self.take()
+                columns = self.offset()
+            self.take(']')
+            return ('map', strip_mapset(text), rows, columns)
+
+        return ('map', strip_mapset(text), 0, 0)
+
+    def offset(self):
+        sign = 1
+        if self.peek() in ('-', '+'):
+            sign = -1 if self.take()[1] == '-' else 1
+        kind, text = self.take()
+        if kind != 'number':
+            raise ScriptError('Neighbourhood modifiers must be integers')
+        return sign * int(text)
+
+
+def shift(values, rows, columns):
+    """
+    Return values[row + rows, column + columns] for each cell, null beyond
+    the edges, as r.mapcalc's neighbourhood modifier [rows, columns].
+    """
+    if not rows and not columns:
+        return values
+    height, width = values.shape
+    shifted = numpy.empty(values.shape)
+    shifted.fill(numpy.nan)
+    top, bottom = max(0, -rows), height - max(0, rows)
+    left, right = max(0, -columns), width - max(0, columns)
+    if bottom > top and right > left:
+        shifted[top:bottom, left:right] = \
+            values[top + rows:bottom + rows, left + columns:right + columns]
+    return shifted
+
+
+def promote(*kinds):
+    """
+    Return the widest of raster types.
+    """
+    return KINDS[max(KINDS.index(kind) for kind in kinds)]
+
+
+def null_where(condition, values):
+    return numpy.where(condition, numpy.nan, values)
+
+
+class MapcalcEvaluator(object):
+    """
+    Evaluate parsed r.mapcalc expressions on whole arrays of a region.
+    Values are (array, type) tuples, nulls are NaN.
+    """
+
+    def __init__(self, store, region):
+        self.store = store
+        self.region = region
+        self.shape = (region['rows'], region['cols'])
+        self.maps = {}
+        self.variables = {}
+
+    def evaluate(self, node):
+        return getattr(self, 'evaluate_' + node[0])(*node[1:])
+
+    def result(self, node):
+        """
+        Return the array, shaped as the region, and type of an expression.
+        """
+        with numpy.errstate(all='ignore'):
+            values, kind = self.evaluate(node)
+        values = numpy.array(numpy.broadcast_to(values, self.shape),
+                             dtype=numpy.float64)
+        return values, kind
+
+    def evaluate_number(self, value, kind):
+        return numpy.float64(value), kind
+
+    def evaluate_map(self, name, rows, columns):
+        if name in self.variables and not rows and not columns:
+            return self.variables[name]
+        if name not in self.maps:
+            self.maps[name] = (self.store.read(name, self.region),
+                               self.store.get(name).mtype)
+        values, kind = self.maps[name]
+        return shift(values, rows, columns), kind
+
+    def evaluate_assign(self, name, node):
+        self.variables[name] = self.evaluate(node)
+        return self.variables[name]
+
+    def evaluate_unary(self, operator, node):
+        values, kind = self.evaluate(node)
+        if operator == '-':
+            return -values, kind
+        if operator == '!':
+            return null_where(numpy.isnan(values), values == 0), 'CELL'
+        return values, kind
+
+    def evaluate_binary(self, operator, left, right):
+        x, kind_x = self.evaluate(left)
+        y, kind_y = self.evaluate(right)
+        null = numpy.isnan(x) | numpy.isnan(y)
+
+        if operator in ('==', '!=', '<', '<=', '>', '>='):
+            compare = {'==': numpy.equal, '!=': numpy.not_equal,
+                       '<': numpy.less, '<=': numpy.less_equal,
+                       '>': numpy.greater, '>=': numpy.greater_equal}
+            return null_where(null, compare[operator](x, y)), 'CELL'
+
+        if operator in ('&&', '||'):
+            if operator == '&&':
+                values = (x != 0) & (y != 0)
+            else:
+                values = (x != 0) | (y != 0)
+            return null_where(null, values), 'CELL'
+
+        if operator == '&&&':
+            false = ((x == 0) & ~numpy.isnan(x)) | ((y == 0) & ~numpy.isnan(y))
+            return numpy.where(false, 0, null_where(null, 1)), 'CELL'
+
+        if operator == '|||':
+            true = ((x != 0) & ~numpy.isnan(x)) | ((y != 0) & ~numpy.isnan(y))
+            return numpy.where(true, 1, null_where(null, 0)), 'CELL'
+
+        kind = promote(kind_x, kind_y)
+        if operator == '+':
+            values = x + y
+        elif operator == '-':
+            values = x - y
+        elif operator == '*':
+            values = x * y
+        elif operator == '/':
+            values = null_where(y == 0, x / y)
+            if kind == 'CELL':
+                values = numpy.trunc(values)
+        elif operator == '%':
+            values = null_where(y == 0, numpy.fmod(x, y))
+        elif operator == '^':
+            values = numpy.power(x, y)
+            if kind == 'CELL':
+                values = null_where(y < 0, values)
+        return cast(values, kind), kind
+
+    def evaluate_call(self, function, arguments):
+        method = getattr(self, 'function_' + function, None)
+        if method is None:
+            raise ScriptError('r.mapcalc function {name}() is not available '
+                              'offline'.format(name=function))
+        if function == 'eval':
+            return method(arguments)
+        return method(*[self.evaluate(argument) for argument in arguments])
+
+    def function_eval(self, arguments):
+        for argument in arguments:
+            value = self.evaluate(argument)
+        return value
+
+    def function_if(self, condition, *branches):
+        condition, kind_condition = condition
+        if not branches:
+            return null_where(numpy.isnan(condition), condition != 0), 'CELL'
+        if len(branches) == 1:
+            branches += ((numpy.float64(0), 'CELL'),)
+
+        kind = promote(*[kind for values, kind in branches])
+        if len(branches) == 2:
+            values = numpy.where(condition != 0, branches[0][0],
+                                 branches[1][0])
+        else:
+            values = numpy.where(condition > 0, branches[0][0],
+                                 numpy.where(condition == 0, branches[1][0],
+                                             branches[2][0]))
+        return null_where(numpy.isnan(condition), values), kind
+
+    def function_null(self):
+        return numpy.float64(numpy.nan), 'CELL'
+
+    def function_isnull(self, value):
+        return numpy.isnan(value[0]).astype(numpy.float64), 'CELL'
+
+    def function_float(self, value):
+        return cast(value[0], 'FCELL'), 'FCELL'
+
+    def function_double(self, value):
+        return value[0], 'DCELL'
+
+    def function_int(self, value):
+        return numpy.trunc(value[0]), 'CELL'
+
+    def function_round(self, value):
+        return numpy.floor(value[0] + 0.5), 'CELL'
+
+    def function_abs(self, value):
+        return numpy.abs(value[0]), value[1]
+
+    def function_sqrt(self, value):
+        return numpy.sqrt(value[0]), 'DCELL'
+
+    def function_log(self, value, base=None):
+        values = null_where(value[0] <= 0, numpy.log(value[0]))
+        if base is not None:
+            values = values / numpy.log(base[0])
+        return values, 'DCELL'
+
+    def function_exp(self, value, power=None):
+        if power is not None:
+            return numpy.power(value[0], power[0]), 'DCELL'
+        return numpy.exp(value[0]), 'DCELL'
+
+    def function_sin(self, value):
+        return numpy.sin(numpy.radians(value[0])), 'DCELL'
+
+    def function_cos(self, value):
+        return numpy.cos(numpy.radians(value[0])), 'DCELL'
+
+    def function_tan(self, value):
+        return numpy.tan(numpy.radians(value[0])), 'DCELL'
+
+    def _reduce(self, values, function):
+        kind = promote(*[kind for array, kind in values])
+        stack = numpy.array(numpy.broadcast_arrays(*[array for array, kind
+                                                     in values]))
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore', RuntimeWarning)
+            return cast(function(stack, axis=0), kind), kind
+
+    def function_min(self, *values):
+        return self._reduce(values, numpy.min)
+
+    def function_max(self, *values):
+        return self._reduce(values, numpy.max)
+
+    def function_median(self, *values):
+        return self._reduce(values, numpy.median)
+
+    def function_nmin(self, *values):
+        return self._reduce(values, numpy.nanmin)
+
+    def function_nmax(self, *values):
+        return self._reduce(values, numpy.nanmax)
+
+    def function_nmedian(self, *values):
+        return self._reduce(values, numpy.nanmedian)
+
+    def function_row(self):
+        rows = numpy.arange(1, self.shape[0] + 1, dtype=numpy.float64)
+        return rows[:, numpy.newaxis], 'CELL'
+
+    def function_col(self):
+        columns = numpy.arange(1, self.shape[1] + 1, dtype=numpy.float64)
+        return columns[numpy.newaxis, :], 'CELL'
+
+    def function_nrows(self):
+        return numpy.float64(self.shape[0]), 'CELL'
+
+    def function_ncols(self):
+        return numpy.float64(self.shape[1]), 'CELL'
+
+    def function_x(self):
+        columns = self.function_col()[0]
+        return (self.region['w'] + (columns - 0.5) * self.region['ewres'],
+                'DCELL')
+
+    def function_y(self):
+        rows = self.function_row()[0]
+        return self.region['n'] - (rows - 0.5) * self.region['nsres'], 'DCELL'
+
+    def function_nsres(self):
+        return numpy.float64(self.region['nsres']), 'DCELL'
+
+    def function_ewres(self):
+        return numpy.float64(self.region['ewres']), 'DCELL'
+
+
+def evaluate_mapcalc(store, expression, region=None, overwrite=False):
+    """
+    Evaluate the 'name = expression' statements of an r.mapcalc expression
+    and store the resulting maps.
+    """
+    region = region or store.region
+    limit = sys.getrecursionlimit()
+    sys.setrecursionlimit(max(limit, RECURSION_LIMIT))
+    try:
+        for name, node in MapcalcParser(expression).statements():
+            overwrite = overwrite or os.environ.get('GRASS_OVERWRITE') == '1'
+            if store.exists(name) and not overwrite:
+                raise ScriptError('Raster map <{name}> exists, overwriting '
+                                  'not allowed'.format(name=name))
+            values, kind = MapcalcEvaluator(store, region).result(node)
+            store.write(name, values, kind, region)
+    finally:
+        sys.setrecursionlimit(limit)
+
+
+# commands
+
+def parse_values(string):
+    """
+    Parse category values for r.mask, r.null: numbers, 'a-b' ranges and
+    'a thru b' ranges, separated by blanks or commas. Returns a list of
+    (low, high) tuples, '*' matching any value.
+    """
+    if string.strip() == '*':
+        return [(-numpy.inf, numpy.inf)]
+    string = re.sub(r'\s+thru\s+', '-', string.strip())
+    ranges = []
+    for item in re.split(r'[\s,]+', string):
+        match = re.match(r'^(-?[\d.]+)-(-?[\d.]+)$', item)
+        if match:
+            ranges.append((float(match.group(1)), float(match.group(2))))
+        elif item:
+            ranges.append((float(item), float(item)))
+    return ranges
+
+
+def in_ranges(values, ranges):
+    selected = numpy.zeros(values.shape, dtype=bool)
+    for low, high in ranges:
+        selected |= (values >= low) & (values <= high)
+    return selected
+
+
+def reclass_table(rules):
+    """
+    Parse r.reclass rules in to a list of (input ranges, output value)
+    tuples. Output values of '*' or 'NULL' are nulls.
+    """
+    table = []
+    for line in rules.splitlines():
+        line = line.split('#')[0].strip()
+        if not line or line == 'end':
+            continue
+        inputs, output = line.split('=', 1)
+        output = output.split()[0]
+        value = numpy.nan if output in ('*', 'NULL') else float(output)
+        table.append((parse_values(inputs), value))
+    return table
+
+
+def read_rules(kwargs, stdin):
+    rules = kwargs.get('rules', '-')
+    if rules == '-':
+        return stdin or ''
+    with open(rules, 'r') as rules_file:
+        return rules_file.read()
+
+
+def r_mapcalc(store, kwargs, flags, overwrite, stdin, region):
+    expression = kwargs.get('expression')
+    if kwargs.get('file') == '-':
+        expression = stdin
+    elif kwargs.get('file'):
+        with open(kwargs['file'], 'r') as expression_file:
+            expression = expression_file.read()
+    evaluate_mapcalc(store, expression, region, overwrite)
+
+
+def r_mask(store, kwargs, flags, overwrite, stdin, region):
+    if 'r' in flags:
+        store.remove('MASK')
+        return
+    values = store.read(kwargs['raster'], masked=False)
+    selected = ~numpy.isnan(values)
+    maskcats = kwargs.get('maskcats', '*')
+    if maskcats != '*':
+        selected &= in_ranges(values, parse_values(maskcats))
+    if 'i' in flags:
+        selected = ~selected
+    store.write('MASK', numpy.where(selected, 1, numpy.nan), 'CELL')
+
+
+def r_null(store, kwargs, flags, overwrite, stdin, region):
+    raster = store.get(kwargs['map'])
+    values = raster.array
+    if 'setnull' in kwargs:
+        values = numpy.where(in_ranges(values,
+                                       parse_values(str(kwargs['setnull']))),
+                             numpy.nan, values)
+    if 'null' in kwargs:
+        values = numpy.where(numpy.isnan(values), float(kwargs['null']),
+                             values)
+    store.write(kwargs['map'], values, raster.mtype, raster.region,
+                **raster.metadata)
+
+
+def r_info(store, kwargs, flags, overwrite, stdin, region):
+    information = store.info(kwargs['map'])
+    keys = []
+    if 'g' in flags:
+        keys += ['north', 'south', 'east', 'west', 'nsres', 'ewres', 'rows',
+                 'cols', 'cells', 'datatype', 'ncats']
+    if 'r' in flags:
+        keys += ['min', 'max']
+    if 'e' in flags:
+        keys += ['map', 'title', 'units', 'vdatum', 'source1', 'source2',
+                 'description', 'comments', 'timestamp']
+    if not keys:
+        keys = sorted(information)
+
+    def value(key):
+        if information[key] is None:
+            return 'NULL'
+        if key in ('title', 'source1', 'source2', 'description', 'comments',
+                   'units', 'timestamp', 'vdatum') and 'e' in flags:
+            return '"{value}"'.format(value=information[key])
+        return information[key]
+
+    return '\n'.join('{key}={value}'.format(key=key, value=value(key))
+                     for key in keys) + '\n'
+
+
+def r_support(store, kwargs, flags, overwrite, stdin, region):
+    metadata = store.get(kwargs['map']).metadata
+    for key in ('title', 'units', 'vdatum', 'source1', 'source2',
+                'description'):
+        if key in kwargs:
+            metadata[key] = kwargs[key]
+    if 'history' in kwargs:
+        metadata['comments'] = (metadata.get('comments', '') + '\n' +
+                                kwargs['history']).strip()
+
+
+def r_colors(store, kwargs, flags, overwrite, stdin, region):
+    for name in names(kwargs['map']):
+        colors = kwargs.get('color') or kwargs.get('rules') or \
+            kwargs.get('raster')
+        store.get(name).metadata['colors'] = colors
+
+
+def r_timestamp(store, kwargs, flags, overwrite, stdin, region):
+    metadata = store.get(kwargs['map']).metadata
+    if 'date' not in kwargs:
+        return '{date}\n'.format(date=metadata.get('timestamp'))
+    if kwargs['date'] == 'none':
+        metadata.pop('timestamp', None)
+    else:
+        metadata['timestamp'] = kwargs['date']
+
+
+def r_reclass(store, kwargs, flags, overwrite, stdin, region):
+    values = store.read(kwargs['input'], region, masked=False)
+    if store.get(kwargs['input']).mtype != 'CELL':
+        raise ScriptError('r.reclass requires an integer input map')
+    reclassed = numpy.empty(values.shape)
+    reclassed.fill(numpy.nan)
+    assigned = numpy.isnan(values)
+
+    table = reclass_table(read_rules(kwargs, stdin))
+    single = [(low, value) for ranges, value in table
+              for low, high in ranges if low == high]
+    if len(single) == sum(len(ranges) for ranges, value in table):
+        # a look-up table, the later of duplicate rules wins, as in r.reclass
+        codes = numpy.where(assigned, 0, values).astype(numpy.int64)
+        keys = numpy.array([low for low, value in single], dtype=numpy.int64)
+        lookup = dict(zip(keys, [value for low, value in single]))
+        known = numpy.in1d(codes, keys).reshape(codes.shape) & ~assigned
+        unique, inverse = numpy.unique(codes[known], return_inverse=True)
+        reclassed[known] = numpy.array([lookup[code] for code in unique])[
+            inverse]
+    else:
+        for ranges, value in reversed(table):
+            selected = in_ranges(values, ranges) & ~assigned
+            reclassed[selected] = value
+
+    store.write(kwargs['output'], reclassed, 'CELL', region, overwrite,
+                title='Reclass of ' + kwargs['input'])
+
+
+def r_recode(store, kwargs, flags, overwrite, stdin, region):
+    values = store.read(kwargs['input'], region)
+    recoded = numpy.empty(values.shape)
+    recoded.fill(numpy.nan)
+    done = numpy.isnan(values)
+    floating = store.get(kwargs['input']).mtype != 'CELL' or 'd' in flags
+
+    for line in read_rules(kwargs, stdin).splitlines():
+        line = line.split('#')[0].strip()
+        if not line or line == 'end':
+            continue
+        fields = [float(field) for field in line.split(':')]
+        low, high, new_low = fields[:3]
+        new_high = fields[3] if len(fields) > 3 else new_low
+        floating = floating or new_low % 1 or new_high % 1
+        with numpy.errstate(invalid='ignore'):
+            selected = (values >= low) & (values <= high) & ~done
+        if high > low:
+            recoded[selected] = new_low + ((values[selected] - low) *
+                                           (new_high - new_low) / (high - low))
+        else:
+            recoded[selected] = new_low
+        done |= selected
+
+    store.write(kwargs['output'], recoded, 'DCELL' if floating else 'CELL',
+                region, overwrite)
+
+
+def r_patch(store, kwargs, flags, overwrite, stdin, region):
+    inputs = names(kwargs['input'])
+    patched = store.read(inputs[0], region)
+    for name in inputs[1:]:
+        patched = numpy.where(numpy.isnan(patched), store.read(name, region),
+                              patched)
+    kind = promote(*[store.get(name).mtype for name in inputs])
+    store.write(kwargs['output'], patched, kind, region, overwrite)
+
+
+def r_neighbors(store, kwargs, flags, overwrite, stdin, region):
+    values = store.read(kwargs['input'], region)
+    radius = int(kwargs.get('size', 3)) // 2
+    offsets = list(itertools.product(range(-radius, radius + 1), repeat=2))
+    stack = numpy.array([shift(values, rows, columns)
+                         for rows, columns in offsets])
+    kind = store.get(kwargs['input']).mtype
+
+    # windows of nulls only are null, as in r.neighbors, without the warnings
+    # of NumPy's nan-functions about empty slices
+    with numpy.errstate(all='ignore'), warnings.catch_warnings():
+        warnings.simplefilter('ignore', RuntimeWarning)
+        statistics = {'average': (numpy.nanmean, 'DCELL'),
+                      'median': (numpy.nanmedian, 'DCELL'),
+                      'minimum': (numpy.nanmin, kind),
+                      'maximum': (numpy.nanmax, kind),
+                      'sum': (numpy.nansum, kind),
+                      'count': (lambda stack, axis: (~numpy.isnan(stack))
+                                .sum(axis=axis), 'CELL')}
+        methods = names(kwargs.get('method', 'average'))
+        for output, method in zip(names(kwargs['output']), methods):
+            if method not in statistics:
+                raise ScriptError('r.neighbors method={method} is not '
+                                  'available offline'.format(method=method))
+            function, kind = statistics[method]
+            result = function(stack, axis=0).astype(numpy.float64)
+            if method == 'sum':
+                result[numpy.isnan(stack).all(axis=0)] = numpy.nan
+            store.write(output, result, kind, region, overwrite)
+
+
+def r_univar(store, kwargs, flags, overwrite, stdin, region):
+    values = store.read(kwargs['map'], region)
+    values = values[~numpy.isnan(values)]
+    statistics = [('n', values.size), ('null_cells', 0), ('cells', 0),
+                  ('min', values.min() if values.size else 'nan'),
+                  ('max', values.max() if values.size else 'nan'),
+                  ('mean', values.mean() if values.size else 'nan'),
+                  ('stddev', values.std() if values.size else 'nan'),
+                  ('sum', values.sum())]
+    return '\n'.join('{key}={value!r}'.format(key=key, value=value)
+                     for key, value in statistics) + '\n'
+
+
+def r_stats(store, kwargs, flags, overwrite, stdin, region):
+    values = store.read(names(kwargs['input'])[0], region)
+    nulls = numpy.isnan(values).any()
+    lines = ['{0:d}'.format(int(value))
+             for value in numpy.unique(values[~numpy.isnan(values)])]
+    if nulls and 'n' not in flags:
+        lines.append('*')
+    return ''.join(line + '\n' for line in lines)
+
+
+def g_region(store, kwargs, flags, overwrite, stdin, region):
+    raster = kwargs.get('raster') or kwargs.get('rast')
+    if kwargs.get('region'):
+        store.region = dict(store.saved_regions[strip_mapset(
+            kwargs['region'])])
+    if raster:
+        store.region = dict(store.get(names(raster)[0]).region)
+    if kwargs.get('save'):
+        store.saved_regions[kwargs['save']] = dict(store.region)
+    if 'p' in flags or 'g' in flags:
+        return ''.join('{key}={value}\n'.format(key=key, value=value)
+                       for key, value in sorted(store.region.items()))
+
+
+def g_copy(store, kwargs, flags, overwrite, stdin, region):
+    old, new = names(kwargs.get('raster') or kwargs.get('rast'))
+    store.copy(old, new, overwrite)
+
+
+def g_rename(store, kwargs, flags, overwrite, stdin, region):
+    old, new = names(kwargs.get('raster') or kwargs.get('rast'))
+    store.rename(old, new, overwrite)
+
+
+def g_remove(store, kwargs, flags, overwrite, stdin, region):
+    if 'f' not in flags:
+        return
+    if kwargs.get('type') == 'region':
+        for name in names(kwargs.get('name', '')):
+            store.saved_regions.pop(name, None)
+        return
+    removed = names(kwargs.get('name', ''))
+    if kwargs.get('pattern'):
+        removed += fnmatch.filter(store.maps, kwargs['pattern'])
+    for name in removed:
+        store.remove(name)
+
+
+def g_list(store, kwargs, flags, overwrite, stdin, region):
+    listed = sorted(fnmatch.filter(store.maps, kwargs.get('pattern', '*')))
+    return ''.join(name + '\n' for name in listed)
+
+
+def g_message(store, kwargs, flags, overwrite, stdin, region):
+    if 'w' in flags:
+        warning(kwargs['message'])
+    elif 'e' in flags:
+        error(kwargs['message'])
+    elif 'v' in flags:
+        verbose(kwargs['message'])
+    else:
+        message(kwargs['message'])
+
+
+COMMANDS = {'r.mapcalc': r_mapcalc, 'r.mask': r_mask, 'r.null': r_null,
+            'r.info': r_info, 'r.support': r_support, 'r.colors': r_colors,
+            'r.timestamp': r_timestamp, 'r.reclass': r_reclass,
+            'r.recode': r_recode, 'r.patch': r_patch,
+            'r.neighbors': r_neighbors, 'r.univar': r_univar,
+            'r.stats': r_stats,
+            'g.region': g_region, 'g.copy': g_copy, 'g.rename': g_rename,
+            'g.remove': g_remove, 'g.list': g_list, 'g.message': g_message}
+
+
+# grass.script stand-ins
+
+def region_from_env(env):
+    """
+    Return the region of a GRASS_REGION variable (see region_env()) in an
+    environment, or else the store's current region.
+    """
+    text = (env or os.environ).get('GRASS_REGION')
+    if not text:
+        return STORE.region
+    fields = dict(item.split(':', 1) for item in text.split(';') if item)
+    fields = dict((key.strip(), value.strip()) for key, value in
+                  fields.items())
+    region = dict((short, fields[long]) for long, short in REGION_KEYS)
+    return make_region(region['n'], region['s'], region['e'], region['w'],
+                       region['rows'], region['cols'])
+
+
+def execute(prog, flags='', overwrite=False, stdin=None, env=None, **kwargs):
+    """
+    Run an offline command, returning its output. Parameters follow
+    grass.script.run_command().
+    """
+    if prog not in COMMANDS:
+        raise ScriptError('Command {name} is not available offline'.format(
+            name=prog))
+    for key in ('quiet', 'verbose', 'superquiet', 'stdout', 'stderr'):
+        kwargs.pop(key, None)
+    for key, value in kwargs.items():
+        if isinstance(value, (tuple, list)):
+            kwargs[key] = ','.join(str(item) for item in value)
+    if isinstance(flags, (tuple, list)):
+        flags = ''.join(flags)
+    overwrite = overwrite or (env or os.environ).get('GRASS_OVERWRITE') == '1'
+
+    return COMMANDS[prog](STORE, kwargs, flags or '', overwrite, stdin,
+                          region_from_env(env)) or ''
+
+
+class CompletedCommand(object):
+    """
+    A finished command, standing in for the Popen object of
+    grass.script.start_command() and mapcalc_start().
+    """
+
+    def __init__(self, output=''):
+        self.output = output
+        self.returncode = 0
+        self.pid = os.getpid()
+
+    def wait(self):
+        return self.returncode
+
+    def poll(self):
+        return self.returncode
+
+    def communicate(self, input=None):
+        return self.output, ''
+
+
+def run_command(*args, **kwargs):
+    execute(*args, **kwargs)
+    return 0
+
+
+def read_command(*args, **kwargs):
+    return execute(*args, **kwargs)
+
+
+def write_command(*args, **kwargs):
+    execute(*args, **kwargs)
+    return 0
+
+
+def parse_command(*args, **kwargs):
+    delimiter = kwargs.pop('delimiter', '=')
+    parsed = {}
+    for line in execute(*args, **kwargs).splitlines():
+        key, separator, value = line.partition(delimiter)
+        parsed[key.strip()] = value.strip() if separator else None
+    return parsed
+
+
+def start_command(*args, **kwargs):
+    return CompletedCommand(execute(*args, **kwargs))
+
+
+def mapcalc(exp, quiet=False, verbose=False, overwrite=False, seed=None,
+            env=None, **kwargs):
+    expression = string.Template(exp).substitute(**kwargs)
+    evaluate_mapcalc(STORE, expression, region_from_env(env), overwrite)
+
+
+def mapcalc_start(exp, quiet=False, verbose=False, overwrite=False,
+                  seed=None, env=None, **kwargs):
+    mapcalc(exp, quiet, verbose, overwrite, seed, env, **kwargs)
+    return CompletedCommand()
+
+
+def raster_info(map):
+    return STORE.info(map)
+
+
+def region(region3d=False, complete=False, env=None):
+    return dict(region_from_env(env))
+
+
+def region_env(region3d=False, flags=None, env=None, **kwargs):
+    """
+    Return the value of a GRASS_REGION variable of the current region,
+    modified by the keyword arguments (n, s, e, w, nsres, ewres).
+    """
+    current = dict(region_from_env(env))
+    for key in ('n', 's', 'e', 'w', 'nsres', 'ewres'):
+        if key in kwargs:
+            current[key] = float(kwargs[key])
+    current['rows'] = int(round((current['n'] - current['s']) /
+                                current['nsres']))
+    current['cols'] = int(round((current['e'] - current['w']) /
+                                current['ewres']))
+    return ';'.join('{key}: {value!r}'.format(key=long, value=current[short])
+                    for long, short in REGION_KEYS)
+
+
+def use_temp_region():
+    STORE.temporary_regions.append(dict(STORE.region))
+
+
+def del_temp_region():
+    STORE.region = STORE.temporary_regions.pop()
+
+
+def find_file(name, element='cell', mapset=None):
+    found = element in ('cell', 'raster') and STORE.exists(name)
+    name = strip_mapset(name)
+    return {'name': name if found else '',
+            'mapset': 'offline' if found else '',
+            'fullname': name + '@offline' if found else '',
+            'file': 'offline/' + name if found else ''}
+
+
+TEMPORARY_FILES = itertools.count()
+
+
+def tempfile(create=True):
+    """
+    Return the name of a temporary file, created unless 'create' is False,
+    as g.tempfile does.
+    """
+    handle, name = mkstemp(prefix='{pid}.{count}.'.format(
+        pid=os.getpid(), count=next(TEMPORARY_FILES)))
+    os.close(handle)
+    if not create:
+        os.remove(name)
+    return name
+
+
+def basename(path, ext=None):
+    name = os.path.basename(path)
+    if ext and name.endswith('.' + ext):
+        name = name[:-len(ext) - 1]
+    return name
+
+
+def gisenv(env=None):
+    return {'GISDBASE': '', 'LOCATION_NAME': 'offline', 'MAPSET': 'offline'}
+
+
+def parser():
+    raise ScriptError('Offline, options and flags are passed to '
+                      'run_module()')
+
+
+def message(msg, flag=None):
+    sys.stderr.write(msg + '\n')
+
+
+def verbose(msg):
+    if VERBOSE:
+        message(msg)
+
+
+def info(msg):
+    message(msg)
+
+
+def debug(msg, debug=1):
+    pass
+
+
+def percent(i, n, s):
+    pass
+
+
+def warning(msg):
+    message('WARNING: ' + msg)
+
+
+def error(msg):
+    message('ERROR: ' + msg)
+
+
+def fatal(msg):
+    raise ScriptError(msg)
+
+
+# pygrass stand-ins
+
+def Buffer(shape, mtype='FCELL', buffer=None, offset=0, strides=None):
+    """
+    Return a row buffer, a NumPy array of the raster type's dtype.
+    """
+    return numpy.zeros(shape, dtype=DTYPES[mtype])
+
+
+class RasterRow(object):
+    """
+    Row by row access to a map of the store, within the current region.
+    Rows are read through the MASK. Integer rows hold CELL_NULL for nulls,
+    floating point rows NaN.
+    """
+
+    def __init__(self, name, mapset='', *args, **kwargs):
+        self.name = strip_mapset(name)
+        self.mode = None
+        self.mtype = None
+        self.overwrite = False
+        self._rows = []
+
+    def exist(self):
+        return STORE.exists(self.name)
+
+    def is_open(self):
+        return self.mode is not None
+
+    def open(self, mode='r', mtype=None, overwrite=False):
+        self.mode = mode
+        self.overwrite = overwrite
+        if mode == 'r':
+            self.mtype = STORE.get(self.name).mtype
+            self._rows = STORE.read(self.name)
+        else:
+            if STORE.exists(self.name) and not overwrite:
+                raise ScriptError('Raster map <{name}> exists, overwriting '
+                                  'not allowed'.format(name=self.name))
+            self.mtype = mtype or 'FCELL'
+            self._rows = []
+
+    def __len__(self):
+        return STORE.region['rows']
+
+    def __iter__(self):
+        for row in self._rows:
+            yield self._convert(row)
+
+    def get_row(self, row, row_buffer=None):
+        return self._convert(self._rows[row])
+
+    def _convert(self, row):
+        if self.mtype == 'CELL':
+            row = numpy.where(numpy.isnan(row), CELL_NULL, row)
+        return row.astype(DTYPES[self.mtype])
+
+    def put_row(self, row):
+        row = numpy.array(row, dtype=numpy.float64)
+        if self.mtype == 'CELL':
+            row[row == CELL_NULL] = numpy.nan
+        self._rows.append(row)
+
+    def close(self):
+        if self.mode == 'w':
+            STORE.write(self.name, numpy.array(self._rows), self.mtype,
+                        overwrite=self.overwrite)
+        self.mode = None
+        self._rows = []
+
+
+class Shortcuts(object):
+    """
+    The 'g' and 'r' module shortcuts of pygrass: attributes are commands,
+    called with their parameters, the first ones also positionally.
+    """
+    POSITIONAL = {'g.message': ('message',), 'r.mask': ('raster',),
+                  'r.info': ('map',), 'g.region': ('raster',)}
+
+    def __init__(self, prefix):
+        self.prefix = prefix
+
+    def __getattr__(self, name):
+        prog = self.prefix + '.' + name
+
+        def command(*args, **kwargs):
+            kwargs.update(zip(self.POSITIONAL.get(prog, ()), args))
+            return execute(prog, **kwargs)
+        return command
+
+
+def module(name, **attributes):
+    """
+    Return a new module object holding the given attributes.
+    """
+    new = types.ModuleType(name)
+    new.__dict__.update(attributes)
+    return new
+
+
+def stand_in_modules():
+    """
+    Return the stand-in modules of grass.script and pygrass by name.
+    """
+    functions = dict((name, globals()[name]) for name in (
+        'run_command', 'read_command', 'write_command', 'parse_command',
+        'start_command', 'mapcalc', 'mapcalc_start', 'raster_info', 'region',
+        'region_env', 'use_temp_region', 'del_temp_region', 'find_file',
+        'tempfile', 'basename', 'gisenv', 'parser', 'message', 'verbose',
+        'info', 'debug', 'percent', 'warning', 'error', 'fatal'))
+    functions['PIPE'] = subprocess.PIPE
+    functions['Popen'] = subprocess.Popen
+
+    core = module('grass.script.core', **functions)
+    script = module('grass.script', core=core, **functions)
+    exceptions = module('grass.exceptions', ScriptError=ScriptError,
+                        CalledModuleError=ScriptError)
+    shortcuts = module('grass.pygrass.modules.shortcuts',
+                       general=Shortcuts('g'), raster=Shortcuts('r'))
+    modules = module('grass.pygrass.modules', shortcuts=shortcuts)
+    buffer = module('grass.pygrass.raster.buffer', Buffer=Buffer)
+    raster = module('grass.pygrass.raster', RasterRow=RasterRow,
+                    buffer=buffer)
+    pygrass = module('grass.pygrass', modules=modules, raster=raster)
+    grass = module('grass', script=script, exceptions=exceptions,
+                   pygrass=pygrass)
+
+    return dict((stand_in.__name__, stand_in) for stand_in in
+                (grass, script, core, exceptions, pygrass, modules, shortcuts,
+                 raster, buffer))
+
+
+MODULES = stand_in_modules()
+REPLACED = {}
+
+
+def install(store):
+    """
+    Make 'import grass.script' and the pygrass imports of i.landsat8.swlst
+    load the stand-ins, operating on 'store'.
+    """
+    global STORE
+    STORE = store
+    for name, stand_in in MODULES.items():
+        if sys.modules.get(name) is not stand_in:
+            REPLACED.setdefault(name, sys.modules.get(name))
+            sys.modules[name] = stand_in
+    if not hasattr(__builtin__, '_'):
+        __builtin__._ = lambda text: text
+
+
+def uninstall():
+    """
+    Restore the modules replaced by install().
+    """
+    for name, original in REPLACED.items():
+        if original is None:
+            sys.modules.pop(name, None)
+        else:
+            sys.modules[name] = original
+    REPLACED.clear()
+
+
+def module_interface(script=SCRIPT):
+    """
+    Return the default options and flags of a GRASS GIS script, parsed from
+    its '#%' header, as grass.script.parser() would.
+    """
+    options = {}
+    flags = {}
+    block = None
+    with open(script, 'r') as source:
+        for line in source:
+            if not line.startswith('#%'):
+                continue
+            line = line[2:].strip()
+            if line.split()[:1] in (['option'], ['flag']):
+                block = {'type': line.split()[0]}
+            elif line.lower() == 'end' and block:
+                if block['type'] == 'flag':
+                    flags[block['key']] = False
+                elif 'key' in block:
+                    options[block['key']] = block.get('answer', '')
+                block = None
+            elif block is not None and ':' in line:
+                key, value = line.split(':', 1)
+                block[key.strip()] = value.strip()
+    return options, flags
+
+
+def run_module(store, options=None, flags='', script=SCRIPT):
+    """
+    Run the main() of i.landsat8.swlst on the maps of 'store' with the given
+    options (a dictionary) and flags (a string of flag letters), returning
+    the store. Temporary maps and the MASK are removed afterwards, as
+    at the exit of the module, and the stand-ins are uninstalled.
+    """
+    install(store)
+    try:
+        module_options, module_flags = module_interface(script)
+        for key, value in (options or {}).items():
+            if key not in module_options:
+                raise ScriptError('Unknown option {key}'.format(key=key))
+            module_options[key] = str(value)
+        for key in flags:
+            if key not in module_flags:
+                raise ScriptError('Unknown flag -{key}'.format(key=key))
+            module_flags[key] = True
+
+        environment = os.environ.get('GISBASE')
+        os.environ['GISBASE'] = environment or ''
+        try:
+            swlst_module = imp.load_source('i_landsat8_swlst', script)
+        finally:
+            if environment is None:
+                del os.environ['GISBASE']
+
+        swlst_module.options = module_options
+        swlst_module.flags = module_flags
+        try:
+            swlst_module.main()
+        finally:
+            swlst_module.cleanup()
+    finally:
+        uninstall()
+    return store
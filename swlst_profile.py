@@ -0,0 +1,318 @@
+# -*- coding: utf-8 -*-
+"""
+Timing and resource report of a run of i.landsat8.swlst, per processing stage
+and per spawned GRASS GIS command.
+
+A Profiler splits a run in to consecutive stages (see Profiler.stage()) and,
+once installed, records every command started via grass.script or pygrass:
+its wall and CPU time, the peak resident memory, the bytes read from and
+written to disk and, for r.mapcalc, the length of the expression. The
+resources of a command are those the kernel reports on reaping it (see
+os.wait4()), including the ones of the processes it waited for itself.
+
+The report is written as JSON or as a Chrome trace, viewable in
+chrome://tracing or <https://ui.perfetto.dev>.
+"""
+
+import os
+import time
+import json
+import errno
+import resource
+import grass.script as grass
+
+# rusage counts disk blocks of 512 bytes
+BLOCK_SIZE = 512
+# ru_maxrss is in kilobytes on Linux
+RSS_UNIT = 1024
+MEASURES = ('wall', 'cpu', 'children_cpu', 'children_peak_rss', 'bytes_read',
+            'bytes_written', 'expression_length', 'commands')
+
+
+def command_name(args):
+    """
+    Return the name of a command, from the arguments of a Popen call.
+    """
+    if isinstance(args, basestring):
+        args = args.split()
+    return os.path.basename(args[0]) if args else ''
+
+
+def wait4(pid, options):
+    """
+    Call os.wait4(), retried if interrupted by a signal.
+    """
+    while True:
+        try:
+            return os.wait4(pid, options)
+        except OSError as error:
+            if error.errno != errno.EINTR:
+                raise
+
+
+def profiled_popen(profiler, popen):
+    """
+    Return a subclass of the Popen class 'popen', reaping its process via
+    os.wait4() to record the resources it used with the 'profiler'.
+    """
+    class ProfiledPopen(popen):
+
+        def __init__(self, args, *posargs, **kwargs):
+            self._profile = profiler.start_command(args)
+            popen.__init__(self, args, *posargs, **kwargs)
+            self._profile['pid'] = self.pid
+
+        def _reaped(self, status, usage):
+            self._handle_exitstatus(status)
+            profiler.end_command(self._profile, usage, self.returncode)
+
+        def wait(self, *args, **kwargs):
+            if self.returncode is None:
+                pid, status, usage = wait4(self.pid, 0)
+                self._reaped(status, usage)
+            return self.returncode
+
+        def poll(self, *args, **kwargs):
+            if self.returncode is None:
+                pid, status, usage = wait4(self.pid, os.WNOHANG)
+                if pid == self.pid:
+                    self._reaped(status, usage)
+            return self.returncode
+
+    return ProfiledPopen
+
+
+class Profiler(object):
+    """
+    Record the stages of a run and the commands spawned in each of them.
+    A disabled Profiler records nothing.
+    """
+
+    def __init__(self, enabled=True):
+        """
+        Start profiling, in a first, unnamed stage.
+        """
+        self.enabled = enabled
+        self.start = time.time()
+        self.stages = []
+        self.commands = []
+        self._current = None
+        self._expression_length = None
+        self._patched = []
+        if enabled:
+            self.stage('setup')
+
+    def install(self):
+        """
+        Record the commands started via grass.script and pygrass modules,
+        and the length of r.mapcalc expressions passed to grass.script.
+        Without os.wait4() (not on MS-Windows), only stages are recorded.
+        """
+        if not self.enabled or not hasattr(os, 'wait4'):
+            return
+
+        import grass.script.core as core
+        modules = [core]
+        try:
+            import grass.pygrass.modules.interface.module as pygrass_module
+            if getattr(pygrass_module, 'Popen', None) is core.Popen:
+                modules.append(pygrass_module)
+        except ImportError:
+            pass
+
+        popen = profiled_popen(self, core.Popen)
+        for module in modules:
+            self._patch(module, 'Popen', popen)
+
+        for name in ('mapcalc', 'mapcalc_start'):
+            self._patch(grass, name, self._measured_mapcalc(getattr(grass,
+                                                                    name)))
+
+    def uninstall(self):
+        """
+        Restore what install() replaced.
+        """
+        for module, name, original in reversed(self._patched):
+            setattr(module, name, original)
+        self._patched = []
+
+    def _patch(self, module, name, replacement):
+        self._patched.append((module, name, getattr(module, name)))
+        setattr(module, name, replacement)
+
+    def _measured_mapcalc(self, mapcalc):
+        """
+        Wrap grass.script's mapcalc() or mapcalc_start() to pass the length
+        of the expression on to the r.mapcalc command it starts.
+        """
+        def measured(exp, *args, **kwargs):
+            self._expression_length = len(exp)
+            try:
+                return mapcalc(exp, *args, **kwargs)
+            finally:
+                self._expression_length = None
+        return measured
+
+    def _usage(self):
+        """
+        Return the CPU time and the disk bytes read and written of this
+        process so far.
+        """
+        usage = resource.getrusage(resource.RUSAGE_SELF)
+        return (usage.ru_utime + usage.ru_stime,
+                usage.ru_inblock * BLOCK_SIZE, usage.ru_oublock * BLOCK_SIZE)
+
+    def stage(self, name, **details):
+        """
+        End the current stage and start the stage 'name'. Keyword arguments,
+        for example the spatial window size, are reported along.
+        """
+        if not self.enabled:
+            return
+        self._end_stage()
+
+        cpu, bytes_read, bytes_written = self._usage()
+        self._current = {'name': name, 'details': details,
+                         'start': time.time() - self.start,
+                         'cpu': -cpu, 'bytes_read': -bytes_read,
+                         'bytes_written': -bytes_written, 'children_cpu': 0.0,
+                         'children_peak_rss': 0, 'expression_length': 0,
+                         'commands': 0}
+
+    def _end_stage(self):
+        if self._current is None:
+            return
+        stage, self._current = self._current, None
+
+        cpu, bytes_read, bytes_written = self._usage()
+        stage['wall'] = time.time() - self.start - stage['start']
+        stage['cpu'] += cpu
+        stage['bytes_read'] += bytes_read
+        stage['bytes_written'] += bytes_written
+        stage['peak_rss'] = (resource.getrusage(resource.RUSAGE_SELF)
+                             .ru_maxrss * RSS_UNIT)
+        self.stages.append(stage)
+
+    def finish(self):
+        """
+        End the last stage.
+        """
+        if self.enabled:
+            self._end_stage()
+
+    def start_command(self, args):
+        """
+        Return the record of a command about to be started.
+        """
+        name = command_name(args)
+        length = None
+        if name == 'r.mapcalc':
+            length = self._expression_length
+            if length is None and not isinstance(args, basestring):
+                length = sum(len(arg) - len('expression=') for arg in args
+                             if str(arg).startswith('expression=')) or None
+
+        return {'command': name, 'pid': None,
+                'stage': self._current['name'] if self._current else None,
+                'start': time.time() - self.start,
+                'expression_length': length}
+
+    def end_command(self, command, usage, returncode):
+        """
+        Complete the record of a command from its resource usage, and add it
+        to the ones of its stage.
+        """
+        command['wall'] = time.time() - self.start - command['start']
+        command['cpu'] = usage.ru_utime + usage.ru_stime
+        command['peak_rss'] = usage.ru_maxrss * RSS_UNIT
+        command['bytes_read'] = usage.ru_inblock * BLOCK_SIZE
+        command['bytes_written'] = usage.ru_oublock * BLOCK_SIZE
+        command['returncode'] = returncode
+        self.commands.append(command)
+
+        stage = self._current
+        if stage is None:
+            return
+        stage['commands'] += 1
+        stage['children_cpu'] += command['cpu']
+        stage['children_peak_rss'] = max(stage['children_peak_rss'],
+                                         command['peak_rss'])
+        stage['bytes_read'] += command['bytes_read']
+        stage['bytes_written'] += command['bytes_written']
+        stage['expression_length'] += command['expression_length'] or 0
+
+    def report(self):
+        """
+        Return the stages and commands recorded so far as a dictionary.
+        """
+        return {'module': 'i.landsat8.swlst', 'pid': os.getpid(),
+                'start': self.start, 'wall': time.time() - self.start,
+                'stages': self.stages, 'commands': self.commands}
+
+    def trace_events(self):
+        """
+        Return the stages and commands as complete events ('X') of the Chrome
+        trace event format: stages on one track, each command on the track of
+        its process, times in microseconds.
+        """
+        pid = os.getpid()
+        events = [{'name': 'thread_name', 'ph': 'M', 'pid': pid, 'tid': 0,
+                   'args': {'name': 'stages'}}]
+
+        for stage in self.stages:
+            name = stage['name']
+            if stage['details']:
+                name += ' ' + ' '.join('{0}={1}'.format(key, value) for
+                                       key, value in
+                                       sorted(stage['details'].items()))
+            events.append({'name': name, 'cat': 'stage', 'ph': 'X',
+                           'pid': pid, 'tid': 0,
+                           'ts': int(stage['start'] * 1e6),
+                           'dur': int(stage['wall'] * 1e6),
+                           'args': dict((key, stage[key]) for key in MEASURES)})
+
+        for command in self.commands:
+            measures = dict((key, value) for key, value in command.items()
+                            if key not in ('command', 'start', 'wall'))
+            events.append({'name': command['command'], 'cat': 'command',
+                           'ph': 'X', 'pid': pid, 'tid': command['pid'],
+                           'ts': int(command['start'] * 1e6),
+                           'dur': int(command['wall'] * 1e6),
+                           'args': measures})
+
+        return {'traceEvents': events, 'displayTimeUnit': 'ms'}
+
+    def write(self, filename, format='json'):
+        """
+        Write the report (see report()) or, for the 'trace' format, the
+        Chrome trace (see trace_events()) to a file.
+        """
+        if format == 'trace':
+            content = self.trace_events()
+        else:
+            content = self.report()
+        with open(filename, 'w') as output:
+            json.dump(content, output, indent=2, sort_keys=True)
+
+    def summary(self):
+        """
+        Return lines of a table of the measures per stage.
+        """
+        header = '{0:<16} {1:>9} {2:>9} {3:>9} {4:>9} {5:>10} {6:>10} {7:>9}'
+        row = ('{0:<16} {1:>9.2f} {2:>9.2f} {3:>9.2f} {4:>9.1f} {5:>10.1f} '
+               '{6:>10.1f} {7:>9}')
+        lines = [header.format('stage', 'wall [s]', 'cpu [s]', 'child [s]',
+                               'rss [MB]', 'read [MB]', 'write [MB]',
+                               'mapcalc')]
+        megabyte = float(2 ** 20)
+        for stage in self.stages:
+            name = stage['name']
+            if 'window' in stage['details']:
+                name += ' w' + str(stage['details']['window'])
+            lines.append(row.format(name, stage['wall'], stage['cpu'],
+                                    stage['children_cpu'],
+                                    stage['children_peak_rss'] / megabyte,
+                                    stage['bytes_read'] / megabyte,
+                                    stage['bytes_written'] / megabyte,
+                                    stage['expression_length']))
+        return lines
@@ -0,0 +1,151 @@
+# -*- coding: utf-8 -*-
+"""
+Run independent stages of i.landsat8.swlst concurrently, following a graph of
+dependencies.
+
+A task is a generator. It starts GRASS GIS commands in the background, for
+example via grass.script's start_command() or mapcalc_start(), and yields
+each started process. It is resumed once the process ended, hence a task reads
+as a sequence of steps while the commands of independent tasks run at the
+same time. Any other value a task yields is its result.
+
+Example:
+
+    def brightness_temperature(band, outname):
+        yield grass.mapcalc_start(outname + ' = ...', overwrite=True)
+        yield outname
+
+    graph = TaskGraph(nprocs=2)
+    graph.add('t10', brightness_temperature('10', 'T10'))
+    graph.add('t11', brightness_temperature('11', 'T11'))
+    graph.add('report', lambda: report(graph.results), after=('t10', 't11'))
+    results = graph.run()
+"""
+
+import time
+
+# globals
+POLL_INTERVAL = 0.02  # seconds between polls of the running processes
+
+
+class TaskError(RuntimeError):
+    """
+    A command started by a task failed.
+    """
+    pass
+
+
+def is_process(value):
+    """
+    Whether a value yielded by a task is a started process.
+    """
+    return hasattr(value, 'poll') and hasattr(value, 'wait')
+
+
+def run_task(task):
+    """
+    Run a task on its own, waiting for each process it starts. Returns its
+    result, None if it yields none.
+    """
+    result = None
+    for value in task:
+        if not is_process(value):
+            result = value
+        elif value.wait() != 0:
+            raise TaskError('A command failed, returning '
+                            '{code}'.format(code=value.returncode))
+    return result
+
+
+class TaskGraph(object):
+    """
+    Tasks started as soon as the tasks they depend on are done, with at most
+    'nprocs' processes running at a time.
+    """
+
+    def __init__(self, nprocs=1):
+        self.nprocs = max(1, nprocs)
+        self.names = []
+        self.tasks = {}
+        self.after = {}
+        self.results = {}
+
+    def add(self, name, task, after=()):
+        """
+        Add a task: a generator or a function returning one, called once
+        the tasks named in 'after' are done (and their results are in
+        'results').
+        """
+        if name in self.tasks:
+            raise ValueError('A task <{name}> exists already'.format(
+                name=name))
+        self.names.append(name)
+        self.tasks[name] = task
+        self.after[name] = tuple(after)
+
+    def _advance(self, name, running):
+        """
+        Resume a task until it starts a process, kept in 'running', or ends.
+        """
+        task = self.tasks[name]
+        try:
+            while True:
+                value = next(task)
+                if is_process(value):
+                    running[name] = value
+                    return
+                self.results[name] = value
+        except StopIteration:
+            self.results.setdefault(name, None)
+
+    def run(self):
+        """
+        Run all tasks, in the order added as far as dependencies and 'nprocs'
+        permit. Returns the results by task name. Raises a TaskError if a
+        command fails, once the other running commands ended.
+        """
+        unknown = [name for name in self.names for required in
+                   self.after[name] if required not in self.tasks]
+        if unknown:
+            raise ValueError('Tasks depending on unknown tasks: '
+                             '{names}'.format(names=', '.join(unknown)))
+
+        pending = list(self.names)
+        running = {}
+        while pending or running:
+
+            # start ready tasks
+            for name in list(pending):
+                if len(running) >= self.nprocs:
+                    break
+                if all(required in self.results and required not in running
+                       for required in self.after[name]):
+                    pending.remove(name)
+                    if callable(self.tasks[name]):
+                        self.tasks[name] = self.tasks[name]()
+                    self._advance(name, running)
+
+            if pending and not running and not any(
+                    all(required in self.results
+                        for required in self.after[name])
+                    for name in pending):
+                raise ValueError('Tasks depending on each other: '
+                                 '{names}'.format(names=', '.join(pending)))
+
+            # resume tasks whose process ended
+            ended = [(name, process) for name, process in running.items()
+                     if process.poll() is not None]
+            for name, process in ended:
+                del running[name]
+                if process.returncode != 0:
+                    for other in running.values():
+                        other.wait()
+                    raise TaskError('A command of the task <{name}> failed, '
+                                    'returning {code}'.format(
+                                        name=name, code=process.returncode))
+                self._advance(name, running)
+
+            if running and not ended:
+                time.sleep(POLL_INTERVAL)
+
+        return self.results
@@ -7,7 +7,9 @@
 
 # required librairies
 import random
+import numpy
 from column_water_vapor import *
+from column_water_vapor_arrays import *
 
 
 # helper functions
@@ -116,6 +118,95 @@ def test_column_water_vapor():
     print " | One big mapcalc expression:\n\n", obj._big_cwv_expression()
     print
 
+    print " | Ratio ji expression based on window means (multi-pass approach):"
+    print
+    print obj._ratio_ji_moments_expression()
+    print
+
+    print " | Summed-area tables engine (compute_column_water_vapor_array):"
+    print
+    rows = cols = 4 * obj.window_size
+    ti_array = numpy.random.uniform(290, 300, (rows, cols))
+    tj_array = ti_array - numpy.random.uniform(0, 2, (rows, cols))
+    cwv_array = compute_column_water_vapor_array(obj, ti_array, tj_array)
+
+    center = rows / 2
+    radius = obj.window_radius
+    window = (slice(center - radius, center + radius + 1),) * 2
+    cwv_center = obj.compute_column_water_vapor(list(ti_array[window].flat),
+                                                list(tj_array[window].flat))
+
+    print "   ~ Random arrays of size:", ti_array.shape
+    print "   ~ Column water vapor at the center pixel (array engine):",
+    print cwv_array[center, center]
+    print "   ~ Column water vapor at the center pixel (single value):",
+    print cwv_center
+    print "   ~ Null (NaN) pixels along the edges:",
+    print numpy.isnan(cwv_array).sum()
+    assert abs(cwv_array[center, center] - cwv_center) < 1e-9
+
+    # windows reaching beyond the edges are null, all others are not
+    border = numpy.ones((rows, cols), dtype=bool)
+    border[radius:rows - radius, radius:cols - radius] = False
+    assert (numpy.isnan(cwv_array) == border).all()
+
+    # uniform windows are null, as divisions by zero in r.mapcalc
+    uniform_ti = ti_array.copy()
+    uniform_tj = tj_array.copy()
+    uniform_ti[window] = 297.3
+    uniform_tj[window] = 296.1
+    cwv_uniform = compute_column_water_vapor_array(obj, uniform_ti,
+                                                   uniform_tj)
+    print "   ~ Column water vapor at the center of a uniform window:",
+    print cwv_uniform[center, center]
+    assert numpy.isnan(cwv_uniform[center, center])
+    print
+
+    print " | Coarse grid of every 3rd pixel, bilinearly interpolated:"
+    print
+    tables = window_moment_tables(ti_array, tj_array)
+    print "   ~ Deviation from the exact estimation (maximum, mean):",
+    print stride_deviation(obj, tables, 3)
+    print
+
+    print " | Row streaming engine (stream_column_water_vapor):"
+    print
+    cwv_rows = stream_column_water_vapor(obj, iter(ti_array), iter(tj_array))
+    cwv_streamed = numpy.array(list(cwv_rows))
+    print "   ~ Column water vapor at the center pixel (streamed):",
+    print cwv_streamed[center, center]
+    assert abs(cwv_streamed[center, center] - cwv_center) < 1e-9
+    assert (numpy.isnan(cwv_streamed) == border).all()
+    print "   ~ Peak memory for a full scene row of 7600 columns (MB):",
+    print obj.stream_buffer_bytes(7600) / 1024. ** 2
+    print
+
+    print " | Window medians (compute_column_water_vapor_median_array):"
+    print
+    cwv_median = compute_column_water_vapor_median_array(obj, ti_array,
+                                                         tj_array)
+    print "   ~ Column water vapor at the center pixel (window medians):",
+    print cwv_median[center, center]
+    print "   ~ Null (NaN) pixels along the edges:",
+    print numpy.isnan(cwv_median).sum()
+    assert (numpy.isnan(cwv_median) == border).all()
+
+    # sliding histograms against sorting each window, within a 0.01 K bin
+    for array in (ti_array, tj_array):
+        medians = sliding_window_median(array, radius)
+        reference = numpy.empty((rows, cols))
+        reference.fill(numpy.nan)
+        for row in xrange(radius, rows - radius):
+            for col in xrange(radius, cols - radius):
+                reference[row, col] = numpy.median(
+                    array[row - radius:row + radius + 1,
+                          col - radius:col + radius + 1])
+        deviation = numpy.abs(medians - reference)[~border].max()
+        print "   ~ Maximum deviation from numpy.median() (K):", deviation
+        assert deviation <= 0.01
+        assert (numpy.isnan(medians) == border).all()
+    print
+
 # reusable & stand-alone
 if __name__ == "__main__":
     print ('Testing the SplitWindowLST class')
@@ -0,0 +1,88 @@
+#!/usr/bin/python\<nl>\
+# -*- coding: utf-8 -*-
+
+"""
+Testing the import time of the libraries of i.landsat8.swlst
+"""
+
+# required librairies
+import os
+import sys
+import shutil
+import tempfile
+import subprocess
+
+# imported by i.landsat8.swlst at startup, besides GRASS GIS'. The NumPy
+# engines are imported only by the methods using them.
+MODULES = ['landsat8_mtl', 'csv_to_dictionary', 'column_water_vapor',
+           'split_window_lst', 'swlst_tasks']
+
+TIMING = '''
+import sys
+import time
+start = time.time()
+import {modules}
+imported = time.time()
+parsed = split_window_lst.EMISSIVITIES._index is not None or \\
+    split_window_lst.COLUMN_WATER_VAPOR._index is not None
+loading = time.time()
+split_window_lst.EMISSIVITIES.keys()
+split_window_lst.COLUMN_WATER_VAPOR.keys()
+print imported - start, time.time() - loading, int(parsed), \\
+    int('numpy' in sys.modules)
+'''
+
+
+def import_time(repetitions=5):
+    """
+    Return the shortest time, of a few fresh interpreters, to import the
+    libraries and the time to load the coefficient tables on first access,
+    whether the tables got parsed at import and whether NumPy got imported
+    along. The coefficient table cache is written to a temporary cache
+    directory, its path is returned too.
+    """
+    cache_directory = tempfile.mkdtemp()
+    environment = dict(os.environ, XDG_CACHE_HOME=cache_directory)
+    try:
+        timings = []
+        for repetition in range(repetitions):
+            output = subprocess.check_output(
+                [sys.executable, '-c',
+                 TIMING.format(modules=', '.join(MODULES))],
+                env=environment)
+            timings.append(tuple(float(value) for value in output.split()))
+        cache_files = [os.path.relpath(os.path.join(path, name),
+                                       cache_directory)
+                       for path, directories, names in
+                       os.walk(cache_directory) for name in names]
+    finally:
+        shutil.rmtree(cache_directory)
+
+    imported, tables, parsed, numpy_imported = min(timings)
+    return imported, tables, bool(parsed), bool(numpy_imported), cache_files
+
+
+def test_import_time():
+    """
+    Testing that importing the libraries neither imports NumPy nor parses
+    the coefficient tables, reporting the import time
+    """
+    imported, tables, parsed, numpy_imported, cache_files = import_time()
+    print " | Import time of", ', '.join(MODULES)
+    print
+    print "   ~ Import (ms):", round(imported * 1000, 2)
+    print "   ~ Coefficient tables, on first access (ms):", round(tables * 1000, 2)
+    print "   ~ Coefficient tables parsed at import:", parsed
+    print "   ~ NumPy imported:", numpy_imported
+    print "   ~ Cache files, in the user's cache directory:", cache_files
+    assert not numpy_imported
+    assert not parsed
+    assert cache_files == [os.path.join('i.landsat8.swlst',
+                                        'coefficients.pickle')]
+    print
+
+# reusable & stand-alone
+if __name__ == "__main__":
+    print ('Testing the import time')
+    print
+    test_import_time()
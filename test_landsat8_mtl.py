@@ -5,7 +5,11 @@
 @author nik |
 """
 
-from landsat8_mtl import Landsat8_MTL
+import numpy
+from landsat8_mtl import Landsat8_MTL, load_mtl
+from swlst import radiance_to_temperature_array
+from swlst import brightness_temperature_lookup
+from swlst import brightness_temperature_reclass_rules
 
 
 MTLFILE = 'mtl.txt'
@@ -35,6 +39,27 @@ def test(mtlfile):
     print "  > Upper left (projected):", mtl.corner_ul_projection
     print "  > Lower right (projected):", mtl.corner_lr_projection
     print "  > Cloud cover:", mtl.cloud_cover
+    print
+
+    print "| Typed metadata, per group:"
+    print "  > Groups:", mtl.mtl.groups()
+    print "  > TIRS_THERMAL_CONSTANTS:", mtl.mtl.group('TIRS_THERMAL_CONSTANTS')
+    print "  > Type of the cloud cover:", type(mtl.cloud_cover)
+    print "  > MTL file loaded once, shared object:",
+    print load_mtl(MTLFILE) is load_mtl(MTLFILE)
+    print
+
+    print "| Conversions for arrays (band 10):"
+    digital_numbers = numpy.array([20000., 25000., 30000.])
+    radiance = mtl.toar_radiance_array(10, digital_numbers)
+    print "  > Digital numbers:", digital_numbers
+    print "  > Spectral radiance:", radiance
+    print "  > Brightness temperature:",
+    print radiance_to_temperature_array(mtl, 10, radiance)
+    print "  > Brightness temperature, looked up:",
+    print brightness_temperature_lookup(mtl, 10, digital_numbers)
+    print "  > r.reclass rules for the digital numbers 20000 to 20002:"
+    print brightness_temperature_reclass_rules(mtl, 10, 20000, 20002)
 
 
 def main():
@@ -0,0 +1,60 @@
+#!/usr/bin/python\<nl>\
+# -*- coding: utf-8 -*-
+
+"""
+Testing the quality_assessment decoder
+"""
+
+# required librairies
+import numpy
+from quality_assessment import *
+
+# fill, clear, cloud and cirrus of medium confidence, cloud and cirrus of high
+# confidence, terrain occlusion
+QA_SAMPLE = [1, 20480, 43008, 61440, 20484]
+
+
+def test_quality_assessment():
+    """
+    Testing parse_conditions(), lookup_table(), qa_mask() and
+    clear_categories()
+    """
+    print " | Quality Assessment band decoder:"
+    print
+    conditions = 'fill, cloud:medium, cirrus, terrain_occlusion'
+    print "   ~ Conditions:", conditions
+    print "   ~ Parsed (name, first bit, bits, minimum):"
+    for condition in parse_conditions(conditions):
+        print "    ", condition
+    print
+
+    print "   ~ QA values:", QA_SAMPLE
+    print "   ~ Masked by 'cloud' (high confidence):",
+    print list(lookup_table(QA_SAMPLE, ['cloud']))
+    print "   ~ Masked by the conditions above:",
+    print list(lookup_table(QA_SAMPLE, conditions))
+    print "   ~ Masked by the QA pixel value 61440:",
+    print list(lookup_table(QA_SAMPLE, pixels=[61440]))
+    print
+
+    qa = numpy.random.choice(QA_SAMPLE, (100, 100))
+    masked = qa_mask(qa, conditions)
+    print "   ~ Lookup equal to decoding each pixel:",
+    print (masked == decode(qa, conditions)).all()
+
+    values = distinct_values(qa)
+    print "   ~ Clear categories for r.mask:",
+    print clear_categories(values, lookup_table(values, ['cloud']))
+    print
+
+    try:
+        parse_conditions('cloud:certain')
+    except ValueError as error:
+        print "   ~ Unknown confidence:", error
+    print
+
+# reusable & stand-alone
+if __name__ == "__main__":
+    print ('Testing the quality_assessment decoder')
+    print
+    test_quality_assessment()
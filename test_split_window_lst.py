@@ -7,8 +7,10 @@
 
 # required librairies
 import random
+import numpy
 import csv_to_dictionary as coefficients
 from split_window_lst import *
+from split_window_lst_arrays import *
 
 # globals
 EMISSIVITIES = coefficients.get_average_emissivities()
@@ -299,9 +301,103 @@ def test_split_window_lst():
     sw_lst_expression = swlst.sw_lst_mapcalc
     print "Big expression:\n\n", sw_lst_expression
 
+    print
+    print "[ Emissivity look-up tables ]"
+    print
+
+    avg_lse_table, delta_lse_table = emissivity_lookup_tables()
+    landcover_codes = [random.choice(FROM_GLC_CODES) for count in range(5)]
+    print " * Random FROM-GLC codes:", landcover_codes
+    print " * Average, delta emissivities via 'lookup_emissivities()':",
+    print lookup_emissivities(landcover_codes)
+    print " * Rules for r.reclass (average emissivity, scaled by 10000):\n"
+    print emissivity_reclass_rules(avg_lse_table)
+    print " * Rules for r.recode (delta emissivity):\n"
+    print emissivity_recode_rules(delta_lse_table)
+
+
+def test_compute_lst_array():
+    """
+    Testing compute_lst_array() and compute_lst_array_folded() against each
+    other and against compute_lst(), per cwv subrange and in their overlaps
+    """
+    print
+    print "[ Array computation ]"
+    print
+
+    swlst = SplitWindowLST(random.choice(EMISSIVITIES.keys()))
+    print " * Random land cover class:", swlst.landcover_class
+
+    boundaries, table = cwv_subrange_table()
+    print " * Subrange boundaries:", boundaries
+    print " * Subrange pairs per slot (indices in CWV_SUBRANGES):", table.tolist()
+
+    # inside one subrange, in the overlap of two, on their boundaries and
+    # outside all but the complete range (subrange 6)
+    cwv_values = [1.0, 2.2, 2.8, 3.2, 3.8, 4.2, 4.8, 5.2, 5.8, 6.1,
+                  0.0, 2.0, 2.5, 3.0, 3.5, 4.0, 4.5, 5.0, 5.5, 6.3,
+                  -0.2, 6.5]
+    t10_values = random_brightness_temperature_values(len(cwv_values))
+    t11_values = [t10 - random.uniform(0, 2) for t10 in t10_values]
+    lst_array, validity = compute_lst_array(swlst, t10_values, t11_values,
+                                            cwv_values)
+    print " * CWV values:", cwv_values
+    print " * LST via 'compute_lst_array()':", lst_array
+    print " * Validity masks (T10, T11, CWV):", validity
+
+    # the r.mapcalc expression, as the array engines, weighs b2 by
+    # (1 - ae) / ae^2, compute_lst() by (1 - ae) / ae
+    def expression_coefficients(subrange):
+        b0, b1, b2, b3, b4, b5, b6, b7 = \
+            swlst._retrieve_cwv_coefficients(subrange)
+        return b0, b1, b2 / swlst.average_emissivity, b3, b4, b5, b6, b7
+
+    lst_values = []
+    for t10, t11, cwv in zip(t10_values, t11_values, cwv_values):
+        subranges = swlst._retrieve_adjacent_cwv_subranges(cwv)
+        if type(subranges) == str:
+            subranges = (subranges,)
+        lst_values.append(sum(swlst.compute_lst(t10, t11,
+                                                expression_coefficients(
+                                                    subrange))
+                              for subrange in subranges) / len(subranges))
+    print " * LST via 'compute_lst()':", lst_values
+    assert numpy.abs(lst_array - lst_values).max() < 1e-9
+    assert validity.t10.all() and validity.t11.all() and validity.cwv.all()
+
+    print
+    print "[ Folded coefficients ]"
+    print
+
+    classes, table = folded_coefficient_tables(swlst)
+    print " * Folded coefficients (A, B, C, D) for", classes[0], "per subrange:"
+    print table[0]
+    lst_folded = compute_lst_array_folded(swlst, t10_values, t11_values,
+                                          cwv_values)
+    print " * LST via 'compute_lst_array_folded()':", lst_folded
+    assert numpy.abs(lst_folded - lst_array).max() < 1e-9
+    print " * Folded expression:\n\n", swlst._build_folded_swlst_mapcalc()
+
+    # per pixel emissivities of a land cover map
+    landcover_codes = [random.choice(FROM_GLC_CODES) for cwv in cwv_values]
+    avg_lse, delta_lse = lookup_emissivities(landcover_codes)
+    landcover_swlst = SplitWindowLST('')
+    lst_array = compute_lst_array(landcover_swlst, t10_values, t11_values,
+                                  cwv_values, avg_lse, delta_lse)[0]
+    lst_folded = compute_lst_array_folded(landcover_swlst, t10_values,
+                                          t11_values, cwv_values,
+                                          landcover_codes)
+    print " * Random FROM-GLC codes:", landcover_codes
+    print " * LST via 'compute_lst_array()':", lst_array
+    print " * LST via 'compute_lst_array_folded()':", lst_folded
+    assert (numpy.isnan(lst_folded) == numpy.isnan(lst_array)).all()
+    assert numpy.nanmax(numpy.abs(lst_folded - lst_array)) < 1e-9
+    print
+
 
 # reusable & stand-alone
 if __name__ == "__main__":
     print ('Testing the SplitWindowLST class')
     print
     test_split_window_lst()
+    test_compute_lst_array()
@@ -0,0 +1,145 @@
+#!/usr/bin/python\<nl>\
+# -*- coding: utf-8 -*-
+
+"""
+Testing the swlst array API
+"""
+
+# required librairies
+import os
+import random
+import numpy
+import tempfile
+from swlst import *
+from split_window_lst import FROM_GLC_CODES
+from split_window_lst_arrays import cwv_subrange_table
+from benchmark_swlst import synthetic_scene, write_mtl
+
+MTLFILE = 'mtl.txt'
+LST_TOLERANCE = 0.001  # K, single to double precision
+CWV_TOLERANCE = 1e-6  # g/cm^2, single to double precision
+FOLDED_TOLERANCE = 1e-6  # K, folded to unfolded coefficients
+
+
+# helper functions
+def random_digital_number_arrays(rows=30, columns=30):
+    """
+    Return two arrays of random Digital Numbers for TIRS bands 10, 11,
+    ranging in a plausible part of the 16-bit range.
+    """
+    b10 = numpy.random.randint(20000, 30000, (rows, columns))
+    b11 = b10 - numpy.random.randint(0, 1500, (rows, columns))
+    return b10, b11
+
+
+def test_swlst():
+    """
+    Testing lst_from_arrays()
+    """
+    b10, b11 = random_digital_number_arrays()
+    landcover = numpy.random.choice(FROM_GLC_CODES, b10.shape)
+    window = random.choice((7, 9, 11))
+
+    print " | Land surface temperature from arrays (lst_from_arrays):"
+    print
+    print "   ~ Arrays of size:", b10.shape, "| Window size:", window
+
+    result = lst_from_arrays(b10, b11, MTLFILE, landcover=landcover,
+                             window=window)
+    print "   ~ Fields of the result:", result._fields
+    print "   ~ Mean LST (K):", numpy.nanmean(result.lst)
+    print "   ~ Mean CWV (g/cm^2):", numpy.nanmean(result.cwv)
+    print "   ~ Null (NaN) LST pixels along the edges:",
+    print numpy.isnan(result.lst).sum()
+    assert result.lst.shape == b10.shape
+    assert numpy.isnan(result.lst).any() and not numpy.isnan(result.lst).all()
+    print
+
+    folded = lst_from_arrays(b10, b11, MTLFILE, landcover=landcover,
+                             window=window, folded=True)
+    print "   ~ Maximum LST difference, folded to unfolded coefficients (K):",
+    print numpy.nanmax(abs(folded.lst - result.lst))
+    assert numpy.nanmax(abs(folded.lst - result.lst)) < FOLDED_TOLERANCE
+    assert (numpy.isnan(folded.lst) == numpy.isnan(result.lst)).all()
+    print
+
+    result = lst_from_arrays(b10, b11, MTLFILE, emissivity_class='Cropland',
+                             window=window, celsius=True)
+    print "   ~ Mean LST (C) for a fixed class (Cropland):",
+    print numpy.nanmean(result.lst)
+    print
+
+    double = lst_from_arrays(b10, b11, MTLFILE, landcover=landcover,
+                             window=window)
+    single = lst_from_arrays(b10, b11, MTLFILE, landcover=landcover,
+                             window=window, dtype=numpy.float32)
+    print "   ~ Single precision, type of the result:", single.lst.dtype
+    print "   ~ Maximum LST difference to double precision (K):",
+    print numpy.nanmax(abs(single.lst - double.lst))
+    print "   ~ Maximum CWV difference to double precision (g/cm^2):",
+    print numpy.nanmax(abs(single.cwv - double.cwv))
+    assert single.lst.dtype == numpy.float32
+    assert numpy.nanmax(abs(single.lst - double.lst)) < LST_TOLERANCE
+    assert numpy.nanmax(abs(single.cwv - double.cwv)) < CWV_TOLERANCE
+    print
+
+
+def test_single_precision():
+    """
+    Testing lst_from_arrays() and compute_lst_array() in single precision
+    against double precision, for pixels next to cwv subrange boundaries
+    """
+    boundaries, subranges = cwv_subrange_table()
+
+    print " | Single precision next to cwv subrange boundaries:"
+    print
+
+    # a scene holding a pixel about 1e-4 g/cm^2 below the boundary at 2.0
+    handle, filename = tempfile.mkstemp(suffix='.txt')
+    os.close(handle)
+    try:
+        mtl = write_mtl(filename, 48)
+        scene = synthetic_scene(48, mtl, seed=0)
+        double = lst_from_arrays(scene.b10, scene.b11, mtl,
+                                 landcover=scene.landcover, null=True)
+        single = lst_from_arrays(scene.b10, scene.b11, mtl,
+                                 landcover=scene.landcover, null=True,
+                                 dtype=numpy.float32)
+    finally:
+        os.remove(filename)
+    distance = numpy.nanmin(abs(double.cwv[..., numpy.newaxis] - boundaries))
+    lst_difference = numpy.nanmax(abs(single.lst - double.lst))
+    cwv_difference = numpy.nanmax(abs(single.cwv - double.cwv))
+    print "   ~ Closest CWV to a subrange boundary (g/cm^2):", distance
+    print "   ~ Maximum LST difference to double precision (K):",
+    print lst_difference
+    print "   ~ Maximum CWV difference to double precision (g/cm^2):",
+    print cwv_difference
+    assert distance < 1e-3
+    assert lst_difference < LST_TOLERANCE
+    assert cwv_difference < CWV_TOLERANCE
+    assert (numpy.isnan(single.lst) == numpy.isnan(double.lst)).all()
+
+    # on, just below and just above each boundary
+    cwv = numpy.concatenate((boundaries,
+                             numpy.nextafter(boundaries, -numpy.inf),
+                             numpy.nextafter(boundaries, numpy.inf),
+                             boundaries - 1e-5, boundaries + 1e-5))
+    t10 = numpy.linspace(250, 320, len(cwv))
+    t11 = t10 - numpy.linspace(0.2, 3, len(cwv))
+    swlst = SplitWindowLST('Cropland')
+    lst_double = compute_lst_array(swlst, t10, t11, cwv)[0]
+    lst_single = compute_lst_array(swlst, t10, t11, cwv,
+                                   dtype=numpy.float32)[0]
+    lst_difference = numpy.max(abs(lst_single - lst_double))
+    print "   ~ Maximum LST difference on and next to the boundaries (K):",
+    print lst_difference
+    assert lst_difference < LST_TOLERANCE
+    print
+
+# reusable & stand-alone
+if __name__ == "__main__":
+    print ('Testing the swlst array API')
+    print
+    test_swlst()
+    test_single_precision()
@@ -0,0 +1,197 @@
+#!/usr/bin/python\<nl>\
+# -*- coding: utf-8 -*-
+
+"""
+Testing a run of i.landsat8.swlst against the offline stand-in for GRASS GIS
+"""
+
+# required librairies
+import os
+import sys
+import numpy
+import tempfile
+from benchmark_swlst import synthetic_scene, write_mtl, QA_CLOUD
+from landsat8_mtl import load_mtl
+from column_water_vapor import Column_Water_Vapor
+from column_water_vapor_arrays import compute_column_water_vapor_median_array
+from split_window_lst import SplitWindowLST
+from split_window_lst_arrays import compute_lst_array
+from split_window_lst_arrays import emissivity_lookup_tables
+from split_window_lst_arrays import lookup_emissivities
+from swlst import brightness_temperature, lst_from_arrays
+from swlst_offline import MODULES, RasterStore, run_module
+
+SIZE = 48
+WINDOW = 7
+UNIFORM = (slice(30, 39), slice(14, 23))  # clear and uniform, null CWV
+TEMPERATURE_SCALE = 100  # precision=scaled, hundredths of a degree
+
+# FROM-GLC codes of the scene, in 4 by 4 patches, including those to which the
+# emissivity expression and the look-up table assign different classes
+CODES = ((10, 20, 30, 40),
+         (50, 51, 52, 60),
+         (70, 71, 72, 80),
+         (90, 100, 101, 102))
+DIVERGING_CODES = (50, 51, 70, 100, 101, 102)
+
+# classes of the ranges of codes of the emissivity expression
+EXPRESSION_LEGEND = {'Cropland': range(10, 20) + range(100, 120),
+                     'Forest': range(20, 30),
+                     'Grasslands': range(30, 40) + [72],
+                     'Shrublands': range(40, 50) + [70, 71],
+                     'Waterbodies': [50, 51] + range(60, 70),
+                     'Impervious': range(80, 90),
+                     'Barren_Land': [52] + range(90, 100)}
+
+# flags, options and the tolerances of LST (K) and CWV (g/cm^2) to
+# lst_from_arrays(), or to the window medians of the array engines;
+# looked up brightness temperatures are rounded to micro-K, which would move
+# some onto other 0.01 K bins of the sliding histograms of the medians
+RUNS = (('n', {}, 1e-5, 1e-4),
+        ('nm', {}, 1e-5, 1e-4),
+        ('nf', {}, 1e-9, 1e-9),
+        ('n', {'cwv_method': 'sat'}, 1e-5, 1e-4),
+        ('n', {'cwv_method': 'stream'}, 1e-5, 1e-4),
+        ('n', {'cwv_method': 'neighbors'}, 1e-5, 1e-4),
+        ('n', {'bt_method': 'expression'}, 1e-9, 1e-9),
+        ('n', {'emissivity_method': 'lookup'}, 1e-5, 1e-4),
+        ('n', {'lst_method': 'folded'}, 1e-5, 1e-4),
+        ('nf', {'lst_method': 'folded'}, 1e-9, 1e-9),
+        ('n', {'precision': 'float'}, 1e-4, 1e-4),
+        ('nf', {'precision': 'float'}, 1e-3, 1e-6),
+        ('n', {'precision': 'scaled'}, 0.5 / TEMPERATURE_SCALE, 1e-4),
+        ('n', {'cwv_method': 'sat', 'cwv_statistic': 'median',
+               'bt_method': 'expression'}, 1e-9, 1e-9))
+
+
+def maximum_difference(map, reference, where=True):
+    """
+    Return the maximum absolute difference between two arrays, at cells
+    'where' and not null (NaN) in either, and the number of such cells null
+    in only one of them.
+    """
+    null, reference_null = numpy.isnan(map), numpy.isnan(reference)
+    both = where & ~null & ~reference_null
+    return (numpy.abs(map[both] - reference[both]).max(),
+            (where & (null != reference_null)).sum())
+
+
+def check_runs(mtl):
+    """
+    Run i.landsat8.swlst offline on a synthetic scene of the MTL file 'mtl'
+    per method and flags (see RUNS), comparing the outputs to the array
+    engines
+    """
+    scene = synthetic_scene(SIZE, mtl, seed=0)
+    for band in scene.b10, scene.b11:
+        band[UNIFORM] = band[UNIFORM].mean()
+    patches = numpy.arange(SIZE) * len(CODES) // SIZE
+    landcover = numpy.array(CODES)[numpy.ix_(patches, patches)]
+    clear = scene.qa != QA_CLOUD
+    reference = lst_from_arrays(numpy.where(clear, scene.b10, 0),
+                                numpy.where(clear, scene.b11, 0), mtl,
+                                landcover=landcover, window=WINDOW, null=True)
+    emissivities = {'lookup': lookup_emissivities(landcover),
+                    'expression': lookup_emissivities(
+                        landcover,
+                        emissivity_lookup_tables(EXPRESSION_LEGEND))}
+
+    # column water vapor of window medians, LST of the lookup emissivities
+    t10, t11 = [brightness_temperature(numpy.where(clear, band, 0),
+                                       load_mtl(mtl), number, null=True)
+                for band, number in ((scene.b10, 10), (scene.b11, 11))]
+    cwv_median = compute_column_water_vapor_median_array(
+        Column_Water_Vapor(WINDOW, 'T10', 'T11'), t10, t11)
+    lst_median = compute_lst_array(SplitWindowLST(''), t10, t11, cwv_median,
+                                   *emissivities['lookup'])[0]
+    references = {'mean': (reference.lst, reference.cwv),
+                  'median': (lst_median, cwv_median)}
+    agreeing = ~numpy.in1d(landcover, DIVERGING_CODES).reshape(landcover.shape)
+
+    # windows inside the uniform patch, null as divisions by zero; the big
+    # expression divides the rounding noise of its sums there instead
+    radius = Column_Water_Vapor(WINDOW, 'T10', 'T11').window_radius
+    centers = [slice(window.start + radius, window.stop - radius)
+               for window in UNIFORM]
+    assert numpy.isnan(reference.cwv[centers]).all()
+    uniform = numpy.zeros((SIZE, SIZE), dtype=bool)
+    uniform[centers] = True
+
+    print " | Offline run of i.landsat8.swlst (run_module):"
+    print
+    print "   ~ Scene of size:", (SIZE, SIZE), "| Window size:", WINDOW
+    print "   ~ Land cover codes:", sorted(numpy.unique(landcover))
+
+    for flags, options, lst_tolerance, cwv_tolerance in RUNS:
+        store = RasterStore(rows=SIZE, cols=SIZE)
+        store.write('B10', scene.b10, 'CELL')
+        store.write('B11', scene.b11, 'CELL')
+        store.write('BQA', scene.qa, 'CELL')
+        store.write('FROM_GLC', landcover, 'CELL')
+        arguments = {'mtl': mtl, 'prefix': 'B', 'landcover': 'FROM_GLC',
+                     'lst': 'LST', 'cwv': 'CWV', 'window': str(WINDOW),
+                     'emissivity_out': 'Emissivity',
+                     'delta_emissivity_out': 'Delta_Emissivity'}
+        arguments.update(options)
+        run_module(store, arguments, flags)
+        assert not [name for name, stand_in in MODULES.items()
+                    if sys.modules.get(name) is stand_in]
+
+        lst = store.read('LST')
+        if options.get('precision') == 'scaled':
+            lst = lst / TEMPERATURE_SCALE
+        # the fused pass and the folded coefficients follow the FROM-GLC
+        # legend, as the look-up table
+        emissivity_method = options.get('emissivity_method', 'expression')
+        if 'f' in flags:
+            emissivity_method = 'lookup'
+        lst_classes = emissivity_method
+        if options.get('lst_method') == 'folded':
+            lst_classes = 'lookup'
+        lst_reference, cwv_reference = \
+            references[options.get('cwv_statistic', 'mean')]
+        # the LST of diverging codes differs by up to a few K
+        compared = agreeing if lst_classes == 'expression' else True
+        windows = True
+        if options.get('cwv_method', 'expression') == 'expression':
+            windows = ~uniform
+        lst_difference = maximum_difference(lst, lst_reference,
+                                            compared & windows)
+        cwv_difference = maximum_difference(store.read('CWV'), cwv_reference,
+                                            windows)
+        average, delta = emissivities[emissivity_method]
+        differences, nulls = zip(
+            maximum_difference(store.read('Emissivity'), average, clear),
+            maximum_difference(store.read('Delta_Emissivity'), delta, clear))
+        emissivity_difference = (max(differences), sum(nulls))
+
+        print "   ~ Flags:", flags, "| Options:", options
+        print "     Maximum LST difference to the array engines (K),",
+        print "differently null pixels:", lst_difference
+        print "     Maximum CWV difference to the array engines (g/cm^2),",
+        print "differently null pixels:", cwv_difference
+        print "     Maximum emissivity difference to the", emissivity_method,
+        print "classes, differently null pixels:", emissivity_difference
+        assert lst_difference[0] < lst_tolerance and not lst_difference[1]
+        assert cwv_difference[0] < cwv_tolerance and not cwv_difference[1]
+        assert emissivity_difference[0] < 1e-6
+        assert not emissivity_difference[1]
+    print
+
+
+def test_swlst_offline():
+    """
+    Testing run_module() on a synthetic scene, per method and flags
+    """
+    handle, filename = tempfile.mkstemp(suffix='.txt')
+    os.close(handle)
+    try:
+        check_runs(write_mtl(filename, SIZE))
+    finally:
+        os.remove(filename)
+
+# reusable & stand-alone
+if __name__ == "__main__":
+    print ('Testing i.landsat8.swlst offline')
+    print
+    test_swlst_offline()
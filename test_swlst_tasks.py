@@ -0,0 +1,73 @@
+#!/usr/bin/python\<nl>\
+# -*- coding: utf-8 -*-
+
+"""
+Testing the swlst_tasks graph of concurrent tasks
+"""
+
+# required librairies
+import time
+import subprocess
+from swlst_tasks import TaskGraph, TaskError, run_task
+
+SLEEP = 0.3  # seconds of each command
+
+
+def sleeping(name, order, steps=1):
+    """
+    A task of 'steps' commands sleeping in turn, recording its start and end
+    in 'order'. Its result is its name.
+    """
+    order.append('start ' + name)
+    for step in xrange(steps):
+        yield subprocess.Popen(['sleep', str(SLEEP)])
+    order.append('end ' + name)
+    yield name
+
+
+def test_swlst_tasks():
+    """
+    Testing TaskGraph.run() and run_task()
+    """
+    print " | Graph of tasks (TaskGraph):"
+    print
+
+    for nprocs in (1, 2):
+        order = []
+        graph = TaskGraph(nprocs)
+        graph.add('t10', sleeping('t10', order, steps=2))
+        graph.add('t11', sleeping('t11', order, steps=2))
+        graph.add('lst', lambda: sleeping('lst', order),
+                  after=('t10', 't11'))
+        start = time.time()
+        results = graph.run()
+        print "   ~ Processes:", nprocs, "| Seconds:",
+        print round(time.time() - start, 1), "| Sequential:", 5 * SLEEP
+        print "     Order:", order
+        print "     Results:", sorted(results.items())
+    print
+
+    failing = TaskGraph(2)
+    failing.add('fails', iter([subprocess.Popen(['false'])]))
+    try:
+        failing.run()
+    except TaskError as error:
+        print "   ~ A failing command:", error
+
+    cyclic = TaskGraph(2)
+    cyclic.add('a', iter([]), after=('b',))
+    cyclic.add('b', iter([]), after=('a',))
+    try:
+        cyclic.run()
+    except ValueError as error:
+        print "   ~ Cyclic dependencies:", error
+
+    print "   ~ One task on its own (run_task):",
+    print run_task(sleeping('single', []))
+    print
+
+# reusable & stand-alone
+if __name__ == "__main__":
+    print ('Testing the swlst_tasks graph of concurrent tasks')
+    print
+    test_swlst_tasks()